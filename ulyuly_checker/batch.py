@@ -0,0 +1,240 @@
+# ============================================================
+# batch.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: пакетная проверка без GUI (для сервера).
+#   python -m ulyuly_checker.batch <папка|glob|файл> [...] [--workers N]
+#   - обход папок через os.scandir (рекурсивно), фильтр по расширениям;
+#   - ZIP-архивы — по членам, прямо из архива в память (core.archive);
+#     члены расходятся по воркерам как отдельные файлы;
+#   - проверка в пуле процессов (core.reader.check_file — та же логика,
+#     что у GUI: _read_any + шаблон + validate_document + summary);
+#   - результат — JSONL, одна строка на документ, пишется по мере готовности;
+#   - прогресс в stderr: документы, док/с, ETA.
+#   --pipeline — стадийный конвейер core.pipeline (потоки чтения → пул
+#   разбора → правила), в конце — счётчики по стадиям.
+#   Пулы — core.workers (forkserver с прогревом, перезапуск воркеров).
+#   --schedule fifo|sjf — порядок выдачи заданий воркерам (core.scheduling:
+#   сначала дешёвые по оценке, со старением); в конце — средняя и p95
+#   задержка документа. С --ordered — прежний imap в порядке входа.
+#   --store — записи ещё и в хранилище результатов (core.result_store).
+#   --triage — предварительный отсев входящих (core.reader.triage_file):
+#   только вердикт PASS/FAIL и код первой блокирующей ошибки, без
+#   сообщений, кэша и индекса дубликатов; в конце — сводка PASS/FAIL.
+# ============================================================
+
+from __future__ import annotations
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# core/ импортируется как пакет верхнего уровня (summary_engine: from core.validator ...);
+# ставим папку приложения первой, чтобы не подхватить посторонний core/
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if sys.path[:1] != [_APP_DIR]:
+    sys.path.insert(0, _APP_DIR)
+
+from core import archive, pipeline, reader, result_store, scheduling, workers as worker_pool  # noqa: E402
+
+DEFAULT_EXT = (".pdf", ".xlsx", ".xls")
+
+# --------------------------- обход ---------------------------
+
+def _scan_dir(path: str, exts: tuple, recursive: bool) -> Iterator[str]:
+    try:
+        it = os.scandir(path)
+    except OSError as e:
+        print(f"⚠ {path}: {e}", file=sys.stderr)
+        return
+    with it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _scan_dir(entry.path, exts, recursive)
+            elif entry.is_file() and entry.name.lower().endswith(exts):
+                yield entry.path
+        except OSError:
+            continue
+
+def _expand(paths: Iterable[str], exts: tuple, archives: bool) -> Iterator[str]:
+    for p in paths:
+        if archives and archive.is_archive(p):
+            try:
+                yield from archive.iter_members(p, exts)
+            except (OSError, archive.zipfile.BadZipFile) as e:
+                print(f"⚠ {p}: {e}", file=sys.stderr)
+        else:
+            yield p
+
+def collect_inputs(inputs: Iterable[str], exts: tuple = DEFAULT_EXT, recursive: bool = True,
+                   archives: bool = True) -> List[str]:
+    """
+    Папки, glob-шаблоны и файлы → список файлов (без повторов, в порядке аргументов).
+    ZIP-архивы разворачиваются в члены вида «архив.zip!имя» (без распаковки).
+    """
+    scan_exts = exts + archive.ARCHIVE_EXT if archives else exts
+    seen, out = set(), []
+    for arg in inputs:
+        if os.path.isdir(arg):
+            paths: Iterable[str] = _scan_dir(arg, scan_exts, recursive)
+        elif glob.has_magic(arg):
+            paths = (p for p in sorted(glob.glob(arg, recursive=True))
+                     if os.path.isfile(p) and p.lower().endswith(scan_exts))
+        else:
+            paths = [arg]
+        for p in _expand(paths, exts, archives):
+            key = os.path.abspath(p)
+            if key not in seen:
+                seen.add(key)
+                out.append(p)
+    return out
+
+# --------------------------- прогресс ---------------------------
+
+def _fmt_eta(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+class _Progress:
+    def __init__(self, total: int, enabled: bool = True, every: float = 0.5):
+        self.total, self.enabled, self.every = total, enabled, every
+        self.done = self.errors = 0
+        self.t0 = self._last = time.perf_counter()
+
+    def tick(self, failed: bool) -> None:
+        self.done += 1
+        self.errors += failed
+        now = time.perf_counter()
+        if self.enabled and (now - self._last >= self.every or self.done == self.total):
+            self._last = now
+            rate = self.done / max(now - self.t0, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0.0
+            print(f"\r… {self.done}/{self.total}  {rate:,.1f} док/с  ETA {_fmt_eta(eta)}  сбоев: {self.errors}",
+                  end="", file=sys.stderr, flush=True)
+
+    def finish(self) -> str:
+        dt = time.perf_counter() - self.t0
+        if self.enabled:
+            print(file=sys.stderr)
+        return (f"Проверено: {self.done}  сбоев: {self.errors}  время: {dt:.2f} с  "
+                f"({self.done / max(dt, 1e-9):,.1f} док/с)")
+
+# --------------------------- запуск ---------------------------
+
+def _run(paths: List[str], workers: int, ordered: bool, chunksize: int,
+         fn: Callable[[str], dict] = reader.check_file) -> Iterator[dict]:
+    if workers <= 1:
+        reader.warm_up()
+        for p in paths:
+            yield fn(p)
+        return
+    pool = worker_pool.make_mp_pool(workers)
+    try:
+        mapper = pool.imap if ordered else pool.imap_unordered
+        yield from mapper(fn, paths, chunksize)
+        pool.close()  # воркеры выходят сами (terminate убил бы их до выгрузки замеров)
+        pool.join()
+    finally:
+        pool.terminate()
+
+def _run_scheduled(paths: List[str], workers: int, policy: str, latencies: List[float],
+                   fn: Callable[[str], dict] = reader.check_file) -> Iterator[dict]:
+    """Выдача заданий по политике core.scheduling; задержки — в latencies."""
+    pool = worker_pool.make_pool(workers) if workers > 1 else None
+    if pool is None:
+        reader.warm_up()
+    try:
+        for rec, job in scheduling.run(paths, fn, pool, policy):
+            latencies.append(job.latency)
+            yield rec
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m ulyuly_checker.batch",
+                                 description="Пакетная проверка ЭСФ (PDF/XLSX) без GUI, результат — JSONL.")
+    ap.add_argument("inputs", nargs="+", help="папки, glob-шаблоны или файлы")
+    ap.add_argument("-o", "--out", default="-", help="файл JSONL (по умолчанию stdout)")
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                    help="процессов в пуле (1 — без пула; по умолчанию число ядер)")
+    ap.add_argument("--ext", default=",".join(DEFAULT_EXT),
+                    help="расширения через запятую (по умолчанию .pdf,.xlsx,.xls; .json — документы-JSON)")
+    ap.add_argument("--no-recursive", action="store_true", help="не заходить в подпапки")
+    ap.add_argument("--no-archives", action="store_true", help="не разворачивать ZIP-архивы")
+    ap.add_argument("--ordered", action="store_true", help="выводить в порядке входа (иначе по готовности)")
+    ap.add_argument("--chunksize", type=int, default=4, help="файлов на одну задачу пула (с --ordered)")
+    ap.add_argument("--schedule", choices=scheduling.POLICIES, default=scheduling.settings()["policy"],
+                    help="порядок проверки: fifo — как на входе, sjf — сначала короткие (со старением)")
+    ap.add_argument("--pipeline", action="store_true",
+                    help="стадийный конвейер: потоки чтения → пул разбора → правила")
+    ap.add_argument("--io-threads", type=int, default=4, help="потоков чтения для --pipeline")
+    ap.add_argument("--triage", action="store_true",
+                    help="только отсев: PASS/FAIL и код первой блокирующей ошибки (без сообщений)")
+    ap.add_argument("--store", action="store_true", default=result_store.settings()["enabled"],
+                    help="записать результаты в хранилище для запросов (python -m core.result_store)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="без строки прогресса")
+    args = ap.parse_args(argv)
+    if args.triage and args.pipeline:
+        ap.error("--triage и --pipeline несовместимы")
+
+    exts = tuple(e if e.startswith(".") else "." + e for e in
+                 (x.strip().lower() for x in args.ext.split(",")) if e)
+    paths = collect_inputs(args.inputs, exts, recursive=not args.no_recursive, archives=not args.no_archives)
+    if not paths:
+        print("Нет файлов для проверки.", file=sys.stderr)
+        return 2
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    progress = _Progress(len(paths), enabled=not args.quiet)
+    workers = max(1, min(args.workers, len(paths)))
+    pipe = None
+    latencies: List[float] = []
+    fn = reader.triage_file if args.triage else reader.check_file
+    if args.pipeline:
+        pipe = pipeline.Pipeline(io_threads=args.io_threads, parse_workers=workers, ordered=args.ordered)
+        records = pipe.run(paths)
+    elif args.ordered:
+        records = _run(paths, workers, args.ordered, max(1, args.chunksize), fn)
+    else:
+        records = _run_scheduled(paths, workers, args.schedule, latencies, fn)
+    store = result_store.Writer() if args.store and not args.triage else None  # в отсеве нет результатов
+    verdicts = {"PASS": 0, "FAIL": 0}
+    try:
+        for rec in records:
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+            if store is not None:
+                store.add(rec)
+            if "triage" in rec:
+                verdicts[rec["triage"]] += 1
+            progress.tick("error" in rec)
+    except KeyboardInterrupt:
+        print("\nПрервано.", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if store is not None:
+            store.close()
+    print(progress.finish(), file=sys.stderr)
+    if args.triage:
+        print(f"  отсев: PASS {verdicts['PASS']}, FAIL {verdicts['FAIL']}", file=sys.stderr)
+    if latencies and not args.quiet:
+        lat = scheduling.latency_summary(latencies)
+        print(f"  задержка ({args.schedule}): средняя {lat['mean_ms']:.1f} мс, p95 {lat['p95_ms']:.1f} мс, "
+              f"макс {lat['max_ms']:.1f} мс", file=sys.stderr)
+    if pipe is not None and not args.quiet:
+        for name, st in pipe.stats().items():
+            print(f"  {name:6s} " + "  ".join(f"{k}={v}" for k, v in st.items()), file=sys.stderr)
+    return 1 if progress.errors else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+# ============================================================
+# archive.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: документы внутри ZIP без распаковки на диск.
+#   Член архива адресуется путём «<архив.zip>!<имя внутри>» — такой путь
+#   проходит через batch/pipeline/GUI как обычный, а reader.read_bytes
+#   читает член прямо из архива в память (ридеры принимают BytesIO).
+#   Открытые ZipFile кэшируются по процессу и потоку: тысяча членов
+#   одного архива в воркере — одно открытие и один разбор оглавления.
+#   Путь делится по «.zip!», только если часть до него — существующий
+#   файл («Счета.zip!/x.pdf» в имени папки — обычный путь). Член больше
+#   archive.max_member_mb (размер из оглавления) не читается — защита
+#   от zip-бомб; zipfile не отдаёт больше заявленного размера.
+# ============================================================
+
+from __future__ import annotations
+import os
+import threading
+import zipfile
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import utils
+
+ARCHIVE_EXT = (".zip",)
+SEP = "!"
+
+_LOCAL = threading.local()
+_MAX_OPEN = 8
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("archive", {}) or {}
+    return {"max_member_mb": float(sect.get("max_member_mb", 100) or 0)}
+
+def is_archive(path: str) -> bool:
+    return str(path).lower().endswith(ARCHIVE_EXT) and split(path) is None
+
+def member_path(archive: str, member: str) -> str:
+    return f"{archive}{SEP}{member}"
+
+def split(path: str) -> Optional[Tuple[str, str]]:
+    """
+    «a.zip!dir/x.pdf» → ("a.zip", "dir/x.pdf"); None — обычный путь
+    (нет «.zip!» или часть до него — не файл).
+    """
+    s = str(path)
+    low = s.lower()
+    for ext in ARCHIVE_EXT:
+        i = low.find(ext + SEP)
+        while i >= 0:
+            cut = i + len(ext)
+            if os.path.isfile(s[:cut]):
+                return s[:cut], s[cut + 1:]
+            i = low.find(ext + SEP, cut)
+    return None
+
+def _open(archive: str) -> zipfile.ZipFile:
+    cache: Dict[Tuple[str, int], zipfile.ZipFile] = getattr(_LOCAL, "zips", None)
+    pid = os.getpid()
+    if cache is None or getattr(_LOCAL, "pid", None) != pid:
+        cache = _LOCAL.zips = {}
+        _LOCAL.pid = pid
+    st = os.stat(archive)
+    key = (os.path.abspath(archive), st.st_mtime_ns)
+    zf = cache.get(key)
+    if zf is None:
+        if len(cache) >= _MAX_OPEN:
+            for old in list(cache.values()):
+                old.close()
+            cache.clear()
+        zf = cache[key] = zipfile.ZipFile(archive)
+    return zf
+
+def iter_members(archive: str, exts: Tuple[str, ...]) -> Iterator[str]:
+    """Пути членов архива с нужными расширениями (каталоги и __MACOSX — мимо)."""
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/"):
+                continue
+            if name.lower().endswith(exts):
+                yield member_path(archive, name)
+
+def read_member(path: str) -> bytes:
+    archive, member = split(path)  # type: ignore[misc]
+    zf = _open(archive)
+    limit = settings()["max_member_mb"]
+    size = zf.getinfo(member).file_size
+    if limit and size > limit * 1024 * 1024:
+        raise ValueError(f"член архива {member}: {size / 2**20:.1f} МБ — больше "
+                         f"archive.max_member_mb ({limit:g} МБ)")
+    return zf.read(member)
+
+def member_size(path: str) -> int:
+    archive, member = split(path)  # type: ignore[misc]
+    return _open(archive).getinfo(member).file_size
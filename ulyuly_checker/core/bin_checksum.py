@@ -0,0 +1,178 @@
+# ============================================================
+# bin_checksum.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: отдельный модуль контрольной суммы БИН/ИИН (KZ mod-11).
+#   Причина: _kz_mod11_checksum_valid строил список int и два генератора
+#            на каждый БИН, а BIN012 зовёт его на каждом документе.
+#   - is_valid():        одиночная проверка с LRU-кэшем;
+#   - validate_many():   массив БИНов разом (NumPy: матрица цифр uint8,
+#                        обе серии весов — матричные произведения);
+#   - CLI:               потоковая проверка реестров контрагентов
+#                        (миллионы строк, CSV/TXT) блоками.
+# [2026-10-19] perf: NumPy импортируется при первой проверке массива, а не
+#   на импорте модуля — rules_engine (и окно GUI) его не ждут (~200 мс).
+# ============================================================
+
+from __future__ import annotations
+import csv
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+_W1 = tuple(range(1, 12))   # первая серия весов 1..11
+_W2 = tuple(range(3, 14))   # вторая серия (если первый остаток = 10): 3..11,1,2 ≡ 3..13 mod 11
+
+_np: Any = None  # numpy — опциональная зависимость; False — не установлен
+_W1_NP = _W2_NP = None
+
+def _numpy():
+    """Модуль numpy (импорт при первом вызове) или None."""
+    global _np, _W1_NP, _W2_NP
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            _np = False
+        else:
+            _W1_NP = numpy.arange(1, 12, dtype=numpy.int32)
+            _W2_NP = numpy.arange(3, 14, dtype=numpy.int32)
+            _np = numpy
+    return _np or None
+
+# --------------------------- одиночный БИН ---------------------------
+
+def _digits(value: Any) -> str:
+    s = value if isinstance(value, str) else str(value or "")
+    if s.isdigit():  # частый случай: реестр уже без разделителей
+        return s
+    return "".join(ch for ch in s if ch.isdigit())
+
+@lru_cache(maxsize=65536)
+def _valid_digits(d: str) -> bool:
+    nums = [int(c) for c in d]
+    control = nums[11]
+    r1 = sum(n * w for n, w in zip(nums, _W1)) % 11
+    if r1 != 10:
+        return control == r1
+    return control == sum(n * w for n, w in zip(nums, _W2)) % 11
+
+def is_valid(bin12: Any) -> bool:
+    """Контрольная сумма одного БИН/ИИН (нецифровые символы отбрасываются)."""
+    d = _digits(bin12)
+    if len(d) != 12:
+        return False
+    return _valid_digits(d)
+
+# --------------------------- массивы ---------------------------
+
+def digit_matrix(bins12: Sequence[str]):
+    """Матрица (n, 12) uint8 из строк ровно по 12 ASCII-цифр."""
+    np = _numpy()
+    buf = "".join(bins12).encode("ascii")
+    return (np.frombuffer(buf, dtype=np.uint8) - 48).reshape(-1, 12)
+
+def valid_matrix(d):
+    """KZ mod-11 для матрицы цифр (n, 12) → булев вектор."""
+    np = _numpy()
+    body = d[:, :11].astype(np.int32)
+    control = d[:, 11].astype(np.int32)
+    r1 = (body @ _W1_NP) % 11
+    r2 = (body @ _W2_NP) % 11
+    return np.where(r1 != 10, control == r1, control == r2)
+
+def validate_many(values: Iterable[Any]):
+    """
+    Проверка массива БИНов. Возвращает np.ndarray[bool] (или list[bool] без NumPy).
+    Строки не из 12 цифр (после отбрасывания разделителей) — False.
+    """
+    digits = [_digits(v) for v in values]
+    np = _numpy()
+    if np is None:
+        return [len(d) == 12 and _valid_digits(d) for d in digits]
+    out = np.zeros(len(digits), dtype=bool)
+    idx = []
+    for i, d in enumerate(digits):
+        if len(d) != 12:
+            continue
+        if d.isascii():
+            idx.append(i)
+        else:  # юникодные цифры (²,٣…) — только поштучно
+            try:
+                out[i] = _valid_digits(d)
+            except ValueError:
+                pass
+    if idx:
+        out[idx] = valid_matrix(digit_matrix([digits[i] for i in idx]))
+    return out
+
+# --------------------------- CLI ---------------------------
+
+def _iter_column(path: str, column: Optional[str], delimiter: str, encoding: str) -> Iterator[List[str]]:
+    """
+    (номер строки файла, значение, исходная строка) — потоково, без загрузки
+    файла целиком. Номер — по reader.line_num: с учётом заголовка и
+    многострочных полей в кавычках (первая строка записи).
+    """
+    with open(path, "r", encoding=encoding, newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        col_idx = 0
+        if column is not None:
+            if column.isdigit():
+                col_idx = int(column)
+            else:
+                header = next(reader, [])
+                try:
+                    col_idx = header.index(column)
+                except ValueError:
+                    raise SystemExit(f"Колонка не найдена: {column}")
+        start = reader.line_num + 1
+        for row in reader:
+            yield [str(start), row[col_idx] if col_idx < len(row) else "", delimiter.join(row)]
+            start = reader.line_num + 1
+
+def _chunks(it: Iterator[List[str]], size: int) -> Iterator[List[List[str]]]:
+    buf: List[List[str]] = []
+    for x in it:
+        buf.append(x)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="Проверка контрольной суммы БИН/ИИН в реестре (CSV/TXT).")
+    ap.add_argument("path", help="файл реестра")
+    ap.add_argument("--column", help="имя или номер колонки с БИН (по умолчанию 0, без заголовка)")
+    ap.add_argument("--delimiter", default=";", help="разделитель CSV (по умолчанию ';')")
+    ap.add_argument("--encoding", default="utf-8-sig")
+    ap.add_argument("--chunk", type=int, default=200_000, help="строк в блоке")
+    ap.add_argument("--invalid-out", help="записать невалидные строки в файл")
+    args = ap.parse_args(argv)
+
+    total = bad = 0
+    t0 = time.perf_counter()
+    out = open(args.invalid_out, "w", encoding="utf-8") if args.invalid_out else None
+    try:
+        for block in _chunks(_iter_column(args.path, args.column, args.delimiter, args.encoding), args.chunk):
+            ok = validate_many(v for _, v, _ in block)
+            for (lineno, value, raw), good in zip(block, ok):
+                if not good:
+                    bad += 1
+                    if out is not None:
+                        out.write(f"{lineno}\t{value}\t{raw}\n")
+            total += len(block)
+            rate = total / max(time.perf_counter() - t0, 1e-9)
+            print(f"\r… {total:,} строк ({rate:,.0f}/с)", end="", file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+    dt = time.perf_counter() - t0
+    print(file=sys.stderr)
+    print(f"Проверено: {total:,}  невалидных: {bad:,}  время: {dt:.2f} с")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,277 @@
+# ============================================================
+# check_queue.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: очередь проверок для GUI (main.py).
+#   Раньше каждый перетащенный файл запускал свой поток: 50 файлов —
+#   50 потоков наперегонки, на экране оставался результат последнего
+#   закончившего. Теперь файлы встают в очередь (FIFO), её разбирают
+#   workers потоков (config.json → "gui_queue"). У каждого файла своя
+#   запись (Entry): состояние, результат или текст сбоя, время.
+#   Порядок записей — порядок постановки, от скорости проверки не зависит.
+#   Отмена: ожидающие снимаются сразу; выполняющиеся дорабатывают
+#   (разбор PDF не прервать), результат отбрасывается; длинные задания
+#   (архив) смотрят entry.cancelled между документами. Повтор — для
+#   завершённых записей (сбой, отмена, перепроверка). progress() —
+#   сводка по текущей «порции»: от простоя очереди до простоя.
+#   on_change(entry) вызывается из потока воркера — GUI перекладывает
+#   его в свой поток (root.after).
+#   python -m core.check_queue [папка] [-w N] — проверка очереди на
+#   образцах: порядок, отмена, повтор.
+# ============================================================
+
+from __future__ import annotations
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from . import utils
+
+QUEUED, RUNNING, CANCELLING, DONE, FAILED, CANCELLED = (
+    "queued", "running", "cancelling", "done", "failed", "cancelled")
+FINISHED = (DONE, FAILED, CANCELLED)
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("gui_queue", {}) or {}
+    return {"workers": max(1, int(sect.get("workers", 2) or 1))}
+
+class Entry:
+    """Один файл в очереди. Поля меняет только очередь (под её блокировкой)."""
+    __slots__ = ("id", "path", "state", "result", "error", "attempts", "elapsed_s",
+                 "done_units", "total_units", "_queue")
+
+    def __init__(self, eid: int, path: str, queue: "CheckQueue"):
+        self.id, self.path, self._queue = eid, path, queue
+        self.state = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.elapsed_s = 0.0
+        self.done_units, self.total_units = 0, 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.state in (CANCELLING, CANCELLED)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED
+
+    def report(self, done: int, total: int) -> None:
+        """Ход длинного задания (документов архива): done из total."""
+        self.done_units, self.total_units = done, total
+        self._queue._notify(self)
+
+    def __repr__(self) -> str:
+        return f"Entry({self.id}, {self.path!r}, {self.state})"
+
+class CheckQueue:
+    """FIFO-очередь файлов и фиксированный пул потоков, выполняющих fn(entry)."""
+
+    def __init__(self, fn: Callable[[Entry], Any], workers: int = 2,
+                 on_change: Optional[Callable[[Entry], None]] = None):
+        self.fn, self.workers, self.on_change = fn, max(1, workers), on_change
+        self._entries: Dict[int, Entry] = {}  # в порядке постановки
+        self._pending: Deque[Entry] = deque()
+        self._batch: List[Entry] = []  # текущая порция — для progress()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    # ---------- управление ----------
+    def submit(self, paths: Iterable[str]) -> List[Entry]:
+        with self._cond:
+            new = [Entry(next(self._ids), p, self) for p in paths]
+            for e in new:
+                self._entries[e.id] = e
+            self._enqueue(new)
+        for e in new:
+            self._notify(e)
+        return new
+
+    def cancel(self, ids: Optional[Iterable[int]] = None) -> List[Entry]:
+        """Отменить записи (None — все незавершённые); → изменённые."""
+        with self._cond:
+            touched = []
+            for e in self._select(ids):
+                if e.state == QUEUED:
+                    self._pending.remove(e)
+                    e.state = CANCELLED
+                elif e.state == RUNNING:
+                    e.state = CANCELLING
+                else:
+                    continue
+                touched.append(e)
+            self._cond.notify_all()
+        for e in touched:
+            self._notify(e)
+        return touched
+
+    def retry(self, ids: Optional[Iterable[int]] = None) -> List[Entry]:
+        """
+        Поставить завершённые записи в конец очереди заново (None — все
+        со сбоем или отменённые). Место записи в списке не меняется.
+        """
+        with self._cond:
+            if ids is None:
+                again = [e for e in self._entries.values() if e.state in (FAILED, CANCELLED)]
+            else:
+                again = [e for e in self._select(ids) if e.finished]
+            self._enqueue(again)
+        for e in again:
+            self._notify(e)
+        return again
+
+    def remove_finished(self, ids: Optional[Iterable[int]] = None) -> List[Entry]:
+        """Убрать завершённые записи из списка; → убранные."""
+        with self._cond:
+            gone = [e for e in self._select(ids) if e.finished]
+            for e in gone:
+                del self._entries[e.id]
+            self._batch = [e for e in self._batch if e.id in self._entries]
+        return gone
+
+    def close(self, cancel: bool = True) -> None:
+        """Остановить воркеров (ожидающие — отменить)."""
+        if cancel:
+            self.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # ---------- состояние ----------
+    def get(self, eid: int) -> Optional[Entry]:
+        return self._entries.get(eid)
+
+    def entries(self) -> List[Entry]:
+        with self._cond:
+            return list(self._entries.values())
+
+    @property
+    def busy(self) -> bool:
+        with self._cond:
+            return self._busy()
+
+    def progress(self) -> Dict[str, Any]:
+        """Сводка по текущей порции: число записей по состояниям и доля готового (0..1)."""
+        with self._cond:
+            out: Dict[str, Any] = {s: 0 for s in (QUEUED, RUNNING, CANCELLING) + FINISHED}
+            units = 0.0
+            for e in self._batch:
+                out[e.state] += 1
+                if e.finished:
+                    units += 1.0
+                elif e.total_units:
+                    units += min(1.0, e.done_units / e.total_units)
+            out["total"] = len(self._batch)
+            out["fraction"] = units / len(self._batch) if self._batch else 1.0
+            out["busy"] = self._busy()
+            return out
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться простоя очереди; False — истёк timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy(), timeout)
+
+    # ---------- внутреннее ----------
+    def _select(self, ids: Optional[Iterable[int]]) -> List[Entry]:
+        if ids is None:
+            return list(self._entries.values())
+        return [self._entries[i] for i in sorted(set(ids)) if i in self._entries]
+
+    def _busy(self) -> bool:
+        return any(not e.finished for e in self._batch)
+
+    def _enqueue(self, entries: List[Entry]) -> None:
+        """Под self._cond."""
+        if not entries:
+            return
+        if not self._busy():
+            self._batch = []  # прошлая порция закончилась — счёт заново
+        for e in entries:
+            e.state, e.result, e.error = QUEUED, None, None
+            e.done_units = e.total_units = 0
+        self._batch.extend(e for e in entries if e not in self._batch)
+        self._pending.extend(entries)
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"check-{len(self._threads) + 1}", daemon=True)
+            self._threads.append(t)
+            t.start()
+        self._cond.notify(len(entries))
+
+    def _notify(self, e: Entry) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change(e)
+            except Exception:
+                pass  # сбой отображения не должен ронять воркера
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                e = self._pending.popleft()
+                e.state = RUNNING
+                e.attempts += 1
+            self._notify(e)
+            t0 = time.perf_counter()
+            result, error = None, None
+            try:
+                result = self.fn(e)
+            except Exception as ex:
+                error = str(ex) or ex.__class__.__name__
+            with self._cond:
+                e.elapsed_s = time.perf_counter() - t0
+                if e.state == CANCELLING:
+                    e.state = CANCELLED
+                elif error is None:
+                    e.state, e.result = DONE, result
+                else:
+                    e.state, e.error = FAILED, error
+                self._cond.notify_all()
+            self._notify(e)
+
+if __name__ == "__main__":
+    import argparse, glob, os, sys
+    from . import reader
+    ap = argparse.ArgumentParser(prog="python -m core.check_queue")
+    ap.add_argument("folder", nargs="?", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "synthetic_esf_visual", "invoices"))
+    ap.add_argument("-w", "--workers", type=int, default=settings()["workers"])
+    args = ap.parse_args()
+    paths = sorted(p for p in glob.glob(os.path.join(args.folder, "*")) if p.lower().endswith(reader.SUPPORTED_EXT))
+    if not paths:
+        print(f"Нет документов в {args.folder}", file=sys.stderr)
+        raise SystemExit(2)
+    reader.warm_up()
+
+    def job(e: Entry) -> Dict[str, Any]:
+        rec = reader.check_file(e.path)
+        if "error" in rec:
+            raise ValueError(rec["error"])
+        return rec
+
+    q = CheckQueue(job, workers=args.workers)
+    t0 = time.perf_counter()
+    entries = q.submit(paths)
+    tail = [e.id for e in entries[len(entries) // 2:]]
+    q.cancel(tail)  # вторая половина: ожидающие снимаются, выполняющиеся дорабатывают впустую
+    q.wait()
+    p = q.progress()
+    print(f"{len(paths)} файлов, {args.workers} потоков: готово {p[DONE]}, сбоев {p[FAILED]}, "
+          f"отменено {p[CANCELLED]} за {time.perf_counter() - t0:.2f} с")
+    q.retry(tail)
+    q.wait()
+    p = q.progress()
+    print(f"повтор {len(tail)}: готово {p[DONE]}, сбоев {p[FAILED]}, доля {p['fraction']:.0%}")
+    order = [e.path for e in q.entries()]
+    assert order == paths, "порядок записей не совпадает с порядком постановки"
+    assert all(e.finished for e in q.entries()) and not q.busy
+    assert all(e.result["path"] == e.path for e in q.entries() if e.state == DONE)
+    print("порядок OK, все записи завершены")
+    q.close()
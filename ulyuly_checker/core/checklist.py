@@ -0,0 +1,157 @@
+# ============================================================
+# checklist.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: скомпилированные снимки чек-листов.
+#   Причина: rules_engine на импорте разбирал checklist_full_v2.7.json
+#            через json.load, а старые версии (v2, v2.6, full) вообще
+#            нельзя было подгрузить без копирования путей.
+#   - снимок = marshal (формат, версия Python, mtime_ns, размер,
+#     sha1 исходника, данные) в data/cache/; при совпадении mtime/размера
+#     читается без разбора JSON;
+#   - изменился mtime, но не содержимое (git checkout, копирование) —
+#     сверяем sha1 и просто переписываем снимок;
+#   - версии грузятся лениво, по первому запросу, и живут в памяти.
+# ============================================================
+
+from __future__ import annotations
+import hashlib
+import json
+import marshal
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_FORMAT = 1
+DEFAULT_VERSION = "2.7"
+
+def _core_dir() -> str:
+    return os.path.dirname(os.path.abspath(__file__))
+
+def _project_root() -> str:
+    return os.path.abspath(os.path.join(_core_dir(), ".."))
+
+# версия → кандидаты исходника (первый существующий)
+_SOURCES: Dict[str, List[str]] = {
+    "2.7": [os.path.join(_core_dir(), "rules", "checklist_full_v2.7.json"),
+            os.path.join(_core_dir(), "checklist_full_v2.7.json")],
+    "2.6": [os.path.join(_core_dir(), "rules", "checklist_full_v2.6.json")],
+    "2": [os.path.join(_core_dir(), "rules", "checklist_full_v2.json")],
+    "full": [os.path.join(_core_dir(), "rules", "checklist_full.json")],
+}
+
+_CACHE_DIR = os.path.join(_project_root(), "data", "cache")
+_LOADED: Dict[str, Dict[str, Any]] = {}
+_DIGESTS: Dict[str, str] = {}
+_LOCK = threading.Lock()
+
+# --------------------------- пути ---------------------------
+
+def available() -> List[str]:
+    """Версии, для которых есть исходный JSON."""
+    return [v for v, paths in _SOURCES.items() if any(os.path.exists(p) for p in paths)]
+
+def source_path(version: str = DEFAULT_VERSION) -> Optional[str]:
+    for p in _SOURCES.get(_norm_version(version), []):
+        if os.path.exists(p):
+            return p
+    return None
+
+def _norm_version(version: str) -> str:
+    v = str(version or DEFAULT_VERSION).strip().lower().lstrip("v")
+    if v.startswith("2.7"):
+        return "2.7"
+    return "2" if v == "2.5" else v  # checklist_full_v2.json помечен как v2.5
+
+def _snapshot_path(version: str) -> str:
+    tag = f"cp{sys.version_info[0]}{sys.version_info[1]}"
+    return os.path.join(_CACHE_DIR, f"checklist_v{version}.{tag}.marshal")
+
+# --------------------------- снимки ---------------------------
+
+def _read_snapshot(path: str) -> Optional[Tuple]:
+    try:
+        with open(path, "rb") as f:
+            snap = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snap, tuple) or len(snap) != 6 or snap[0] != _FORMAT:
+        return None
+    return snap
+
+def _write_snapshot(path: str, st: os.stat_result, digest: str, data: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            marshal.dump((_FORMAT, sys.version_info[:2], st.st_mtime_ns, st.st_size, digest, data), f)
+        os.replace(tmp, path)  # атомарно: параллельный процесс видит старый или новый снимок
+    except (OSError, ValueError):
+        pass  # нет прав на data/cache — работаем без снимка
+
+def _compile(version: str) -> Dict[str, Any]:
+    src = source_path(version)
+    if src is None:
+        return {}
+    st = os.stat(src)
+    snap_path = _snapshot_path(version)
+    snap = _read_snapshot(snap_path)
+    if snap is not None and snap[2] == st.st_mtime_ns and snap[3] == st.st_size:
+        _DIGESTS[version] = snap[4]
+        return snap[5]
+    with open(src, "rb") as f:
+        raw = f.read()
+    digest = _DIGESTS[version] = hashlib.sha1(raw).hexdigest()
+    if snap is not None and snap[4] == digest:
+        data = snap[5]  # содержимое то же — обновляем только отметку времени
+    else:
+        data = json.loads(raw.decode("utf-8"))
+    _write_snapshot(snap_path, st, digest, data)
+    return data
+
+# --------------------------- API ---------------------------
+
+def load(version: str = DEFAULT_VERSION) -> Dict[str, Any]:
+    """Чек-лист целиком (как json.load исходника). Повторные вызовы — из памяти."""
+    v = _norm_version(version)
+    data = _LOADED.get(v)
+    if data is None:
+        with _LOCK:
+            data = _LOADED.get(v)
+            if data is None:
+                data = _LOADED[v] = _compile(v)
+    return data
+
+def rules(version: str = DEFAULT_VERSION) -> Dict[str, Any]:
+    """Словарь правил; старый checklist_full.json хранит правила без обёртки "rules"."""
+    data = load(version)
+    if "rules" in data and isinstance(data["rules"], dict):
+        return data["rules"]
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+def digest(version: str = DEFAULT_VERSION) -> str:
+    """sha1 исходного JSON версии ("" — версии нет); для ключей кэша результатов."""
+    v = _norm_version(version)
+    load(v)
+    return _DIGESTS.get(v, "")
+
+def invalidate(version: Optional[str] = None) -> None:
+    """Сбросить версию (или все) из памяти; снимок на диске проверится заново."""
+    with _LOCK:
+        if version is None:
+            _LOADED.clear()
+        else:
+            _LOADED.pop(_norm_version(version), None)
+
+if __name__ == "__main__":
+    import time
+    for v in available():
+        t0 = time.perf_counter()
+        with open(source_path(v), "r", encoding="utf-8") as f:
+            ref = json.load(f)
+        t1 = time.perf_counter()
+        invalidate(v)
+        got = load(v)
+        t2 = time.perf_counter()
+        assert got == ref, f"снимок v{v} расходится с исходником"
+        print(f"v{v}: правил {len(rules(v)):3d}; json.load {(t1 - t0) * 1e3:.3f} мс, снимок {(t2 - t1) * 1e3:.3f} мс")
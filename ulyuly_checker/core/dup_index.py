@@ -0,0 +1,244 @@
+# ============================================================
+# dup_index.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: индекс дубликатов счетов.
+#   Один и тот же счёт мог пройти проверку дважды: тот же файл повторно
+#   или пара PDF/XLSX одного документа. Индекс (SQLite, WAL) хранит для
+#   каждого проверенного пути хэш файла и деловой ключ
+#   (rules_engine.business_key: БИН поставщика | БИН покупателя | дата |
+#   итог в тиынах); поиск — по индексам на обоих столбцах.
+#   reader дополняет результат кодом DUP001, если другой путь уже
+#   дал тот же хэш или тот же ключ; запись пополняется на каждой проверке.
+#   Поиск и добавление — одна транзакция (BEGIN IMMEDIATE), так что два
+#   воркера с одной парой документов не пропустят друг друга.
+#   seen — время первой проверки пути (повторная проверка его не сдвигает),
+#   совпадения — по (seen, path): текст DUP001 одинаков от прогона к прогону.
+#   python -m core.dup_index build <папка|zip> [-w N] — построить индекс
+#   пакетом; stats; find <файл>.
+#   Настройки: config.json → "duplicates": {"enabled", "path"}.
+# ============================================================
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import utils
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    path      TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    bkey      TEXT NOT NULL,
+    seen      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_hash ON docs(file_hash);
+CREATE INDEX IF NOT EXISTS docs_bkey ON docs(bkey) WHERE bkey != '';
+"""
+_MAX_MATCHES = 5
+# seen при повторной проверке не меняется — порядок совпадений стабилен
+_UPSERT = ("INSERT INTO docs(path, file_hash, bkey, seen) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT(path) DO UPDATE SET file_hash = excluded.file_hash, bkey = excluded.bkey")
+
+def _core_dir() -> str:
+    return os.path.dirname(os.path.abspath(__file__))
+
+def norm_path(path: str) -> str:
+    """Абсолютный путь; у члена архива — абсолютный путь архива."""
+    from . import archive
+    parts = archive.split(path)
+    if parts is not None:
+        return archive.member_path(os.path.abspath(parts[0]), parts[1])
+    return os.path.abspath(path)
+
+class DupIndex:
+    """path → (хэш файла, деловой ключ); поиск других путей с тем же хэшем или ключом."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def key_for_hash(self, fhash: str) -> Optional[str]:
+        """Деловой ключ ранее виденного содержимого; None — хэш не встречался."""
+        row = self._conn().execute("SELECT bkey FROM docs WHERE file_hash = ? LIMIT 1", (fhash,)).fetchone()
+        return row[0] if row else None
+
+    def find(self, path: str, fhash: str, bkey: str) -> List[Tuple[str, str]]:
+        """Другие пути с тем же содержимым ("file") или тем же деловым ключом ("key")."""
+        rows = self._conn().execute(
+            "SELECT path, file_hash FROM docs WHERE path != ? AND (file_hash = ? OR (bkey = ? AND bkey != '')) "
+            "ORDER BY seen, path LIMIT ?", (path, fhash, bkey or "", _MAX_MATCHES)).fetchall()
+        return [(p, "file" if h == fhash else "key") for p, h in rows]
+
+    def check_and_add(self, path: str, fhash: str, bkey: str) -> List[Tuple[str, str]]:
+        """find() + запись документа — атомарно."""
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            found = self.find(path, fhash, bkey)
+            db.execute(_UPSERT, (path, fhash, bkey or "", time.time()))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return found
+
+    def add_many(self, rows: Iterable[Tuple[str, str, str]]) -> int:
+        """Пакетная запись (path, хэш, ключ) одной транзакцией."""
+        now = time.time()
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cur = db.executemany(_UPSERT, ((p, h, k or "", now) for p, h, k in rows))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return cur.rowcount
+
+    def remove(self, path: str) -> None:
+        """Путь; для архива — и все его члены («a.zip!…»)."""
+        self._conn().execute("DELETE FROM docs WHERE path = ? OR (path >= ? AND path < ?)",
+                             (path, path + "!", path + chr(ord("!") + 1)))
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._conn()
+        n, = db.execute("SELECT COUNT(*) FROM docs").fetchone()
+        keyed, = db.execute("SELECT COUNT(*) FROM docs WHERE bkey != ''").fetchone()
+        dup_files, = db.execute("SELECT COUNT(*) FROM (SELECT file_hash FROM docs GROUP BY file_hash "
+                                "HAVING COUNT(*) > 1)").fetchone()
+        dup_keys, = db.execute("SELECT COUNT(*) FROM (SELECT bkey FROM docs WHERE bkey != '' GROUP BY bkey "
+                               "HAVING COUNT(*) > 1)").fetchone()
+        return {"path": self.path, "documents": n, "with_key": keyed,
+                "duplicate_files": dup_files, "duplicate_keys": dup_keys}
+
+# --------------------------- по умолчанию ---------------------------
+
+_DEFAULT: Optional[DupIndex] = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default() -> Optional[DupIndex]:
+    """Индекс из config.json ("duplicates"); None — выключен или недоступен."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                sect = utils.load_config().get("duplicates", {}) or {}
+                if not sect.get("enabled", True):
+                    _DEFAULT = False  # type: ignore[assignment]
+                else:
+                    path = sect.get("path") or os.path.join("data", "dup_index.sqlite")
+                    if not os.path.isabs(path):
+                        path = os.path.join(os.path.dirname(_core_dir()), path)
+                    try:
+                        _DEFAULT = DupIndex(path)
+                    except (sqlite3.Error, OSError):
+                        _DEFAULT = False  # type: ignore[assignment]
+    return _DEFAULT or None
+
+def key_for_hash(fhash: Optional[str]) -> Optional[str]:
+    idx = default()
+    if idx is None or not fhash:
+        return ""
+    try:
+        return idx.key_for_hash(fhash)
+    except sqlite3.Error:
+        return ""
+
+def check(path: str, fhash: Optional[str], bkey: Optional[str]) -> List[Tuple[str, str]]:
+    """Совпадения для документа и его запись в индекс; [] — индекс выключен."""
+    idx = default()
+    if idx is None or not fhash:
+        return []
+    try:
+        return idx.check_and_add(norm_path(path), fhash, bkey or "")
+    except sqlite3.Error:
+        return []
+
+def forget(paths: Iterable[str]) -> None:
+    """Убрать удалённые / перемещённые файлы — иначе их новый путь выглядел бы дубликатом."""
+    idx = default()
+    if idx is None:
+        return
+    try:
+        for p in paths:
+            idx.remove(norm_path(p))
+    except sqlite3.Error:
+        pass
+
+# --------------------------- пакетная сборка ---------------------------
+
+def _key_job(path: str) -> Tuple[str, Optional[str], str]:
+    """(путь, хэш, деловой ключ) — в воркере пула; хэш None — файл не прочитан."""
+    from . import reader, result_cache, rules_engine
+    try:
+        raw = reader.read_bytes(path)
+        data = reader.read_any(path, raw)
+        bkey = "" if ("error" in data and len(data) == 1) else rules_engine.business_key(data)
+        return path, result_cache.data_hash(raw), bkey
+    except Exception:
+        return path, None, ""
+
+def build(paths: List[str], workers: int = 1, index: Optional[DupIndex] = None) -> int:
+    """Добавить документы в индекс пакетом (разбор в пуле, запись одной транзакцией)."""
+    idx = index or default()
+    if idx is None:
+        return 0
+    if workers > 1:
+        from . import workers as worker_pool
+        with worker_pool.make_pool(workers) as pool:
+            rows = list(pool.map(_key_job, paths, chunksize=8))
+    else:
+        rows = [_key_job(p) for p in paths]
+    return idx.add_many((norm_path(p), h, k) for p, h, k in rows if h)
+
+if __name__ == "__main__":
+    import argparse, json, sys
+    from . import archive, reader
+    ap = argparse.ArgumentParser(prog="python -m core.dup_index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="добавить в индекс папки / файлы / ZIP")
+    b.add_argument("inputs", nargs="+")
+    b.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    sub.add_parser("stats", help="размер индекса и число дубликатов")
+    f = sub.add_parser("find", help="дубликаты для файла (без записи в индекс)")
+    f.add_argument("path")
+    args = ap.parse_args()
+    idx = default()
+    if idx is None:
+        print("Индекс дубликатов выключен (config.json → duplicates.enabled).", file=sys.stderr)
+        raise SystemExit(2)
+    if args.cmd == "build":
+        files: List[str] = []
+        for arg in args.inputs:
+            for dirpath, _, names in (os.walk(arg) if os.path.isdir(arg) else [("", None, [arg])]):
+                for name in sorted(names):
+                    p = os.path.join(dirpath, name)
+                    if archive.is_archive(p):
+                        files.extend(archive.iter_members(p, reader.SUPPORTED_EXT))
+                    elif p.lower().endswith(reader.SUPPORTED_EXT):
+                        files.append(p)
+        t0 = time.perf_counter()
+        n = build(files, max(1, args.workers), idx)
+        print(f"Добавлено: {n} из {len(files)} за {time.perf_counter() - t0:.2f} с", file=sys.stderr)
+        args.cmd = "stats"
+    if args.cmd == "stats":
+        print(json.dumps(idx.stats(), ensure_ascii=False, indent=2))
+    elif args.cmd == "find":
+        _, fhash, bkey = _key_job(args.path)
+        print(json.dumps({"file_hash": fhash, "business_key": bkey,
+                          "matches": idx.find(norm_path(args.path), fhash or "", bkey)},
+                         ensure_ascii=False, indent=2))
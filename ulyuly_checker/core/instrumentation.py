@@ -0,0 +1,266 @@
+# ============================================================
+# instrumentation.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: замеры правил (по желанию, из конфига).
+#   run_all_rules оборачивал каждое правило в try/except, но ничего не
+#   записывал о стоимости. Здесь копятся: гистограмма времени и число
+#   вызовов на правило, распределение уровней результатов, число
+#   исключений, а также время резолва полей из структурных данных
+#   против текстовых фолбэков.
+#   Выключено — одна проверка флага ENABLED на правило.
+#   Включение: config.json → "instrumentation": {"enabled": true,
+#   "dump_path": "data/rules_stats.json"} (dump_path — выгрузка при выходе).
+#   Флаг из конфига применяется при запуске; смена правил в GUI его не
+#   трогает (переключатель «Замер времени правил» — set_enabled()).
+#   Воркеры пулов (batch, pipeline, service; core.workers) копят замеры
+#   у себя и при выходе пишут <dump_path>.w<pid>.json; главный процесс
+#   при своей выгрузке вливает эти файлы в общий итог и удаляет их.
+# ============================================================
+
+from __future__ import annotations
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+ENABLED = False
+
+# верхние границы корзин гистограммы, секунды (последняя — «больше»)
+_BUCKETS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 1e-1, 3e-1, 1.0)
+_BUCKET_LABELS = ["<=10us", "<=30us", "<=100us", "<=300us", "<=1ms", "<=3ms",
+                  "<=10ms", "<=30ms", "<=100ms", "<=300ms", "<=1s", ">1s"]
+
+_LOCK = threading.Lock()
+_DUMP_PATH: Optional[str] = None
+_ATEXIT_SET = False
+_WORKER = False   # процесс — воркер пула: выгрузка в свой файл
+_COLLECT = False  # процесс создавал пулы: при выгрузке слить файлы воркеров
+_CONFIGURED = False
+_STARTED = time.time()
+
+class _TimeStats:
+    __slots__ = ("calls", "total_s", "max_s", "hist")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.hist = [0] * (len(_BUCKETS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_s += seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+        for i, bound in enumerate(_BUCKETS):
+            if seconds <= bound:
+                self.hist[i] += 1
+                return
+        self.hist[-1] += 1
+
+    def absorb(self, d: Dict[str, Any]) -> None:
+        """Прибавить выгрузку as_dict() (замеры другого процесса)."""
+        self.calls += int(d.get("calls", 0))
+        self.total_s += float(d.get("total_ms", 0.0)) / 1000.0
+        self.max_s = max(self.max_s, float(d.get("max_ms", 0.0)) / 1000.0)
+        for lab, n in (d.get("histogram") or {}).items():
+            if lab in _BUCKET_LABELS:
+                self.hist[_BUCKET_LABELS.index(lab)] += int(n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_s * 1000.0, 3),
+            "mean_us": round(self.total_s / self.calls * 1e6, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_s * 1000.0, 3),
+            "histogram": {lab: n for lab, n in zip(_BUCKET_LABELS, self.hist) if n},
+        }
+
+class _RuleStats(_TimeStats):
+    __slots__ = ("errors", "levels")
+
+    def __init__(self):
+        super().__init__()
+        self.errors = 0
+        self.levels: Dict[str, int] = {}
+
+    def absorb(self, d: Dict[str, Any]) -> None:
+        super().absorb(d)
+        self.errors += int(d.get("exceptions", 0))
+        for lvl, n in (d.get("levels") or {}).items():
+            self.levels[lvl] = self.levels.get(lvl, 0) + int(n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = super().as_dict()
+        d["exceptions"] = self.errors
+        d["levels"] = dict(self.levels)
+        return d
+
+_RULES: Dict[str, _RuleStats] = {}
+_FIELDS: Dict[str, Dict[str, _TimeStats]] = {}   # поле → {"structured"|"text": ...}
+_PHASES: Dict[str, _TimeStats] = {}              # произвольные фазы (пакетный путь и т.п.)
+
+# --------------------------- запись ---------------------------
+
+def record_rule(code: str, seconds: float, items: Iterable[Dict[str, Any]], error: bool = False) -> None:
+    with _LOCK:
+        st = _RULES.get(code)
+        if st is None:
+            st = _RULES[code] = _RuleStats()
+        st.add(seconds)
+        if error:
+            st.errors += 1
+        for it in items:
+            lvl = str(it.get("level", "")).upper()
+            st.levels[lvl] = st.levels.get(lvl, 0) + 1
+        if not items:
+            st.levels["SKIP"] = st.levels.get("SKIP", 0) + 1
+
+def record_field(name: str, source: str, seconds: float) -> None:
+    with _LOCK:
+        by_src = _FIELDS.setdefault(name, {})
+        st = by_src.get(source)
+        if st is None:
+            st = by_src[source] = _TimeStats()
+        st.add(seconds)
+
+def record_phase(name: str, seconds: float) -> None:
+    with _LOCK:
+        st = _PHASES.get(name)
+        if st is None:
+            st = _PHASES[name] = _TimeStats()
+        st.add(seconds)
+
+# --------------------------- управление ---------------------------
+
+def set_enabled(flag: bool) -> None:
+    global ENABLED
+    ENABLED = bool(flag)
+
+def configure(config: Dict[str, Any]) -> None:
+    """Читает раздел "instrumentation" конфига (один раз — при загрузке rules_engine)."""
+    global _DUMP_PATH, _ATEXIT_SET, _CONFIGURED
+    _CONFIGURED = True
+    sect = dict(config or {}).get("instrumentation", {}) or {}
+    set_enabled(bool(sect.get("enabled", False)))
+    _DUMP_PATH = sect.get("dump_path") or None
+    if _DUMP_PATH and not os.path.isabs(_DUMP_PATH):
+        _DUMP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), _DUMP_PATH)
+    if ENABLED and _DUMP_PATH and not _ATEXIT_SET:
+        atexit.register(_dump_at_exit)
+        _ATEXIT_SET = True
+
+def start_worker() -> None:
+    """
+    Инициализатор воркера пула: замеры, унаследованные от родителя (fork),
+    сбрасываются; при выходе воркера — выгрузка в <dump_path>.w<pid>.json
+    (atexit в воркерах multiprocessing не вызывается, финализаторы — да).
+    """
+    global _WORKER
+    if _WORKER:
+        return
+    _WORKER = True
+    reset()
+    if _DUMP_PATH:
+        from multiprocessing import util
+        util.Finalize(None, _dump_at_exit, exitpriority=0)
+
+def collect_on_exit(config: Dict[str, Any]) -> None:
+    """
+    Процесс создаёт пул воркеров (core.workers): его выгрузка сольёт их
+    замеры. Правила могут идти только в воркерах (batch) — тогда конфиг
+    здесь ещё не прочитан.
+    """
+    global _COLLECT
+    if _WORKER:
+        return
+    _COLLECT = True
+    if not _CONFIGURED:
+        configure(config)
+
+def _worker_files() -> List[str]:
+    root, ext = os.path.splitext(_DUMP_PATH or "")
+    return sorted(glob.glob(f"{glob.escape(root)}.w[0-9]*{glob.escape(ext or '.json')}")) if root else []
+
+def absorb(snap: Dict[str, Any]) -> None:
+    """Влить snapshot() другого процесса в свои замеры."""
+    with _LOCK:
+        for code, d in (snap.get("rules") or {}).items():
+            _RULES.setdefault(code, _RuleStats()).absorb(d)
+        for name, by_src in (snap.get("fields") or {}).items():
+            mine = _FIELDS.setdefault(name, {})
+            for src, d in by_src.items():
+                mine.setdefault(src, _TimeStats()).absorb(d)
+        for name, d in (snap.get("phases") or {}).items():
+            _PHASES.setdefault(name, _TimeStats()).absorb(d)
+
+def collect_workers() -> int:
+    """Влить выгрузки воркеров этого запуска (since не раньше нашего) и удалить их; → сколько."""
+    n = 0
+    for path in _worker_files():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if float(snap.get("since", 0.0)) < _STARTED:
+            continue  # от прошлого запуска (или до reset())
+        absorb(snap)
+        n += 1
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return n
+
+def reset() -> None:
+    global _STARTED
+    with _LOCK:
+        _RULES.clear()
+        _FIELDS.clear()
+        _PHASES.clear()
+        _STARTED = time.time()
+
+def snapshot() -> Dict[str, Any]:
+    with _LOCK:
+        rules = {code: st.as_dict() for code, st in sorted(_RULES.items())}
+        fields = {name: {src: st.as_dict() for src, st in by_src.items()}
+                  for name, by_src in sorted(_FIELDS.items())}
+        phases = {name: st.as_dict() for name, st in sorted(_PHASES.items())}
+    text_s = sum(st.total_s for by_src in _FIELDS.values() for src, st in by_src.items() if src == "text")
+    struct_s = sum(st.total_s for by_src in _FIELDS.values() for src, st in by_src.items() if src == "structured")
+    return {
+        "enabled": ENABLED,
+        "since": _STARTED,
+        "rules": rules,
+        "fields": fields,
+        "fields_total_ms": {"structured": round(struct_s * 1000.0, 3), "text": round(text_s * 1000.0, 3)},
+        "phases": phases,
+    }
+
+def dump(path: str) -> str:
+    """Сохраняет snapshot() в JSON; возвращает путь."""
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    return path
+
+def _dump_at_exit() -> None:
+    if not _DUMP_PATH:
+        return
+    try:
+        if _WORKER:
+            if _RULES or _FIELDS or _PHASES:
+                root, ext = os.path.splitext(_DUMP_PATH)
+                dump(f"{root}.w{os.getpid()}{ext or '.json'}")
+            return
+        if _COLLECT:
+            collect_workers()
+        if _RULES or _FIELDS or _PHASES:
+            dump(_DUMP_PATH)
+    except Exception:
+        pass
@@ -0,0 +1,86 @@
+# ============================================================
+# mojibake.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: быстрый путь для починки «кракозябр».
+#   Раньше _fix_mojibake на любом тексте пробовал пять полных
+#   перекодировок и считал кириллицу в каждой — даже на чистом UTF-8
+#   (основной случай). Теперь:
+#     1) один линейный проход по диапазонам кодовых точек решает,
+#        возможна ли починка вообще: если в тексте есть символ вне
+#        latin-1 ∪ cp1252 (например, нормальная кириллица), ни одна
+#        строгая перекодировка не пройдёт — текст возвращается как есть;
+#     2) иначе перекодируются только не-ASCII участки: все кодеки здесь
+#        однобайтовые, а ASCII-байт не может оказаться внутри UTF-8
+#        последовательности, поэтому результат по участкам совпадает
+#        с результатом по всему тексту.
+# ============================================================
+
+from __future__ import annotations
+import re
+from typing import Callable, List, Optional
+
+# latin-1 покрывает U+0000..U+00FF; cp1252 добавляет 27 символов в 0x80..0x9F
+_CP1252_EXTRA = bytes(range(0x80, 0xA0)).decode("cp1252", errors="ignore")
+_REPAIRABLE = "\\x00-\\xff" + re.escape(_CP1252_EXTRA)
+_NOT_REPAIRABLE_RE = re.compile(f"[^{_REPAIRABLE}]")
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+_CYR_RE = re.compile(r"[А-яЁёІіґҐЇїЙй]")
+
+def cyr_count(s: str) -> int:
+    return len(_CYR_RE.findall(s))
+
+def needs_repair(text: str) -> bool:
+    """True, если хотя бы одна из перекодировок может что-то поменять."""
+    if not isinstance(text, str) or not text or text.isascii():
+        return False
+    return _NOT_REPAIRABLE_RE.search(text) is None
+
+# --------------------------- перекодировки ---------------------------
+
+def _latin1_cp1251(s: str) -> str:
+    return s.encode("latin-1", errors="strict").decode("cp1251", errors="strict")
+
+def _cp1252_utf8(s: str) -> str:
+    return s.encode("cp1252", errors="strict").decode("utf-8", errors="strict")
+
+# порядок = порядок кандидатов v2.7 (при равенстве выигрывает более ранний)
+_TRANSFORMS: List[Callable[[str], str]] = [
+    _latin1_cp1251,
+    _cp1252_utf8,
+    lambda s: _latin1_cp1251(_cp1252_utf8(s)),
+    lambda s: _cp1252_utf8(_latin1_cp1251(s)),
+]
+
+def _apply_spans(text: str, spans: List[tuple], fn: Callable[[str], str]) -> Optional[List[str]]:
+    out: List[str] = []
+    try:
+        for s, e in spans:
+            out.append(fn(text[s:e]))
+    except (UnicodeError, ValueError):
+        return None
+    return out
+
+def fix(text: str) -> str:
+    """Выбирает вариант с максимумом кириллицы (как _fix_mojibake v2.7)."""
+    if not needs_repair(text):
+        return text
+    spans = [m.span() for m in _NON_ASCII_RE.finditer(text)]
+    best_parts: Optional[List[str]] = None
+    best_score = cyr_count(text)
+    for fn in _TRANSFORMS:
+        parts = _apply_spans(text, spans, fn)
+        if parts is None:
+            continue
+        score = sum(cyr_count(p) for p in parts)
+        if score > best_score:
+            best_parts, best_score = parts, score
+    if best_parts is None:
+        return text
+    out: List[str] = []
+    pos = 0
+    for (s, e), part in zip(spans, best_parts):
+        out.append(text[pos:s])
+        out.append(part)
+        pos = e
+    out.append(text[pos:])
+    return "".join(out)
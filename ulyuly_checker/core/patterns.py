@@ -0,0 +1,244 @@
+# ============================================================
+# patterns.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: реестр предкомпилированных регулярок.
+#   Причина: _find_total_value/_sum_patterns/_extract_bin_from_text
+#            собирали и компилировали шаблоны на каждом вызове.
+#            Теперь все метки (БИН, даты, суммы, разделы ЭСФ)
+#            компилируются один раз из config.json; при перезагрузке
+#            конфига реестр пересобирается целиком и подменяется
+#            одной ссылкой (читатели видят либо старый, либо новый).
+# ============================================================
+
+from __future__ import annotations
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from . import utils
+
+# --------------------------- метки (источник истины) ---------------------------
+
+SUPPLIER_BIN_LABELS = [
+    r"БИН\s*поставщик[а]",
+    r"БИН[^\n\r]{0,40}поставщик[а]",
+    r"BIN\s*(supplier|seller)",
+    r"ИИН/БИН[^\n\r]{0,40}поставщик[а]",
+    r"БИН\s*продавца", r"БИН\s*организации",
+    r"Реквизиты[^\n\r]*БИН",
+    r"ÁÈÍ[^\n\r]{0,40}ïîñòàâùèê[à]",
+    r"ÈÈÍ/ÁÈÍ[^\n\r]{0,40}ïîñòàâùèê[à]",
+    r"Ðåêâèçèòû[^\n\r]*ÁÈÍ"
+]
+
+BUYER_BIN_LABELS = [
+    r"БИН\s*покупател[ьяя]", r"БИН\s*получател[ьяя]",
+    r"(БИН|ИИН|ИИН/БИН)[^\n\r]{0,40}(покупател[ьяя]|получател[ьяя]|заказчик[а])",
+    r"BIN\s*(buyer|recipient)",
+    r"Заказчик[:\s]*",
+    r"ÁÈÍ[^\n\r]{0,40}(ïîêóïàòåë[ьяÿ]|ïîëó÷àòåë[ьяÿ])",
+    r"ÈÈÍ/ÁÈÍ[^\n\r]{0,40}(ïîêóïàòåë[ьяÿ]|ïîëó÷àòåë[ьяÿ])",
+    r"Çàêàç÷èê[:\s]*"
+]
+
+DATE_LABELS = [
+    r"Дата\s*(выставления|выписки)\s*[:\-]",
+    r"Äàòà\s*(âûñòàâëåíèÿ|âûïèñêè)\s*[:\-]"
+]
+
+MONTHS_RU = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12
+}
+MONTHS_RU_RE = "|".join(MONTHS_RU.keys())
+
+ESF_HEADER_DATE_PATTERNS = [
+    r"СЧ[ЕЁ]Т[-\s]?ФАКТУРА[^\n\r]{0,80}от\s*(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))",
+    r"Ñ×[ÅE]Ò[-\s]?ÔÀÊÒÓÐÀ[^\n\r]{0,80}îò\s*(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))"
+]
+
+_DATE_VALUE = r"(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))"
+
+DEFAULT_ESF_HEADERS = [
+    r"СЧ[ЕЁ]Т[-\s]*ФАКТУРА(\s*№|\s*N)?",
+    r"\bЭСФ\b",
+    r"Electronic\s*(Tax\s*)?Invoice",
+    r"Ñ×[ÅE]Ò[-\s]*ÔÀÊÒÓÐÀ(\s*¹|\s*N)?"
+]
+
+NEXT_HEADER_STOP = r"(?m)^\s*(Акт(\s+выполненных)?|Приложение|Сч[её]т(\s*№|\s*N)?\b|Invoice\s*No\.?)"
+
+DEFAULT_SUM_LABELS = [
+    "Итого",
+    "Итого\\s*с\\s*НДС",
+    "Всего",
+    "Всего\\s*к\\s*оплате",
+    "К\\s*оплате",
+    "Всего\\s*стоимость\\s*реализации",
+    "Total",
+    "Grand\\s*Total"
+]
+
+MOJIBAKE_SUM_LABELS = [
+    "Èòîãî",
+    "Èòîãî\\s*ñ\\s*ÍÄÑ",
+    "Âñåãî",
+    "Âñåãî\\s*ê\\s*îïëàòå",
+    "Âñåãî\\s*ïî\\s*ñ÷åòó",
+    "Âñåãî\\s*ñòîèìîñòü\\s*ðåàëèçàöèè"
+]
+
+PRIORITY_SUM_LABELS = [
+    r"Всего\s*к\s*оплате",
+    r"Итого\s*с\s*НДС",
+    r"Всего\s*стоимость\s*реализации",
+    r"Âñåãî\s*ê\s*îïëàòå",
+    r"Èòîãî\s*ñ\s*ÍÄÑ",
+    r"Âñåãî\s*ñòîèìîñòü\\s*ðåàëèçàöèè",
+]
+
+_AMOUNT_CHARS = r"[0-9\s\u00A0\u202F\u2019\u2018\'\,\.]+"
+
+# --------------------------- чтение конфига ---------------------------
+
+def esf_headers_from_config(config: Dict[str, Any]) -> List[str]:
+    sec = dict(config or {}).get("sections", {})
+    return sec.get("esf_headers") or list(DEFAULT_ESF_HEADERS)
+
+def sum_labels_from_config(config: Dict[str, Any]) -> List[str]:
+    t = dict(config or {}).get("totals", {})
+    base_cfg = t.get("labels") or list(DEFAULT_SUM_LABELS)
+    return list(dict.fromkeys(base_cfg + MOJIBAKE_SUM_LABELS))
+
+def sum_gap_from_config(config: Dict[str, Any]) -> int:
+    t = dict(config or {}).get("totals", {})
+    gap = int(t.get("max_gap", 140))
+    return max(20, min(gap, 300))
+
+def _config_digest(config: Dict[str, Any]) -> str:
+    """Хэш только тех разделов конфига, из которых строятся шаблоны."""
+    cfg = dict(config or {})
+    relevant = {"sections": cfg.get("sections", {}), "totals": cfg.get("totals", {})}
+    blob = json.dumps(relevant, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+# --------------------------- реестр ---------------------------
+
+class PatternRegistry:
+    """Неизменяемый после сборки набор скомпилированных шаблонов."""
+
+    def __init__(self, config: Dict[str, Any], generation: int = 1):
+        t0 = time.perf_counter()
+        self.source = config
+        self.generation = generation
+        self._counts: Dict[str, int] = {}
+
+        # БИН: метка + до 80 нецифровых символов + значение
+        self.supplier_bin = self._group("supplier_bin", [
+            rf"({lab})[^\d]{{0,80}}(?P<bin>\d[\d\ \-\'\.]{{3,}})" for lab in SUPPLIER_BIN_LABELS
+        ], re.IGNORECASE)
+        self.buyer_bin = self._group("buyer_bin", [
+            rf"({lab})[^\d]{{0,80}}(?P<bin>\d[\d\ \-\'\.]{{3,}})" for lab in BUYER_BIN_LABELS
+        ], re.IGNORECASE)
+
+        # даты
+        self.date_labels = self._group("date", [
+            rf"(?P<label>{lab})\s*{_DATE_VALUE}" for lab in DATE_LABELS
+        ], re.IGNORECASE)
+        self.header_dates = self._group("date", ESF_HEADER_DATE_PATTERNS, re.IGNORECASE)
+        self.date_words = self._one("date",
+            rf"\b(?P<dd>\d{{1,2}})\b\s+(?P<mon>{MONTHS_RU_RE})\s+\b(?P<yyyy>\d{{4}})\b", re.IGNORECASE)
+        self.date_numeric = self._one("date",
+            r"(\b\d{2}[./-]\d{2}[./-]\d{4}\b)|(\b\d{4}[./-]\d{2}[./-]\d{2}\b)")
+
+        # разделы ЭСФ
+        self.esf_headers = self._group("section", esf_headers_from_config(config), re.IGNORECASE)
+        self.next_header_stop = self._one("section", NEXT_HEADER_STOP, re.IGNORECASE)
+
+        # суммы
+        labels_union = "(?:" + "|".join(sum_labels_from_config(config)) + ")"
+        gap = sum_gap_from_config(config)
+        self.sum_gap = gap
+        self.sum_union = self._group("sum", [
+            rf"{labels_union}\s*[:\-]?\s*[^\d\n\r]{{0,{gap}}}({_AMOUNT_CHARS})",
+            rf"({_AMOUNT_CHARS})[^\d\n\r]{{0,{gap}}}{labels_union}",
+        ], re.IGNORECASE)
+        self.sum_priority = self._group("sum", [
+            rf"{lab}[^\d]{{0,220}}({_AMOUNT_CHARS})" for lab in PRIORITY_SUM_LABELS
+        ], re.IGNORECASE | re.DOTALL)
+
+        # [2026-10-19] линейный разбор сумм (rules_engine._TotalScan): каждый
+        # шаблон ниже проходит текст один раз и не откатывается — метки ищутся
+        # опережающей проверкой в каждой позиции (включая вложенные: «к оплате»
+        # внутри «Всего к оплате»), числа — максимальными участками.
+        self.amount_run = self._one("sum", _AMOUNT_CHARS)
+        self.sum_stop = self._one("sum", r"[\d\n\r]")
+        self.sum_label_at = self._one("sum", rf"(?=({labels_union}))", re.IGNORECASE)
+        self.sum_head = self._one("sum", rf"\s*[:\-]?\s*[^\d\n\r]{{0,{gap}}}")
+        self.priority_label_at = self._group("sum", [
+            rf"(?=({lab}))" for lab in PRIORITY_SUM_LABELS
+        ], re.IGNORECASE | re.DOTALL)
+        self.priority_gap = self._one("sum", r"[^\d]{0,220}")
+        self.bin_marks = self._one("sum", r"(?=бин|ийн|iin|bin)")
+
+        self.compile_ms = (time.perf_counter() - t0) * 1000.0
+        self.built_at = time.time()
+        self.config_digest = _config_digest(config)
+
+    def _one(self, group: str, pattern: str, flags: int = 0) -> re.Pattern:
+        self._counts[group] = self._counts.get(group, 0) + 1
+        return re.compile(pattern, flags)
+
+    def _group(self, group: str, patterns: List[str], flags: int = 0) -> List[re.Pattern]:
+        return [self._one(group, p, flags) for p in patterns]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "patterns": sum(self._counts.values()),
+            "by_group": dict(self._counts),
+            "compile_ms": round(self.compile_ms, 3),
+            "built_at": self.built_at,
+            "config_digest": self.config_digest,
+        }
+
+_REGISTRY: Optional[PatternRegistry] = None
+_LOCK = threading.Lock()
+_REBUILDS = 0
+
+def rebuild(config: Optional[Dict[str, Any]] = None) -> PatternRegistry:
+    """
+    Собирает новый реестр и атомарно подменяет текущий.
+    При ошибке компиляции (битая регулярка в конфиге) старый реестр остаётся.
+    """
+    global _REGISTRY, _REBUILDS
+    cfg = utils.load_config() if config is None else config
+    with _LOCK:
+        gen = (_REGISTRY.generation + 1) if _REGISTRY is not None else 1
+        reg = PatternRegistry(cfg, generation=gen)
+        _REGISTRY = reg
+        _REBUILDS += 1
+    return reg
+
+def get(config: Optional[Dict[str, Any]] = None) -> PatternRegistry:
+    """
+    Текущий реестр. Если передан config и это другой объект, чем тот,
+    из которого собран реестр, — пересобираем (перезагрузка конфига).
+    """
+    reg = _REGISTRY
+    if reg is None or (config is not None and config is not reg.source):
+        return rebuild(config)
+    return reg
+
+def stats() -> Dict[str, Any]:
+    reg = _REGISTRY
+    out = reg.stats() if reg is not None else {"generation": 0, "patterns": 0}
+    out["rebuilds"] = _REBUILDS
+    return out
+
+if __name__ == "__main__":
+    get()
+    print(json.dumps(stats(), ensure_ascii=False, indent=2))
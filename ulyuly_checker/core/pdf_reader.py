@@ -4,11 +4,13 @@
 # Дата: 2025-11-09
 # [2025-11-18] refactor(mini): после извлечения — normalize_keys() из core.utils;
 #                поведение поиска БИН/дат/итогов не изменял.
+# [2026-10-19] feat: вместо пути можно передать двоичный поток (BytesIO) —
+#                члены ZIP-архивов читаются без распаковки на диск.
 
 import re
 import os
 import unicodedata
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Union
 from PyPDF2 import PdfReader
 
 from . import utils  # [2025-11-18] канон полей и ISO-даты
@@ -16,8 +18,8 @@ from . import utils  # [2025-11-18] канон полей и ISO-даты
 # ------------------------------------------------------------
 # 🧩 Основная функция
 # ------------------------------------------------------------
-def parse_pdf_content(file_path: str) -> Dict[str, Any]:
-    if not os.path.exists(file_path):
+def parse_pdf_content(file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
+    if isinstance(file_path, (str, os.PathLike)) and not os.path.exists(file_path):
         raise FileNotFoundError(f"Файл не найден: {file_path}")
 
     reader = PdfReader(file_path)
@@ -0,0 +1,319 @@
+# ============================================================
+# pipeline.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat/perf: потоковая проверка по стадиям.
+#   Раньше чтение, разбор, правила и резюме шли подряд в одной функции
+#   (main._check_worker / reader.check_file), и медленный диск, тяжёлый
+#   разбор PDF и дешёвые правила ждали друг друга. Здесь стадии:
+#     read  — потоки I/O: чтение (файл или член ZIP), хэш, поиск в кэше
+#             результатов; JSON-документы разбираются тут же (это дёшево);
+#     parse — пул процессов: PDF/XLSX из переданных байтов (read_any);
+#     rules — в процессе вызывающего: validate_document + summary + кэш
+#             (+ индекс дубликатов, DUP001).
+#   Очереди ограничены; «окно» (window) — сколько документов может быть
+#   между чтением и правилами одновременно: медленный потребитель
+#   останавливает разбор, разбор — чтение, чтение — обход входа.
+#   Выход — по готовности или в порядке входа (ordered=True).
+#   stats() — счётчики по стадиям: штук, ошибок, занятое время, док/с.
+# ============================================================
+
+from __future__ import annotations
+import os
+import pathlib
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import dup_index, reader, result_cache, workers
+
+_POLL = 0.1          # период проверки флага остановки в блокирующих операциях
+_PARSE_EXT = (".pdf", ".xls", ".xlsx")
+
+# --------------------------- счётчики ---------------------------
+
+class StageStats:
+    """Счётчики одной стадии; busy — суммарное время работы всех исполнителей."""
+
+    __slots__ = ("name", "workers", "items", "errors", "busy", "max_queue", "_lock")
+
+    def __init__(self, name: str, workers: int):
+        self.name, self.workers = name, workers
+        self.items = self.errors = self.max_queue = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.items += 1
+            self.errors += failed
+            self.busy += seconds
+
+    def depth(self, n: int) -> None:
+        if n > self.max_queue:
+            self.max_queue = n
+
+    def as_dict(self, wall: float) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_s": round(self.busy, 4),
+            "per_s": round(self.items / wall, 2) if wall > 0 else 0.0,
+            "utilization": round(self.busy / (wall * self.workers), 3) if wall > 0 else 0.0,
+            "max_queue": self.max_queue,
+        }
+
+# --------------------------- задания ---------------------------
+
+class _Job:
+    __slots__ = ("seq", "path", "t0", "rec", "raw", "data", "key", "fhash", "results")
+
+    def __init__(self, seq: int, path: str):
+        self.seq, self.path = seq, path
+        self.t0 = time.perf_counter()
+        self.rec: Dict[str, Any] = reader.new_record(path)
+        self.raw: Optional[bytes] = None
+        self.data: Optional[Dict[str, Any]] = None
+        self.key = self.fhash = None
+        self.results = None
+
+def _parse_job(path: str, raw: bytes) -> Tuple[Dict[str, Any], float]:
+    """Выполняется в процессе пула: разбор PDF/XLSX из памяти и время разбора."""
+    t0 = time.perf_counter()
+    data = reader.read_any(path, raw)
+    return data, time.perf_counter() - t0
+
+def _ping(_: int) -> int:
+    return os.getpid()
+
+def _error_text(e: BaseException) -> str:
+    return f"{e.__class__.__name__}: {e}"
+
+# --------------------------- конвейер ---------------------------
+
+class Pipeline:
+    """
+    Pipeline(io_threads=4, parse_workers=N).run(paths) → записи как у
+    reader.check_file (path, size, status, results, summary, elapsed_ms
+    или error; cached — из кэша результатов).
+    """
+
+    def __init__(self, io_threads: int = 4, parse_workers: Optional[int] = None,
+                 window: int = 64, ordered: bool = False, use_cache: bool = True):
+        self.io_threads = max(1, int(io_threads))
+        self.parse_workers = max(1, int(parse_workers or os.cpu_count() or 1))
+        self.window = max(self.parse_workers, int(window))
+        self.ordered, self.use_cache = ordered, use_cache
+        self._stages = {name: StageStats(name, n) for name, n in
+                        (("read", self.io_threads), ("parse", self.parse_workers), ("rules", 1))}
+        self._t0 = self._t1 = 0.0
+
+    # ---------- счётчики ----------
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        wall = (self._t1 or time.perf_counter()) - self._t0 if self._t0 else 0.0
+        out = {name: st.as_dict(wall) for name, st in self._stages.items()}
+        out["total"] = {"wall_s": round(wall, 4), "items": self._stages["rules"].items,
+                        "per_s": round(self._stages["rules"].items / wall, 2) if wall > 0 else 0.0}
+        return out
+
+    # ---------- служебное ----------
+    def _put(self, q: "queue.Queue", item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue") -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _acquire(self) -> bool:
+        while not self._stop.is_set():
+            if self._slots.acquire(timeout=_POLL):
+                return True
+        return False
+
+    # ---------- стадии ----------
+    def _feed(self, paths: Iterable[str]) -> None:
+        n = 0
+        try:
+            for p in paths:
+                if not self._put(self._q_read, _Job(n, p)):
+                    return
+                n += 1
+        finally:
+            for _ in range(self.io_threads):
+                self._put(self._q_read, None)
+            self._q_done.put(("end", n))
+
+    def _read_loop(self) -> None:
+        st = self._stages["read"]
+        while True:
+            job = self._get(self._q_read)
+            if job is None:
+                self._put(self._q_parse, None)
+                return
+            t0 = time.perf_counter()
+            to_parse = False
+            try:
+                to_parse = self._read_one(job)
+            except Exception as e:
+                job.rec["error"] = _error_text(e)
+            st.add(time.perf_counter() - t0, "error" in job.rec)
+            if not self._acquire():
+                return
+            if to_parse:
+                self._put(self._q_parse, job)
+                st.depth(self._q_parse.qsize())
+            else:
+                self._q_done.put(("job", job))
+
+    def _read_one(self, job: _Job) -> bool:
+        """True — нужен разбор в пуле; иначе job готов для стадии правил."""
+        ext = pathlib.Path(job.path).suffix.lower()
+        if ext not in _PARSE_EXT and ext != ".json":
+            job.rec["error"] = f"Неподдерживаемый формат {ext}"
+            return False
+        raw = reader.read_bytes(job.path)
+        job.rec["size"] = len(raw)
+        if self.use_cache and result_cache.default() is not None:
+            job.results, job.key, job.fhash = reader.cached_results(job.path, raw)
+            if job.results is not None:
+                job.rec["cached"] = True
+                return False
+        elif dup_index.default() is not None:
+            job.fhash = result_cache.data_hash(raw)
+        if ext == ".json":
+            job.data = reader.read_any(job.path, raw)
+            return False
+        job.raw = raw
+        return True
+
+    def _dispatch_loop(self) -> None:
+        st = self._stages["parse"]
+        ends = 0
+        while ends < self.io_threads:
+            job = self._get(self._q_parse)
+            if job is None:
+                if self._stop.is_set():
+                    return
+                ends += 1
+                continue
+
+            def _done(fut, job=job):
+                try:
+                    job.data, dt = fut.result()
+                    st.add(dt)
+                except BaseException as e:  # в т.ч. BrokenProcessPool / CancelledError
+                    job.rec["error"] = _error_text(e)
+                    st.add(0.0, True)
+                self._q_done.put(("job", job))
+
+            try:
+                raw, job.raw = job.raw, None
+                self._pool.submit(_parse_job, job.path, raw).add_done_callback(_done)
+            except RuntimeError as e:  # пул уже закрыт
+                job.rec["error"] = _error_text(e)
+                self._q_done.put(("job", job))
+
+    def _finish(self, job: _Job) -> Dict[str, Any]:
+        """Стадия правил: проверка, кэш, индекс дубликатов, резюме."""
+        st = self._stages["rules"]
+        t0 = time.perf_counter()
+        rec = job.rec
+        try:
+            if "error" not in rec:
+                data = job.data or {}
+                if job.results is None and "error" in data and len(data) == 1:
+                    rec["error"] = data["error"]
+                else:
+                    reader.finish(rec, job.results, data, job.key if self.use_cache else None, job.fhash)
+        except Exception as e:
+            rec["error"] = _error_text(e)
+        st.add(time.perf_counter() - t0, "error" in rec)
+        rec["elapsed_ms"] = round((time.perf_counter() - job.t0) * 1000.0, 2)
+        return rec
+
+    # ---------- запуск ----------
+    def run(self, paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(self.window)
+        self._q_read: "queue.Queue" = queue.Queue(self.window)
+        self._q_parse: "queue.Queue" = queue.Queue(self.window)
+        self._q_done: "queue.Queue" = queue.Queue()  # размер ограничен окном (_slots)
+        for st in self._stages.values():
+            st.__init__(st.name, st.workers)
+        self._t0, self._t1 = time.perf_counter(), 0.0
+
+        # процессы пула стартуют до потоков конвейера (fork при живых потоках небезопасен)
+        self._pool = workers.make_pool(self.parse_workers)
+        list(self._pool.map(_ping, range(self.parse_workers)))
+        reader.warm_up()
+
+        threads = [threading.Thread(target=self._feed, args=(paths,), daemon=True, name="pipe-feed"),
+                   threading.Thread(target=self._dispatch_loop, daemon=True, name="pipe-parse")]
+        threads += [threading.Thread(target=self._read_loop, daemon=True, name=f"pipe-read-{i}")
+                    for i in range(self.io_threads)]
+        for t in threads:
+            t.start()
+
+        pending: Dict[int, Dict[str, Any]] = {}
+        next_seq, done, total = 0, 0, None
+        try:
+            while total is None or done < total:
+                kind, item = self._q_done.get()
+                if kind == "end":
+                    total = item
+                    continue
+                self._slots.release()
+                rec = self._finish(item)
+                done += 1
+                if not self.ordered:
+                    yield rec
+                    continue
+                pending[item.seq] = rec
+                self._stages["rules"].depth(len(pending))
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+        finally:
+            self._t1 = time.perf_counter()
+            self._stop.set()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            for t in threads:
+                t.join(timeout=1.0)
+
+def run(paths: Iterable[str], **kw) -> Iterator[Dict[str, Any]]:
+    """Короткая форма: pipeline.run(paths, ordered=True, parse_workers=4)."""
+    return Pipeline(**kw).run(paths)
+
+# --------------------------- самотест ---------------------------
+if __name__ == "__main__":
+    import glob, sys
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "synthetic_esf_visual", "invoices")
+    files = sorted(glob.glob(os.path.join(src, "*")))
+    for p in files:  # индекс дубликатов: все пути уже известны — DUP001 не зависит от порядка
+        reader.check_file(p)
+    ref = {p: reader.check_file(p) for p in files}
+    for ordered in (False, True):
+        pipe = Pipeline(io_threads=4, parse_workers=4, window=8, ordered=ordered, use_cache=False)
+        got = list(pipe.run(files))
+        assert len(got) == len(files)
+        if ordered:
+            assert [r["path"] for r in got] == files
+        for r in got:
+            a = ref[r["path"]]
+            assert r.get("results") == a.get("results") and ("error" in r) == ("error" in a), r["path"]
+        print(f"ordered={ordered}: {len(got)} док, совпадает с check_file")
+        for name, s in pipe.stats().items():
+            print(f"  {name:6s} {s}")
@@ -0,0 +1,19 @@
+# ============================================================
+# preload.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: импорт этого модуля = прогрев воркера.
+#   Импортируется родителем forkserver (core.workers): ядро, ридеры,
+#   config, чек-лист и регулярки загружаются один раз, затем
+#   gc.freeze() — объекты прогрева уходят в «вечное» поколение, сборщик
+#   мусора в дочерних процессах их не обходит и не трогает их страницы,
+#   так что copy-on-write память остаётся общей.
+# ============================================================
+
+import gc
+
+from . import reader
+
+gc.disable()
+reader.warm_up()
+gc.freeze()
+gc.enable()
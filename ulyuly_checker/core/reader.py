@@ -0,0 +1,216 @@
+# ============================================================
+# reader.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: чтение + проверка одного файла без GUI.
+#   _read_any и поиск шаблона жили в main.py (модуль создаёт Tk-окно
+#   на импорте), поэтому пакетная проверка не могла их переиспользовать.
+#   Здесь та же логика; main.py и batch.py зовут её отсюда.
+#   + кэш результатов по содержимому файла (core.result_cache).
+#   + файл читается один раз в память; члены ZIP — через core.archive.
+#   + индекс дубликатов (core.dup_index): finish() дописывает DUP001.
+# ============================================================
+
+from __future__ import annotations
+import io
+import json
+import os
+import pathlib
+import time
+from typing import Any, Dict, List, Optional
+
+from . import archive, dup_index, utils
+
+SUPPORTED_EXT = (".pdf", ".xls", ".xlsx", ".json")
+
+def read_bytes(path: str) -> bytes:
+    """Содержимое файла или члена архива («a.zip!x.pdf»)."""
+    if archive.split(path) is not None:
+        return archive.read_member(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+def read_any(path: str, raw: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Разбор по расширению; {"error": ...} — неподдерживаемый формат.
+    raw — уже прочитанное содержимое (ридерам уходит BytesIO); члены
+    архива читаются в память, без распаковки на диск.
+    """
+    content: Dict[str, Any] = {}
+    ext = pathlib.Path(path).suffix.lower()
+    if ext not in SUPPORTED_EXT:
+        return {"error": f"Неподдерживаемый формат {ext}"}
+    if raw is None and archive.split(path) is not None:
+        raw = archive.read_member(path)
+    src: Any = path if raw is None else io.BytesIO(raw)
+    if ext == ".pdf":
+        from . import pdf_reader
+        parsed = pdf_reader.parse_pdf_content(src)
+    elif ext in (".xls", ".xlsx"):
+        from . import xlsx_reader
+        parsed = xlsx_reader.extract_data(src)
+    elif raw is not None:
+        parsed = json.loads(raw.decode("utf-8"))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            parsed = json.load(f)
+    if isinstance(parsed, dict):
+        content.update(parsed)
+    return content
+
+def find_template(path: str) -> Dict[str, Any]:
+    """<файл>.json рядом или esf_template.json в папке; {} если нет/битый или член архива."""
+    if archive.split(path) is not None:
+        return {}
+    try:
+        base = pathlib.Path(path)
+        cand = [base.with_suffix(".json"), base.parent / "esf_template.json"]
+        tpl_path = next((str(p) for p in cand if p.exists()), None)
+        if tpl_path:
+            with open(tpl_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception:
+        pass
+    return {}
+
+def results_to_json(results) -> List[Dict[str, str]]:
+    return [{"code": r.code, "level": r.level, "message": r.message} for r in results]
+
+def fill_record(rec: Dict[str, Any], res) -> Dict[str, Any]:
+    """status / results / summary по результатам проверки."""
+    from .summary_engine import summarize_results
+    summary = summarize_results(res)
+    rec["status"] = summary.get("status")
+    rec["results"] = results_to_json(res)
+    rec["summary"] = summary
+    return rec
+
+def cached_results(path: str, raw: Optional[bytes] = None):
+    """
+    (результаты из кэша | None, ключ, хэш файла). Шаблон рядом с файлом
+    в v2.7 не влияет на проверку, поэтому в ключ не входит.
+    """
+    from . import result_cache
+    from .validator import ValidationResult
+    if raw is not None:
+        fhash, key, rows = result_cache.lookup_hash(result_cache.data_hash(raw))
+    else:
+        fhash, key, rows = result_cache.lookup(path)
+    if rows is None:
+        return None, key, fhash
+    if dup_index.key_for_hash(fhash) is None:
+        return None, key, fhash  # деловой ключ этого содержимого ещё не в индексе — нужен разбор
+    return [ValidationResult(code=c, level=l, message=m) for c, l, m in rows], key, fhash
+
+def new_record(path: str) -> Dict[str, Any]:
+    """Заготовка записи; у члена архива — ещё archive и member."""
+    rec: Dict[str, Any] = {"path": path}
+    parts = archive.split(path)
+    if parts is not None:
+        rec["archive"], rec["member"] = parts
+    return rec
+
+def finish(rec: Dict[str, Any], res, data: Optional[Dict[str, Any]], key: Optional[str],
+           fhash: Optional[str]) -> Dict[str, Any]:
+    """
+    Правила (если res нет) → кэш → индекс дубликатов → запись.
+    DUP001 зависит от истории проверок, а не от содержимого, поэтому
+    в кэш результатов не попадает и добавляется поверх.
+    """
+    from . import result_cache, rules_engine
+    from .validator import validate_with_key, with_duplicates
+    path = rec["path"]
+    if res is None:
+        res, fields = validate_with_key(data or {}, find_template(path))
+        result_cache.store(key, fhash, res)
+        bkey = rules_engine.key_from_fields(fields)
+        if any(v not in ("", None) for v in fields.values()):
+            rec["fields"] = fields  # для core.result_store
+    else:
+        bkey = dup_index.key_for_hash(fhash) or ""
+    if fhash:
+        rec["file_hash"] = fhash
+    if bkey:
+        rec["business_key"] = bkey
+    matches = dup_index.check(path, fhash, bkey)
+    if matches:
+        rec["duplicates"] = [{"path": p, "by": by} for p, by in matches]
+    return fill_record(rec, with_duplicates(res, matches))
+
+def check_content(rec: Dict[str, Any], raw: bytes) -> Dict[str, Any]:
+    """Проверка уже прочитанного содержимого: кэш → разбор → правила → запись."""
+    from . import result_cache
+    path = rec["path"]
+    rec["size"] = len(raw)
+    res, key, fhash = cached_results(path, raw)
+    if fhash is None:
+        fhash = result_cache.data_hash(raw)  # кэш выключен, индексу хэш всё равно нужен
+    if res is not None:
+        rec["cached"] = True
+        return finish(rec, res, None, key, fhash)
+    data = read_any(path, raw)
+    if "error" in data and len(data) == 1:
+        rec["error"] = data["error"]
+        return rec
+    return finish(rec, None, data, key, fhash)
+
+def check_file(path: str) -> Dict[str, Any]:
+    """
+    Полная проверка одного файла или члена архива → запись для JSONL:
+    path, size, status, results, summary, elapsed_ms (или error);
+    cached: true — результат взят из кэша без разбора файла.
+    """
+    t0 = time.perf_counter()
+    rec = new_record(path)
+    try:
+        check_content(rec, read_bytes(path))
+    except Exception as e:
+        rec["error"] = f"{e.__class__.__name__}: {e}"
+    rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return rec
+
+def check_bytes(name: str, data: bytes) -> Dict[str, Any]:
+    """check_file для загруженного содержимого; в записи path = name."""
+    t0 = time.perf_counter()
+    rec = new_record(name)
+    try:
+        check_content(rec, data)
+    except Exception as e:
+        rec["error"] = f"{e.__class__.__name__}: {e}"
+    rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return rec
+
+def triage_file(path: str) -> Dict[str, Any]:
+    """
+    Предварительный отсев входящих: разбор → validator.triage_document
+    (без сообщений, без кэша и индекса дубликатов) → запись для JSONL:
+    path, size, triage ("PASS"/"FAIL"), code (при FAIL), elapsed_ms (или error).
+    """
+    from .validator import triage_document
+    t0 = time.perf_counter()
+    rec = new_record(path)
+    try:
+        raw = read_bytes(path)
+        rec["size"] = len(raw)
+        data = read_any(path, raw)
+        if "error" in data and len(data) == 1:
+            rec["error"] = data["error"]
+        else:
+            rec["triage"], code = triage_document(data)
+            if code is not None:
+                rec["code"] = code
+    except Exception as e:
+        rec["error"] = f"{e.__class__.__name__}: {e}"
+    rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return rec
+
+def warm_up() -> None:
+    """Импорт ридеров и сборка правил/шаблонов заранее (инициализатор воркеров)."""
+    from . import rules_engine, validator, summary_engine  # noqa: F401
+    try:
+        from . import pdf_reader, xlsx_reader  # noqa: F401
+    except ImportError:
+        pass  # нет PyPDF2/openpyxl — упадёт только на соответствующих файлах
+    from . import bin_checksum, reconcile
+    bin_checksum._numpy(); reconcile._numpy()  # NumPy грузится лениво — здесь заранее
+    rules_engine._patterns()
+    utils.load_config()
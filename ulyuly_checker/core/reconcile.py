@@ -0,0 +1,262 @@
+# ============================================================
+# reconcile.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: сверка строк и итогов в целых тиынах.
+#   Движок не делал никакой арифметики: _to_number отдаёт float,
+#   utils.tolerance_compare не использовался. Здесь:
+#   - суммы разбираются сразу в целые тиыны (1/100 тенге) — без float
+#     и Decimal на каждое значение; ints/floats из JSON — столбцом;
+#   - столбцы строк (amount, vat_amount) разбираются и суммируются
+#     векторно (NumPy int64; без NumPy — поштучно и sum() по int);
+#   - проверки: net + VAT = gross, сумма строк = итогам (с допуском
+#     totals.tolerance_abs / tolerance_rel из config.json).
+# [2026-10-19] perf: NumPy — при первом столбце строк, не на импорте
+#   (rules_engine импортирует модуль, а документы без строк его не ждут).
+#   Строки (lines) сейчас приходят только из JSON-документов: ридеры
+#   PDF/XLSX их не заполняют, для них сверяются только итоги.
+# ============================================================
+
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_np: Any = None  # numpy — опциональная зависимость; False — не установлен
+
+def _numpy():
+    """Модуль numpy (импорт при первом вызове) или None."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            _np = False
+        else:
+            _np = numpy
+    return _np or None
+
+# --------------------------- разбор ---------------------------
+
+_STRIP = str.maketrans("", "", "   '’‘")
+_AMOUNT_RE = re.compile(r"([+-]?)(\d*)(?:[.,](\d*))?")
+
+def parse_tiyn(val: Any) -> Optional[int]:
+    """
+    Сумма → целые тиыны. Разделители как у _to_number v2.7 (пробелы, NBSP,
+    апострофы; ',' или '.' — десятичная точка). Больше двух знаков после
+    точки — округление половины от нуля. None — не число.
+    """
+    if val is None or isinstance(val, bool):
+        return None
+    if isinstance(val, int):
+        return val * 100
+    if isinstance(val, float):
+        if val != val or val in (float("inf"), float("-inf")):
+            return None
+        val = repr(val)
+        if "e" in val or "E" in val:
+            val = format(float(val), ".2f")
+    s = str(val).translate(_STRIP)
+    m = _AMOUNT_RE.fullmatch(s)
+    if m is None:
+        return None
+    sign, whole, frac = m.group(1), m.group(2), m.group(3) or ""
+    if not whole and not frac:
+        return None
+    t = int(whole or "0") * 100 + int((frac + "00")[:2])
+    if len(frac) > 2 and frac[2] >= "5":
+        t += 1
+    return -t if sign == "-" else t
+
+# строковый столбец целиком: склейка, чистка и «,»→«.» — одной операцией
+# по тексту; частый случай «ровно два знака после точки» → int() без точки
+_NUM_CHARS = str.maketrans("", "", "0123456789.\n+-")
+_STR_OK_RE = re.compile(r"[+-]?[0-9]+(?:\.[0-9]{1,2})?(?:\n[+-]?[0-9]+(?:\.[0-9]{1,2})?)*")
+_NO_FRAC_RE = re.compile(r"^([+-]?[0-9]+)$", re.M)
+_ONE_FRAC_RE = re.compile(r"(\.[0-9])$", re.M)
+
+def _str_column_tiyn(values: List[str]):
+    """Столбец строк вида 12 345,67 → int64 тиынов; None — есть «нестандартные» значения."""
+    n = len(values)
+    text = "\n".join(values)
+    if text.count("\n") != n - 1:
+        return None
+    text = text.translate(_STRIP).replace(",", ".")
+    if text.translate(_NUM_CHARS):
+        return None
+    parts = text.split("\n")
+    if not (text.count(".") == n and all(p[-3:-2] == "." for p in parts)):
+        if _STR_OK_RE.fullmatch(text) is None:
+            return None
+        text = _ONE_FRAC_RE.sub(r"\g<1>0", _NO_FRAC_RE.sub(r"\1.00", text))
+    np = _numpy()
+    try:
+        return np.array(list(map(int, text.replace(".", "").split("\n"))), dtype=np.int64)
+    except (ValueError, OverflowError):
+        return None
+
+def format_tiyn(t: Optional[int]) -> str:
+    if t is None:
+        return ""
+    sign = "-" if t < 0 else ""
+    t = abs(t)
+    return f"{sign}{t // 100}.{t % 100:02d}"
+
+# --------------------------- столбцы строк ---------------------------
+
+def column(lines: Sequence[Dict[str, Any]], key: str) -> Tuple[Any, List[int]]:
+    """
+    Столбец строк в тиынах: (массив int64 | list[int], индексы нечисловых/пустых).
+    Нечисловые ячейки считаются нулём и возвращаются отдельно.
+    """
+    raw = [ln.get(key) if isinstance(ln, dict) else None for ln in lines]
+    bad: List[int] = []
+    np = _numpy() if raw else None
+    if np is not None and raw and all(type(v) is int for v in raw):
+        return np.asarray(raw, dtype=np.int64) * 100, bad
+    if np is not None and raw and all(type(v) in (int, float) for v in raw):
+        a = np.asarray(raw, dtype=np.float64)
+        if np.isfinite(a).all() and np.abs(a).max() < 2 ** 53 / 100:
+            # ×100 и округление — столбцом; верно, когда у числа не больше двух
+            # знаков (t / 100 — ровно тот же double). Остальные (1.005 — это
+            # 1.00499…) — поштучно parse_tiyn: половина от нуля по записи числа
+            t = np.rint(a * 100)
+            tiyn = t.astype(np.int64)
+            for i in np.flatnonzero(t / 100 != a).tolist():
+                tiyn[i] = parse_tiyn(raw[i])
+            return tiyn, bad
+    if np is not None and raw and all(type(v) is str for v in raw):
+        col = _str_column_tiyn(raw)
+        if col is not None:
+            return col, bad
+    out: List[int] = []
+    cache: Dict[Any, Optional[int]] = {}
+    for i, v in enumerate(raw):
+        k = (type(v), v) if isinstance(v, (str, int, float)) else None
+        t = cache.get(k, cache) if k is not None else cache
+        if t is cache:
+            t = parse_tiyn(v)
+            if k is not None:
+                cache[k] = t
+        if t is None:
+            bad.append(i)
+            t = 0
+        out.append(t)
+    if np is not None:
+        return np.asarray(out, dtype=np.int64), bad
+    return out, bad
+
+def _sum(col: Any) -> int:
+    return int(col.sum()) if hasattr(col, "sum") else sum(col)  # ndarray — только при numpy
+
+def _negatives(col: Any, limit: int = 5) -> List[int]:
+    if hasattr(col, "sum"):
+        return [int(i) for i in _numpy().flatnonzero(col < 0)[:limit]]
+    return [i for i, v in enumerate(col) if v < 0][:limit]
+
+# --------------------------- сверка ---------------------------
+
+class Tolerance:
+    """Допуск в тиынах: abs (тиыны) или rel (доли на миллион от эталона)."""
+
+    __slots__ = ("abs_tiyn", "rel_ppm")
+
+    def __init__(self, abs_tol: Any = 0.5, rel_tol: Any = 0.0005):
+        self.abs_tiyn = parse_tiyn(abs_tol) or 0
+        self.rel_ppm = int(round(float(rel_tol or 0) * 1_000_000))
+
+    def ok(self, got: int, expected: int) -> bool:
+        diff = abs(got - expected)
+        return diff <= self.abs_tiyn or diff * 1_000_000 <= abs(expected) * self.rel_ppm
+
+def tolerance_from_config(config: Dict[str, Any]) -> Tolerance:
+    t = dict(config or {}).get("totals", {})
+    return Tolerance(t.get("tolerance_abs", 0.5), t.get("tolerance_rel", 0.0005))
+
+# total_amount — «без НДС» в схеме генератора (рядом total_with_vat), но в
+# xlsx_reader это копия выбранного итога (prefer_total) рядом с total_gross
+_NET_KEYS = ("total_net",)
+_VAT_KEYS = ("total_vat",)
+_GROSS_KEYS = ("total_with_vat", "total_gross")
+
+def _first_tiyn(doc: Dict[str, Any], keys: Tuple[str, ...]) -> Tuple[Optional[int], Any]:
+    for k in keys:
+        v = doc.get(k)
+        if v is not None and str(v).strip() != "":
+            return parse_tiyn(v), v
+    return None, None
+
+class Amounts:
+    """Итоги документа и суммы столбцов строк, всё в тиынах (None — нет/не число)."""
+
+    __slots__ = ("net", "vat", "gross", "raw", "lines", "line_net", "line_vat",
+                 "bad_net", "bad_vat", "neg_net", "neg_vat")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.net, net_raw = _first_tiyn(doc, _NET_KEYS)
+        self.vat, vat_raw = _first_tiyn(doc, _VAT_KEYS)
+        self.gross, gross_raw = _first_tiyn(doc, _GROSS_KEYS)
+        if net_raw is None and _first_tiyn(doc, ("total_gross",))[1] is None:
+            self.net, net_raw = _first_tiyn(doc, ("total_amount",))
+        self.raw = {"net": net_raw, "vat": vat_raw, "gross": gross_raw}
+        lines = doc.get("lines") or []
+        self.lines = len(lines) if isinstance(lines, list) else 0
+        self.line_net = self.line_vat = None
+        self.bad_net: List[int] = []
+        self.bad_vat: List[int] = []
+        self.neg_net: List[int] = []
+        self.neg_vat: List[int] = []
+        if self.lines:
+            net_col, self.bad_net = column(lines, "amount")
+            vat_col, self.bad_vat = column(lines, "vat_amount")
+            self.line_net, self.line_vat = _sum(net_col), _sum(vat_col)
+            self.neg_net, self.neg_vat = _negatives(net_col), _negatives(vat_col)
+
+    def has_totals(self) -> bool:
+        return any(v is not None for v in (self.net, self.vat, self.gross))
+
+    def pairs(self) -> List[Tuple[str, int, int]]:
+        """Сверяемые пары (что, указано, рассчитано) — только где известны обе стороны."""
+        out: List[Tuple[str, int, int]] = []
+        if self.net is not None and self.vat is not None and self.gross is not None:
+            out.append(("gross", self.gross, self.net + self.vat))
+        if self.net is not None and self.line_net is not None and not self.bad_net:
+            out.append(("net_lines", self.net, self.line_net))
+        if self.vat is not None and self.line_vat is not None and not self.bad_vat:
+            out.append(("vat_lines", self.vat, self.line_vat))
+        return out
+
+def check(am: Amounts, tol: Tolerance) -> List[Tuple[str, str, int, int]]:
+    """
+    Расхождения: (что, тип, указано, рассчитано), тип — "mismatch" (вне допуска)
+    или "rounding" (в пределах допуска, но не ноль).
+    """
+    return [(what, "rounding" if tol.ok(got, expected) else "mismatch", got, expected)
+            for what, got, expected in am.pairs() if got != expected]
+
+# --------------------------- самотест ---------------------------
+if __name__ == "__main__":
+    import random, time
+    assert parse_tiyn("168 000,00") == 16_800_000
+    assert parse_tiyn("12'345.675") == 1_234_568
+    assert parse_tiyn("-10,5") == -1050
+    assert parse_tiyn(0.1) == 10 and parse_tiyn(1e-05) == 0 and parse_tiyn("ABC") is None
+    # столбец float и parse_tiyn округляют одинаково (половина от нуля по записи числа)
+    rnd = random.Random(2)
+    floats = [1.005, 2.675, -1.005, 0.125, 1e-05] + [round(rnd.uniform(-1000, 1000), rnd.randint(0, 4))
+                                                     for _ in range(20_000)]
+    col, _ = column([{"a": v} for v in floats], "a")
+    assert [int(x) for x in col] == [parse_tiyn(v) for v in floats]
+    assert [int(x) for x in col[:3]] == [101, 268, -101]
+    rnd = random.Random(1)
+    lines = [{"amount": round(rnd.uniform(1, 100000), 2), "vat_amount": round(rnd.uniform(0, 12000), 2)}
+             for _ in range(10_000)]
+    doc = {"lines": lines}
+    t0 = time.perf_counter(); am = Amounts(doc); t1 = time.perf_counter()
+    ref = sum(parse_tiyn(ln["amount"]) for ln in lines)
+    assert am.line_net == ref, (am.line_net, ref)
+    str_doc = {"lines": [{"amount": f"{ln['amount']:,.2f}".replace(",", " "), "vat_amount": str(ln["vat_amount"])}
+                         for ln in lines]}
+    t2 = time.perf_counter(); am2 = Amounts(str_doc); t3 = time.perf_counter()
+    assert (am2.line_net, am2.line_vat) == (am.line_net, am.line_vat)
+    print(f"10k строк: числа {1000 * (t1 - t0):.2f} мс, строки {1000 * (t3 - t2):.2f} мс; "
+          f"итого {format_tiyn(am.line_net)} + НДС {format_tiyn(am.line_vat)}")
@@ -0,0 +1,236 @@
+# ============================================================
+# result_cache.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: кэш результатов проверки по содержимому файла.
+#   Ключ = хэш файла + хэш чек-листа + хэш значимых для правил ключей
+#   конфига (rules_engine.config_keys() + приоритеты/отладка валидатора)
+#   + отпечаток исходников core/*.py. Смена правил, чек-листа или
+#   настроек меняет ключ — старые записи просто не находятся и со
+#   временем вытесняются.
+#   Хранилище — SQLite (WAL) в data/cache/, размер ограничен
+#   (result_cache.max_mb), вытеснение по давности использования.
+#   Настройки: config.json → "result_cache": {"enabled", "path", "max_mb"}.
+# ============================================================
+
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import utils
+
+_CHUNK = 1 << 20
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key       TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    nbytes    INTEGER NOT NULL,
+    created   REAL NOT NULL,
+    used      REAL NOT NULL,
+    payload   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results(used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta(name, value) VALUES ('bytes', 0);
+"""
+
+def _core_dir() -> str:
+    return os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------- ключи ---------------------------
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+_CODE_DIGEST: Optional[str] = None
+_MEMO: Tuple[Any, str] = (None, "")  # (CONFIG, дайджест) — CONFIG подменяется целиком
+
+def data_hash(data: bytes) -> str:
+    """То же, что file_hash, но по уже прочитанному содержимому."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def _code_digest() -> str:
+    """Отпечаток исходников ядра (имя, mtime, размер) на момент импорта — правка правил сбрасывает кэш."""
+    global _CODE_DIGEST
+    if _CODE_DIGEST is not None:
+        return _CODE_DIGEST
+    h = hashlib.blake2b(digest_size=12)
+    for p in sorted(glob.glob(os.path.join(_core_dir(), "*.py"))):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        h.update(f"{os.path.basename(p)}:{st.st_mtime_ns}:{st.st_size};".encode())
+    _CODE_DIGEST = h.hexdigest()
+    return _CODE_DIGEST
+
+def _dotted(cfg: Dict[str, Any], key: str) -> Any:
+    node: Any = cfg
+    for part in key.split("."):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+def rules_digest() -> str:
+    """Хэш всего, что влияет на результат validate_document при том же файле."""
+    global _MEMO
+    from . import checklist, rules_engine, validator
+    cfg = rules_engine.CONFIG
+    if _MEMO[0] is cfg:
+        return _MEMO[1]
+    picked = {k: _dotted(cfg, k) for k in rules_engine.config_keys()}
+    picked["@validator"] = [validator.RULE_PRIORITY, validator.DEBUG_SHOW_VALUES]
+    picked["@checklist"] = checklist.digest()
+    picked["@rules"] = [s.code for s in rules_engine._active_specs()]
+    picked["@code"] = _code_digest()
+    blob = json.dumps(picked, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+    _MEMO = (cfg, digest)
+    return digest
+
+def cache_key(fhash: str) -> str:
+    return f"{fhash}:{rules_digest()}"
+
+# --------------------------- хранилище ---------------------------
+
+class ResultCache:
+    """SQLite-кэш: ключ → список (code, level, message)."""
+
+    def __init__(self, path: str, max_bytes: int = 64 << 20):
+        self.path, self.max_bytes = path, int(max_bytes)
+        self.hits = self.misses = self.evicted = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as db:
+            db.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key: str) -> Optional[List[Tuple[str, str, str]]]:
+        db = self._conn()
+        row = db.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            with db:
+                db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.OperationalError:
+            pass  # занято другим процессом — давность не обновим, не страшно
+        return [tuple(x) for x in json.loads(row[0])]
+
+    def put(self, key: str, fhash: str, results: List[Tuple[str, str, str]]) -> None:
+        payload = json.dumps([list(r) for r in results], ensure_ascii=False)
+        nbytes = len(payload.encode("utf-8")) + len(key) + len(fhash)
+        now = time.time()
+        db = self._conn()
+        with db:
+            old = db.execute("SELECT nbytes FROM results WHERE key = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO results(key, file_hash, nbytes, created, used, payload) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (key, fhash, nbytes, now, now, payload))
+            db.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'",
+                       (nbytes - (old[0] if old else 0),))
+            total = db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(db, total, int(self.max_bytes * 0.9))
+
+    def _evict(self, db: sqlite3.Connection, total: int, target: int) -> None:
+        """Удаляет давно не использованные записи, пока объём не станет ≤ target."""
+        freed = 0
+        while total - freed > target:
+            rows = db.execute("SELECT key, nbytes FROM results ORDER BY used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for k, n in rows:
+                db.execute("DELETE FROM results WHERE key = ?", (k,))
+                freed += n
+                self.evicted += 1
+                if total - freed <= target:
+                    break
+        db.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (freed,))
+
+    def clear(self) -> None:
+        db = self._conn()
+        with db:
+            db.execute("DELETE FROM results")
+            db.execute("UPDATE meta SET value = 0 WHERE name = 'bytes'")
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._conn()
+        rows, = db.execute("SELECT COUNT(*) FROM results").fetchone()
+        size, = db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()
+        return {"path": self.path, "entries": rows, "bytes": size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+# --------------------------- по умолчанию ---------------------------
+
+_DEFAULT: Optional[ResultCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default() -> Optional[ResultCache]:
+    """Кэш из config.json ("result_cache"); None — выключен или недоступен."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                sect = utils.load_config().get("result_cache", {}) or {}
+                if not sect.get("enabled", True):
+                    _DEFAULT = False  # type: ignore[assignment]
+                else:
+                    path = sect.get("path") or os.path.join("data", "cache", "results.sqlite")
+                    if not os.path.isabs(path):
+                        path = os.path.join(os.path.dirname(_core_dir()), path)
+                    try:
+                        _DEFAULT = ResultCache(path, int(float(sect.get("max_mb", 64)) * (1 << 20)))
+                    except (sqlite3.Error, OSError):
+                        _DEFAULT = False  # type: ignore[assignment]
+    return _DEFAULT or None
+
+def lookup(path: str) -> Tuple[Optional[str], Optional[str], Optional[List[Tuple[str, str, str]]]]:
+    """(хэш файла, ключ, результаты|None). Без кэша — (None, None, None)."""
+    if default() is None:
+        return None, None, None
+    return lookup_hash(file_hash(path))
+
+def lookup_hash(fhash: str) -> Tuple[Optional[str], Optional[str], Optional[List[Tuple[str, str, str]]]]:
+    """Как lookup(), но хэш файла уже посчитан (содержимое прочитано заранее)."""
+    cache = default()
+    if cache is None:
+        return None, None, None
+    key = cache_key(fhash)
+    try:
+        return fhash, key, cache.get(key)
+    except sqlite3.Error:
+        return fhash, key, None
+
+def store(key: Optional[str], fhash: Optional[str], results) -> None:
+    """Сохраняет ValidationResult'ы (или кортежи) под ключом из lookup()."""
+    cache = default()
+    if cache is None or key is None or fhash is None:
+        return
+    rows = [(r.code, r.level, r.message) if hasattr(r, "code") else tuple(r) for r in results]
+    try:
+        cache.put(key, fhash, rows)
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,343 @@
+# ============================================================
+# result_store.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: хранилище результатов для запросов инспектора.
+#   Результаты уходили только в окно GUI и JSONL, и вопрос «все BIN012
+#   по поставщику X за октябрь» решался grep'ом. Теперь — SQLite (WAL):
+#     documents — путь, хэш, статус, время проверки (одна строка на путь,
+#                 повторная проверка заменяет прежние результаты);
+#     fields    — БИН поставщика/покупателя, дата выписки (ISO), итог
+#                 в тиынах (rules_engine.key_fields; у результата из
+#                 кэша — из делового ключа или от документа с тем же хэшем);
+#     results   — код, уровень, текст.
+#   Индексы: fields(supplier_bin, issue_date), fields(buyer_bin,
+#   issue_date), fields(issue_date), results(code, level).
+#   Запись — пачками в одной транзакции (add_many).
+#   python -m core.result_store query --code BIN012 --supplier X --month 2026-10
+#   python -m core.result_store import res.jsonl | stats | bench
+#   Пишут: batch/watch с --store, GUI — при result_store.enabled.
+#   Настройки: config.json → "result_store".
+# ============================================================
+
+from __future__ import annotations
+import calendar
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import utils
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id        INTEGER PRIMARY KEY,
+    path      TEXT NOT NULL UNIQUE,
+    file_hash TEXT,
+    status    TEXT NOT NULL,
+    error     TEXT,
+    checked   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    doc_id       INTEGER PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+    supplier_bin TEXT NOT NULL,
+    buyer_bin    TEXT NOT NULL,
+    issue_date   TEXT NOT NULL,
+    total_tiyn   INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    doc_id  INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    code    TEXT NOT NULL,
+    level   TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fields_supplier ON fields(supplier_bin, issue_date);
+CREATE INDEX IF NOT EXISTS fields_buyer ON fields(buyer_bin, issue_date);
+CREATE INDEX IF NOT EXISTS fields_date ON fields(issue_date);
+CREATE INDEX IF NOT EXISTS results_code ON results(code, level);
+CREATE INDEX IF NOT EXISTS results_doc ON results(doc_id);
+CREATE INDEX IF NOT EXISTS documents_status ON documents(status);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents(file_hash);
+"""
+
+def key_fields(rec: Dict[str, Any]) -> Optional[Tuple[str, str, str, Optional[int]]]:
+    """(поставщик, покупатель, дата, итог) из записи: fields или business_key; None — нет."""
+    f = rec.get("fields")
+    if f:
+        return (f.get("supplier_bin") or "", f.get("buyer_bin") or "", f.get("issue_date") or "",
+                f.get("total_tiyn"))
+    parts = (rec.get("business_key") or "").split("|")
+    if len(parts) != 4:
+        return None
+    supplier, buyer, issued, total = parts
+    try:
+        tiyn: Optional[int] = int(total)
+    except ValueError:
+        tiyn = None
+    return supplier, buyer, issued, tiyn
+
+def month_range(month: str) -> Tuple[str, str]:
+    """'2026-10' → ('2026-10-01', '2026-10-31')."""
+    y, m = (int(x) for x in month.split("-", 1))
+    return f"{y:04d}-{m:02d}-01", f"{y:04d}-{m:02d}-{calendar.monthrange(y, m)[1]:02d}"
+
+class ResultStore:
+    """documents / fields / results в SQLite; запись пачками, выборки по индексам."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            db.execute("PRAGMA cache_size=-65536")  # 64 МБ страниц на соединение
+            self._local.db = db
+        return db
+
+    # ---------- запись ----------
+    def add_many(self, recs: Iterable[Dict[str, Any]]) -> int:
+        """Записи batch/reader (path, status, results, business_key, …) — одной транзакцией."""
+        db = self._conn()
+        now = time.time()
+        n = 0
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for rec in recs:
+                status = "failed" if "error" in rec else str(rec.get("status") or "")
+                doc_id, = db.execute(
+                    "INSERT INTO documents(path, file_hash, status, error, checked) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET file_hash = excluded.file_hash, status = excluded.status, "
+                    "error = excluded.error, checked = excluded.checked RETURNING id",
+                    (rec["path"], rec.get("file_hash"), status, rec.get("error"),
+                     float(rec.get("checked") or now))).fetchone()
+                # повторная проверка пути: прежние результаты и поля — от прежнего содержимого
+                db.execute("DELETE FROM results WHERE doc_id = ?", (doc_id,))
+                db.execute("DELETE FROM fields WHERE doc_id = ?", (doc_id,))
+                kf = key_fields(rec)
+                if kf is not None:
+                    db.execute("INSERT INTO fields(doc_id, supplier_bin, buyer_bin, issue_date, "
+                               "total_tiyn) VALUES (?, ?, ?, ?, ?)", (doc_id,) + kf)
+                elif rec.get("file_hash"):
+                    # результат из кэша без полей — берём у документа с тем же содержимым
+                    db.execute("INSERT INTO fields(doc_id, supplier_bin, buyer_bin, issue_date, "
+                               "total_tiyn) SELECT ?, f.supplier_bin, f.buyer_bin, f.issue_date, f.total_tiyn "
+                               "FROM documents d JOIN fields f ON f.doc_id = d.id "
+                               "WHERE d.file_hash = ? LIMIT 1", (doc_id, rec["file_hash"]))
+                db.executemany("INSERT INTO results(doc_id, code, level, message) VALUES (?, ?, ?, ?)",
+                               ((doc_id, r.get("code", ""), r.get("level", ""), r.get("message", ""))
+                                for r in rec.get("results") or ()))
+                n += 1
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return n
+
+    def optimize(self) -> None:
+        """Статистика для планировщика после крупной загрузки."""
+        self._conn().execute("PRAGMA optimize")
+
+    # ---------- выборки ----------
+    def query(self, code: Optional[str] = None, level: Optional[str] = None,
+              supplier: Optional[str] = None, buyer: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              status: Optional[str] = None, path_like: Optional[str] = None,
+              limit: Optional[int] = 100, count: bool = False, explain: bool = False) -> Any:
+        """
+        Результаты проверки по условиям (все — через AND); даты — ISO,
+        границы включительно. count=True — только число строк;
+        explain=True — план запроса SQLite.
+        """
+        where, args = [], []
+        if code:
+            where.append("r.code = ?"); args.append(code.upper())
+        if level:
+            where.append("r.level = ?"); args.append(level.upper())
+        if supplier:
+            where.append("f.supplier_bin = ?"); args.append(utils.only_digits(supplier))
+        if buyer:
+            where.append("f.buyer_bin = ?"); args.append(utils.only_digits(buyer))
+        if date_from:
+            where.append("f.issue_date >= ?"); args.append(date_from)
+        if date_to:
+            where.append("f.issue_date <= ?"); args.append(date_to)
+        if status:
+            where.append("d.status = ?"); args.append(status.lower())
+        if path_like:
+            where.append("d.path LIKE ?"); args.append(path_like)
+        need_fields = any(x for x in (supplier, buyer, date_from, date_to))
+        cols = ("COUNT(*)" if count else
+                "d.path, d.status, f.supplier_bin, f.buyer_bin, f.issue_date, f.total_tiyn, "
+                "r.code, r.level, r.message")
+        sql = (f"SELECT {cols} FROM results r JOIN documents d ON d.id = r.doc_id "
+               f"{'JOIN' if need_fields else 'LEFT JOIN'} fields f ON f.doc_id = r.doc_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if not count:
+            sql += " ORDER BY f.issue_date, d.path, r.code"
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+        db = self._conn()
+        if explain:
+            return [row[-1] for row in db.execute("EXPLAIN QUERY PLAN " + sql, args)]
+        if count:
+            return db.execute(sql, args).fetchone()[0]
+        names = ("path", "status", "supplier_bin", "buyer_bin", "issue_date", "total_tiyn",
+                 "code", "level", "message")
+        return [dict(zip(names, row)) for row in db.execute(sql, args)]
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._conn()
+        out: Dict[str, Any] = {"path": self.path}
+        for t in ("documents", "fields", "results"):
+            out[t] = db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+        out["by_level"] = dict(db.execute("SELECT level, COUNT(*) FROM results GROUP BY level"))
+        return out
+
+# --------------------------- по умолчанию ---------------------------
+
+_DEFAULT: Optional[ResultStore] = None
+_DEFAULT_LOCK = threading.Lock()
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("result_store", {}) or {}
+    path = sect.get("path") or os.path.join("data", "results.sqlite")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return {"enabled": bool(sect.get("enabled", False)), "path": path,
+            "batch_size": int(sect.get("batch_size", 500) or 500)}
+
+def default() -> ResultStore:
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = ResultStore(settings()["path"])
+    return _DEFAULT
+
+class Writer:
+    """Буфер записей → add_many пачками по batch_size (batch/watch)."""
+
+    def __init__(self, store: Optional[ResultStore] = None, batch_size: Optional[int] = None):
+        self.store = store or default()
+        self.batch_size = batch_size or settings()["batch_size"]
+        self.written = 0
+        self._buf: List[Dict[str, Any]] = []
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        self._buf.append(rec)
+        if len(self._buf) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self.written += self.store.add_many(self._buf)
+            self._buf = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.written:
+            self.store.optimize()
+
+# --------------------------- CLI ---------------------------
+
+def _bench(store: ResultStore, docs: int) -> None:
+    """Синтетическая загрузка: docs документов по ~8 результатов."""
+    import random
+    rnd = random.Random(1)
+    suppliers = [f"{rnd.randrange(10**11, 10**12)}" for _ in range(2000)]
+    codes = [("BIN001", "INFO"), ("BIN002", "INFO"), ("BIN012", "ERROR"), ("D000", "INFO"), ("D001", "WARN"),
+             ("TOT001", "INFO"), ("TOT002", "ERROR"), ("NEG001", "INFO"), ("DUP001", "WARN")]
+    t0 = time.perf_counter()
+    w = Writer(store, 2000)
+    for i in range(docs):
+        d = f"2026-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}"
+        w.add({"path": f"/bench/{i:08d}.pdf", "status": "warn",
+               "fields": {"supplier_bin": rnd.choice(suppliers), "buyer_bin": rnd.choice(suppliers),
+                          "issue_date": d, "total_tiyn": rnd.randrange(10**7)},
+               "results": [{"code": c, "level": l, "message": f"{c} {l}"} for c, l in rnd.sample(codes, 8)]})
+    w.close()
+    dt = time.perf_counter() - t0
+    print(f"загружено {docs} документов ({docs * 8} результатов) за {dt:.1f} с "
+          f"({docs * 8 / dt:,.0f} результатов/с)")
+    sup = suppliers[7]
+    lo, hi = month_range("2026-10")
+    for label, kw in (("BIN012 поставщика за октябрь", dict(code="BIN012", supplier=sup, date_from=lo, date_to=hi)),
+                      ("все результаты покупателя", dict(buyer=sup)),
+                      ("TOT002 ERROR за день", dict(code="TOT002", level="ERROR", date_from="2026-10-05",
+                                                     date_to="2026-10-05"))):
+        t = time.perf_counter()
+        rows = store.query(limit=None, **kw)
+        print(f"  {label:32s} {len(rows):6d} строк  {(time.perf_counter() - t) * 1000:7.1f} мс")
+
+if __name__ == "__main__":
+    import argparse, sys
+    ap = argparse.ArgumentParser(prog="python -m core.result_store")
+    ap.add_argument("--db", default=None, help="файл хранилища (по умолчанию из config.json)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("query", help="выборка результатов")
+    q.add_argument("--code"); q.add_argument("--level")
+    q.add_argument("--supplier", help="БИН поставщика"); q.add_argument("--buyer", help="БИН покупателя")
+    q.add_argument("--from", dest="date_from", help="дата выписки с (ГГГГ-ММ-ДД)")
+    q.add_argument("--to", dest="date_to", help="дата выписки по (ГГГГ-ММ-ДД)")
+    q.add_argument("--month", help="ГГГГ-ММ — вместо --from/--to")
+    q.add_argument("--status", help="ok / warn / error / failed")
+    q.add_argument("--path", dest="path_like", help="шаблон пути (LIKE, %% — любые символы)")
+    q.add_argument("--limit", type=int, default=100, help="0 — без ограничения")
+    q.add_argument("--count", action="store_true", help="только число строк")
+    q.add_argument("--explain", action="store_true", help="план запроса")
+    q.add_argument("--jsonl", action="store_true", help="вывод JSONL вместо таблицы")
+    im = sub.add_parser("import", help="загрузить JSONL из batch/watch")
+    im.add_argument("files", nargs="+")
+    sub.add_parser("stats", help="объём хранилища")
+    b = sub.add_parser("bench", help="синтетическая загрузка и замер запросов (в отдельный файл)")
+    b.add_argument("--docs", type=int, default=200000)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        path = args.db or os.path.join(os.path.dirname(settings()["path"]), "results_bench.sqlite")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        _bench(ResultStore(path), args.docs)
+        raise SystemExit(0)
+    store = ResultStore(args.db) if args.db else default()
+    if args.cmd == "stats":
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    elif args.cmd == "import":
+        w = Writer(store)
+        for name in args.files:
+            with open(name, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        w.add(json.loads(line))
+        w.close()
+        print(f"Загружено документов: {w.written}", file=sys.stderr)
+    else:
+        if args.month:
+            args.date_from, args.date_to = month_range(args.month)
+        kw = dict(code=args.code, level=args.level, supplier=args.supplier, buyer=args.buyer,
+                  date_from=args.date_from, date_to=args.date_to, status=args.status, path_like=args.path_like)
+        if args.explain:
+            print("\n".join(store.query(explain=True, **kw)))
+            raise SystemExit(0)
+        t0 = time.perf_counter()
+        if args.count:
+            print(store.query(count=True, **kw))
+        else:
+            rows = store.query(limit=args.limit or None, **kw)
+            for r in rows:
+                if args.jsonl:
+                    print(json.dumps(r, ensure_ascii=False))
+                else:
+                    print(f"{r['issue_date'] or '—':10s}  {r['supplier_bin'] or '—':12s}  {r['code']:7s} "
+                          f"{r['level']:5s}  {r['path']}")
+        print(f"{(time.perf_counter() - t0) * 1000:.1f} мс", file=sys.stderr)
@@ -0,0 +1,209 @@
+# ============================================================
+# rules_batch.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: пакетная (колоночная) проверка уже извлечённых
+#   документов. Ночная перепроверка бэклогов (100k+ документов) шла
+#   через run_all_rules по одному dict'у с ветвлением на Python.
+#   Здесь канонические поля пакуются в столбцы NumPy, а проверки
+#   BIN001/BIN002/BIN007/BIN012/D000/D001/TOT001/NEG001 считаются
+#   векторно. Результат — те же элементы, что и у run_all_rules.
+#   Без NumPy — прозрачный откат на поштучный путь.
+# ============================================================
+
+from __future__ import annotations
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # numpy — опциональная зависимость
+    np = None
+
+from . import bin_checksum
+from . import instrumentation
+from . import rules_engine as eng
+from . import utils
+
+# Коды, которые умеем считать векторно; остальные правила из реестра
+# выполняются поштучно на том же контексте (поля уже резолвлены).
+_VECTOR_CODES = ("BIN001", "BIN002", "BIN007", "BIN012", "D000", "D001", "TOT001", "NEG001")
+
+# --------------------------- упаковка столбцов ---------------------------
+
+def _map_unique(values: List[str], fn: Callable[[str], Any]) -> List[Any]:
+    """fn считается один раз на уникальное значение (в бэклогах много повторов)."""
+    cache: Dict[str, Any] = {}
+    out = []
+    for v in values:
+        r = cache.get(v, cache)
+        if r is cache:
+            r = cache[v] = fn(v)
+        out.append(r)
+    return out
+
+def _date_ordinal(s: str) -> int:
+    dt = eng._parse_date_any(s)
+    return dt.toordinal() if dt is not None else -1
+
+def _number_or_nan(s: str) -> float:
+    if s == "":
+        return float("nan")
+    num = eng._to_number(s)
+    return float("nan") if num is None else num
+
+def _bin_columns(values: List[str]):
+    """(маска len==12, контрольная сумма валидна) для столбца БИН."""
+    digits = _map_unique(values, eng._only_digits)
+    lengths = np.fromiter((len(d) for d in digits), dtype=np.int32, count=len(digits))
+    is_bin = lengths == 12
+    return is_bin, bin_checksum.validate_many(digits)
+
+# --------------------------- API ---------------------------
+
+def run_rules_batch(docs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Пакетный аналог [run_all_rules(d) for d in docs]: тот же порядок
+    и те же элементы результатов для каждого документа.
+    """
+    docs = list(docs or [])
+    if np is None or not docs:
+        return [eng.run_all_rules(d) for d in docs]
+
+    t0 = time.perf_counter()
+    specs = eng._active_specs()
+    ctxs = [eng._DocContext(utils.normalize_keys(d or {})) for d in docs]
+    n = len(ctxs)
+
+    # документы с ошибкой резолва поля — целиком по поштучному пути
+    fields = eng._spec_fields(specs)
+    slow = np.zeros(n, dtype=bool)
+    for i, ctx in enumerate(ctxs):
+        eng._resolve_fields(ctx, fields)
+        if any(isinstance(v, Exception) for v in ctx._fields.values()):
+            slow[i] = True
+
+    def col(name: str) -> List[str]:
+        return [("" if slow[i] else ctx._fields.get(name, "")) for i, ctx in enumerate(ctxs)]
+
+    t1 = time.perf_counter()
+    sup, buy = col("supplier_bin"), col("buyer_bin")
+    dates, totals = col("issue_date"), col("total")
+
+    sup_is_bin, sup_valid = _bin_columns(sup)
+    buy_is_bin, buy_valid = _bin_columns(buy)
+    sup_a = np.array(sup, dtype=object)
+    buy_a = np.array(buy, dtype=object)
+    both = (sup_a != "") & (buy_a != "")
+    bins_equal = both & (sup_a == buy_a)
+
+    date_ord = np.array(_map_unique(dates, _date_ordinal), dtype=np.int64)
+    date_ok = date_ord >= 0
+    date_future = date_ok & (date_ord > date.today().toordinal())
+
+    total_num = np.array(_map_unique(totals, _number_or_nan), dtype=np.float64)
+    total_empty = np.array([t == "" for t in totals], dtype=bool)
+    total_nan = np.isnan(total_num)
+    with np.errstate(invalid="ignore"):
+        rounded = np.round(total_num)
+        suspicious = ~total_nan & (np.abs(total_num - rounded) < 1e-9) & (rounded >= 1) & (rounded <= 12)
+        tot_bad = total_nan | (total_num <= 0) | suspicious
+        negative = ~total_nan & (total_num < 0)
+
+    t2 = time.perf_counter()
+    cfg = eng.RULES
+    allow_equal = bool(eng.CONFIG.get("bin_rules", {}).get("allow_equal_bins", False))
+    d000_level = eng.d000_level()
+    mk = eng._make_item
+
+    def bin012(val: str, ok: bool, role: str) -> Dict[str, Any]:
+        c = cfg.get("BIN012", {})
+        if not ok:
+            user = eng._role_user(c.get("user", {}), role, "Ошибка контрольной суммы")
+            return mk("BIN012", c.get("level", "ERROR"), user, value=val)
+        return mk("BIN012", "OK", eng._ok_user(f"Контрольная сумма БИН {role}: ОК"), value=val)
+
+    # None — правило не векторное (своё/переопределённое), выполняем поштучно
+    plan = [(spec, spec.code if spec.code in _VECTOR_CODES and spec.fn is getattr(eng, f"_rule_{spec.code}", None) else None)
+            for spec in specs]
+
+    out: List[List[Dict[str, Any]]] = []
+    for i, ctx in enumerate(ctxs):
+        if slow[i]:
+            out.append(eng._run_specs(ctx, specs))
+            continue
+        items: List[Dict[str, Any]] = []
+        for spec, code in plan:
+            if code is None:
+                items.extend(eng._run_specs(ctx, [spec]))
+            elif code == "BIN001":
+                c = cfg.get("BIN001", {})
+                items.append(mk("BIN001", "OK", eng._ok_user("БИН поставщика распознан"), value=sup[i]) if sup_is_bin[i]
+                             else mk("BIN001", c.get("level", "ERROR"), c.get("user", {}), value=sup[i]))
+            elif code == "BIN002":
+                c = cfg.get("BIN002", {})
+                items.append(mk("BIN002", "OK", eng._ok_user("БИН покупателя распознан"), value=buy[i]) if buy_is_bin[i]
+                             else mk("BIN002", c.get("level", "ERROR"), c.get("user", {}), value=buy[i]))
+            elif code == "BIN007":
+                if not both[i]:
+                    continue
+                c = cfg.get("BIN007", {})
+                v = f"{sup[i]}/{buy[i]}"
+                if bins_equal[i]:
+                    items.append(mk("BIN007", "OK", c.get("ok_user", eng._ok_user("БИНы совпадают (разрешено)")), value=v) if allow_equal
+                                 else mk("BIN007", c.get("level", "WARN"), c.get("user", {}), value=v))
+                else:
+                    items.append(mk("BIN007", "OK", c.get("ok_user", eng._ok_user("БИНы различаются")), value=v))
+            elif code == "BIN012":
+                if sup_is_bin[i]:
+                    items.append(bin012(sup[i], bool(sup_valid[i]), "поставщика"))
+                if buy_is_bin[i]:
+                    items.append(bin012(buy[i], bool(buy_valid[i]), "покупателя"))
+            elif code == "D000":
+                items.append(mk("D000", "OK", eng._ok_user("Дата распознана"), value=dates[i]) if date_ok[i]
+                             else mk("D000", d000_level, cfg.get("D000", {}).get("user", {}), value=dates[i]))
+            elif code == "D001":
+                c = cfg.get("D001", {})
+                items.append(mk("D001", c.get("level", "ERROR"), c.get("user", {}), value=dates[i]) if date_future[i]
+                             else mk("D001", "OK", eng._ok_user("Дата не в будущем"), value=dates[i]))
+            elif code == "TOT001":
+                c = cfg.get("TOT001", {})
+                if total_empty[i]:
+                    items.append(mk("TOT001", c.get("level", "ERROR"), c.get("user", {}), value=None))
+                elif tot_bad[i]:
+                    items.append(mk("TOT001", c.get("level", "ERROR"), c.get("user", {}), value=totals[i]))
+                else:
+                    items.append(mk("TOT001", "OK", eng._ok_user("Итоговая сумма указана корректно"), value=totals[i]))
+            elif code == "NEG001":
+                if not total_empty[i] and negative[i]:
+                    c = cfg.get("NEG001", {})
+                    items.append(mk("NEG001", c.get("level", "WARN"), c.get("user", {}), value=totals[i]))
+        out.append(items)
+    if instrumentation.ENABLED:
+        t3 = time.perf_counter()
+        instrumentation.record_phase("batch.resolve_fields", t1 - t0)
+        instrumentation.record_phase("batch.vector_checks", t2 - t1)
+        instrumentation.record_phase("batch.build_items", t3 - t2)
+    return out
+
+# --------------------------- самотест (паритет) ---------------------------
+if __name__ == "__main__":
+    import random
+    rnd = random.Random(7)
+
+    def _rand_bin() -> str:
+        return rnd.choice(["", "12345", "0000a0000000", "".join(rnd.choice("0123456789") for _ in range(12))])
+
+    sample: List[Dict[str, Any]] = []
+    for _ in range(20000):
+        sup = _rand_bin()
+        buy = sup if rnd.random() < 0.1 else _rand_bin()
+        sample.append({
+            "supplier_BIN": sup, "recipient_BIN": buy,
+            "issue_date": rnd.choice(["", "2025-09-21", "21.09.2025", "2031-01-01", "32.13.2025"]),
+            "total_amount": rnd.choice(["", "0", "5", "-10,5", "168 000.00", "abc", "12.5"]),
+        })
+    t0 = time.perf_counter(); ref = [eng.run_all_rules(d) for d in sample]; t1 = time.perf_counter()
+    got = run_rules_batch(sample); t2 = time.perf_counter()
+    assert got == ref, "run_rules_batch расходится с run_all_rules"
+    print(f"паритет OK: {len(sample)} док.; поштучно {t1 - t0:.2f} с, пакетом {t2 - t1:.2f} с")
@@ -5,16 +5,47 @@
 #                  входные данные через core.utils.normalize_keys()
 #                  (без изменения логики правил). Остальной код
 #                  оставлен как есть для сохранения поведения v2.7.
+# [2026-10-19] perf: регулярки меток/дат/сумм/разделов берутся из
+#                  core.patterns (компилируются один раз из конфига);
+#                  reload_config() пересобирает реестр атомарно.
+# [2026-10-19] refactor: правила регистрируются декоратором @rule(...)
+#                  с декларацией канонических полей (supplier_bin,
+#                  buyer_bin, issue_date, total); поля резолвятся один
+#                  раз на документ, правила без обязательных полей
+#                  пропускаются.
+# [2026-10-19] perf: починка кодировки — core.mojibake (быстрый детектор,
+#                  перекодировка только не-ASCII участков), результат
+#                  кэшируется в контексте документа.
+# [2026-10-19] feat: замеры правил/полей (core.instrumentation), включаются
+#                  из конфига ("instrumentation.enabled").
+# [2026-10-19] perf: чек-лист — из снимка core.checklist (без json.load на импорте).
+# [2026-10-19] feat: run_triage() — вердикт «есть ли ERROR» без сборки сообщений,
+#                  правила по убыванию (частота ERROR / стоимость), стоп на первом.
+# [2026-10-19] perf: _find_total_value — линейный разбор (_TotalScan) вместо
+#                  откатывающихся объединённых регулярок.
+# [2026-10-19] feat: сверка строк и итогов в тиынах (core.reconcile):
+#                  TOT002 (не сходятся), TOT003 (нули), TOT004 (округление), NEG002.
+# [2026-10-19] feat: business_key() / key_fields() / duplicate_item() — для индекса дубликатов
+#                  (DUP001 выставляет core.reader, правило вне реестра: зависит
+#                  не от документа, а от истории проверок).
 # (см. историю правок внутри файла)
 # ============================================================
 
 import os
 import json
 import re
+import time
+from bisect import bisect_left, bisect_right
 from datetime import datetime, date
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 from . import utils  # [2025-11-18] нормализация канона полей
+from . import patterns  # [2026-10-19] предкомпилированные шаблоны
+from . import bin_checksum
+from . import mojibake
+from . import instrumentation
+from . import checklist
+from . import reconcile
 
 # --------------------------- загрузка ---------------------------
 
@@ -36,13 +67,29 @@ CONFIG = _load_json([
     os.path.join(_core_dir(), "config.json"),
 ])
 
-CHECKLIST_JSON = _load_json([
-    os.path.join(_core_dir(), "rules", "checklist_full_v2.7.json"),
-    os.path.join(_core_dir(), "checklist_full_v2.7.json"),
-])
+# [2026-10-19] perf: чек-лист читается из скомпилированного снимка (core.checklist);
+#                   другие версии — checklist.load("2.6") и т.п. по запросу.
+CHECKLIST_JSON = checklist.load(checklist.DEFAULT_VERSION)
 
 RULES = CHECKLIST_JSON.get("rules", {})
 
+instrumentation.configure(CONFIG)
+
+def reload_config(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Перечитать config.json (или принять готовый dict) и пересобрать шаблоны."""
+    global CONFIG
+    if config is None:
+        config = _load_json([
+            os.path.join(_project_root(), "config.json"),
+            os.path.join(_core_dir(), "config.json"),
+        ])
+    patterns.rebuild(config)  # при битой регулярке бросит re.error, CONFIG не меняем
+    CONFIG = config  # instrumentation — только при загрузке: не сбрасывать переключатель GUI
+    return CONFIG
+
+def _patterns() -> patterns.PatternRegistry:
+    return patterns.get(CONFIG)
+
 # --------------------------- утилиты (оригинал сохранён) ---------------------------
 
 def _only_digits(s: str) -> str:
@@ -65,6 +112,27 @@ def _parse_date_numeric(s: str) -> Optional[datetime]:
             continue
     return None
 
+# [2026-10-19] perf: словари user для OK-элементов и вариантов с ролью общие
+#   (по одному на текст), а не новый на каждый элемент; их не изменяют.
+_OK_USERS: Dict[str, Dict[str, Any]] = {}
+_ROLE_USERS: Dict[Tuple[int, str], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+def _ok_user(title: str) -> Dict[str, Any]:
+    u = _OK_USERS.get(title)
+    if u is None:
+        u = _OK_USERS[title] = {"title": title}
+    return u
+
+def _role_user(user: Dict[str, Any], role: str, default_title: str) -> Dict[str, Any]:
+    """Копия user с «(роль)» в заголовке — одна на (словарь чек-листа, роль)."""
+    hit = _ROLE_USERS.get((id(user), role))
+    if hit is not None and hit[0] is user:
+        return hit[1]
+    variant = dict(user)
+    variant["title"] = f"{user.get('title', default_title)} ({role})"
+    _ROLE_USERS[(id(user), role)] = (user, variant)
+    return variant
+
 def _make_item(code: str, level: str, user: Dict[str, Any], value=None) -> Dict[str, Any]:
     item = {"code": code, "level": level, "user": user}
     if value is not None:
@@ -97,63 +165,36 @@ def _to_number(val: str) -> Optional[float]:
 
 # --------------------------- mojibake fixer ---------------------------
 
+# [2026-10-19] perf: детектор + починка только затронутых участков — core.mojibake
+
 def _cyr_count(s: str) -> int:
-    return sum(1 for ch in s if ('А' <= ch <= 'я') or ch in 'ЁёІіґҐЇїЙй')
+    return mojibake.cyr_count(s)
 
 def _fix_mojibake(text: str) -> str:
-    if not isinstance(text, str) or not text:
-        return text
-    candidates = [text]
-    try:
-        candidates.append(text.encode('latin-1', errors='strict').decode('cp1251', errors='strict'))
-    except Exception:
-        pass
-    try:
-        candidates.append(text.encode('cp1252', errors='strict').decode('utf-8', errors='strict'))
-    except Exception:
-        pass
-    try:
-        c1 = text.encode('cp1252', errors='strict').decode('utf-8', errors='strict')
-        candidates.append(c1.encode('latin-1', errors='strict').decode('cp1251', errors='strict'))
-    except Exception:
-        pass
-    try:
-        d1 = text.encode('latin-1', errors='strict').decode('cp1251', errors='strict')
-        candidates.append(d1.encode('cp1252', errors='strict').decode('utf-8', errors='strict'))
-    except Exception:
-        pass
-    return max(candidates, key=_cyr_count)
+    return mojibake.fix(text)
 
 # --------------------------- ESF section ---------------------------
 
 def _get_esf_headers() -> List[str]:
-    sec = dict(CONFIG).get("sections", {})
-    headers = sec.get("esf_headers") or []
-    if headers:
-        return headers
-    return [
-        r"СЧ[ЕЁ]Т[-\s]*ФАКТУРА(\s*№|\s*N)?",
-        r"\bЭСФ\b",
-        r"Electronic\s*(Tax\s*)?Invoice",
-        r"Ñ×[ÅE]Ò[-\s]*ÔÀÊÒÓÐÀ(\s*¹|\s*N)?"
-    ]
-
-_NEXT_HEADER_STOP = r"(?m)^\s*(Акт(\s+выполненных)?|Приложение|Сч[её]т(\s*№|\s*N)?\b|Invoice\s*No\.?)"
+    return patterns.esf_headers_from_config(CONFIG)
+
+_NEXT_HEADER_STOP = patterns.NEXT_HEADER_STOP
 
 def _extract_esf_section(full_text: str) -> str:
     if not full_text:
         return full_text
     text = _fix_mojibake(full_text)
-    headers = _get_esf_headers()
+    reg = _patterns()
     starts = []
-    for h in headers:
-        for m in re.finditer(h, text, flags=re.IGNORECASE):
+    for h in reg.esf_headers:
+        m = h.search(text)
+        if m:
             starts.append(m.start())
     if not starts:
         return text
     start = min(starts)
     tail = text[start:]
-    m = re.search(_NEXT_HEADER_STOP, tail, flags=re.IGNORECASE)
+    m = reg.next_header_stop.search(tail)
     return tail[:m.start()].strip() if m else tail.strip()
 
 def _get_text(doc: Dict[str, Any]) -> str:
@@ -164,7 +205,9 @@ def _get_text(doc: Dict[str, Any]) -> str:
     return fixed
 
 def _get_text_with_fallback(doc: Dict[str, Any]) -> Tuple[str, str]:
-    fixed_full = _fix_mojibake(str(doc.get("raw_text", "") or ""))
+    return _section_and_full(_fix_mojibake(str(doc.get("raw_text", "") or "")))
+
+def _section_and_full(fixed_full: str) -> Tuple[str, str]:
     if dict(CONFIG).get("sections", {}).get("prefer_esf_section", True):
         section = _extract_esf_section(fixed_full)
         return section, fixed_full
@@ -172,61 +215,38 @@ def _get_text_with_fallback(doc: Dict[str, Any]) -> Tuple[str, str]:
 
 # --------------------------- BIN ---------------------------
 
-_SUPPLIER_BIN_LABELS = [
-    r"БИН\s*поставщик[а]",
-    r"БИН[^\n\r]{0,40}поставщик[а]",
-    r"BIN\s*(supplier|seller)",
-    r"ИИН/БИН[^\n\r]{0,40}поставщик[а]",
-    r"БИН\s*продавца", r"БИН\s*организации",
-    r"Реквизиты[^\n\r]*БИН",
-    r"ÁÈÍ[^\n\r]{0,40}ïîñòàâùèê[à]",
-    r"ÈÈÍ/ÁÈÍ[^\n\r]{0,40}ïîñòàâùèê[à]",
-    r"Ðåêâèçèòû[^\n\r]*ÁÈÍ"
-]
-
-_BUYER_BIN_LABELS = [
-    r"БИН\s*покупател[ьяя]", r"БИН\s*получател[ьяя]",
-    r"(БИН|ИИН|ИИН/БИН)[^\n\r]{0,40}(покупател[ьяя]|получател[ьяя]|заказчик[а])",
-    r"BIN\s*(buyer|recipient)",
-    r"Заказчик[:\s]*",
-    r"ÁÈÍ[^\n\r]{0,40}(ïîêóïàòåë[ьяÿ]|ïîëó÷àòåë[ьяÿ])",
-    r"ÈÈÍ/ÁÈÍ[^\n\r]{0,40}(ïîêóïàòåë[ьяÿ]|ïîëó÷àòåë[ьяÿ])",
-    r"Çàêàç÷èê[:\s]*"
-]
+_SUPPLIER_BIN_LABELS = patterns.SUPPLIER_BIN_LABELS
+_BUYER_BIN_LABELS = patterns.BUYER_BIN_LABELS
+
+def _bin_patterns(labels: List[str]) -> List[re.Pattern]:
+    reg = _patterns()
+    if labels is _SUPPLIER_BIN_LABELS:
+        return reg.supplier_bin
+    if labels is _BUYER_BIN_LABELS:
+        return reg.buyer_bin
+    return [re.compile(rf"({lab})[^\d]{{0,80}}(?P<bin>\d[\d\ \-\'\.]{{3,}})", re.IGNORECASE) for lab in labels]
 
 def _extract_bin_from_text(text: str, labels: List[str]) -> str:
     if not text:
         return ""
-    for lab in labels:
-        pat = rf"({lab})[^\d]{{0,80}}(?P<bin>\d[\d\ \-\'\.]{{3,}})"
-        m = re.search(pat, text, flags=re.IGNORECASE)
+    for pat in _bin_patterns(labels):
+        m = pat.search(text)
         if m:
             return m.group("bin").strip()
     return ""
 
 # --------------------------- DATE ---------------------------
 
-_DATE_LABELS = [
-    r"Дата\s*(выставления|выписки)\s*[:\-]",
-    r"Äàòà\s*(âûñòàâëåíèÿ|âûïèñêè)\s*[:\-]"
-]
-
-_MONTHS_RU = {
-    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
-    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12
-}
-_MONTHS_RU_RE = "|".join(_MONTHS_RU.keys())
-
-_ESF_HEADER_DATE_PATTERNS = [
-    r"СЧ[ЕЁ]Т[-\s]?ФАКТУРА[^\n\r]{0,80}от\s*(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))",
-    r"Ñ×[ÅE]Ò[-\s]?ÔÀÊÒÓÐÀ[^\n\r]{0,80}îò\s*(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))"
-]
+_DATE_LABELS = patterns.DATE_LABELS
+_MONTHS_RU = patterns.MONTHS_RU
+_MONTHS_RU_RE = patterns.MONTHS_RU_RE
+_ESF_HEADER_DATE_PATTERNS = patterns.ESF_HEADER_DATE_PATTERNS
 
 def _extract_header_date(text: str) -> str:
     if not text:
         return ""
-    for pat in _ESF_HEADER_DATE_PATTERNS:
-        m = re.search(pat, text, flags=re.IGNORECASE)
+    for pat in _patterns().header_dates:
+        m = pat.search(text)
         if m and m.group("date"):
             return m.group("date").strip()
     return ""
@@ -234,19 +254,19 @@ def _extract_header_date(text: str) -> str:
 def _extract_date_from_text(text: str) -> str:
     if not text:
         return ""
-    date_pat = r"(?P<date>(\d{2}[./-]\d{2}[./-]\d{4})|(\d{4}[./-]\d{2}[./-]\d{2}))"
-    for lab in _DATE_LABELS:
-        m = re.search(rf"(?P<label>{lab})\s*{date_pat}", text, flags=re.IGNORECASE)
+    reg = _patterns()
+    for pat in reg.date_labels:
+        m = pat.search(text)
         if m and m.group("date"):
             return m.group("date").strip()
-    m2 = re.search(rf"\b(?P<dd>\d{{1,2}})\b\s+(?P<mon>{_MONTHS_RU_RE})\s+\b(?P<yyyy>\d{{4}})\b", text, flags=re.IGNORECASE)
+    m2 = reg.date_words.search(text)
     if m2:
         dd = int(m2.group("dd")); mm = _MONTHS_RU[m2.group("mon").lower()]; yyyy = int(m2.group("yyyy"))
         try:
             return date(year=yyyy, month=mm, day=dd).strftime("%d.%m.%Y")
         except ValueError:
             pass
-    m3 = re.search(r"(\b\d{2}[./-]\d{2}[./-]\d{4}\b)|(\b\d{4}[./-]\d{2}[./-]\d{2}\b)", text)
+    m3 = reg.date_numeric.search(text)
     if m3:
         return m3.group(0).strip()
     return ""
@@ -257,67 +277,22 @@ def _parse_date_any(s: str) -> Optional[datetime]:
 # --------------------------- BIN checksum ---------------------------
 
 def _kz_mod11_checksum_valid(bin12: str) -> bool:
-    digits = _only_digits(bin12)
-    if len(digits) != 12:
-        return False
-    nums = [int(c) for c in digits]
-    control = nums[-1]
-    s1 = sum(nums[i] * (i + 1) for i in range(11))
-    r1 = s1 % 11
-    if r1 != 10:
-        return control == r1
-    s2 = sum(nums[i] * (i + 3) for i in range(11))
-    r2 = s2 % 11
-    return control == r2
+    # [2026-10-19] вынесено в core.bin_checksum (LRU-кэш, векторный путь для пакетов)
+    return bin_checksum.is_valid(bin12)
 
 # --------------------------- СУММЫ ---------------------------
 
 def _sum_labels_from_config() -> List[str]:
-    t = dict(CONFIG).get("totals", {})
-
-    base_cfg = t.get("labels") or [
-        "Итого",
-        "Итого\\s*с\\s*НДС",
-        "Всего",
-        "Всего\\s*к\\s*оплате",
-        "К\\s*оплате",
-        "Всего\\s*стоимость\\s*реализации",
-        "Total",
-        "Grand\\s*Total"
-    ]
-
-    mojibake = [
-        "Èòîãî",
-        "Èòîãî\\s*ñ\\s*ÍÄÑ",
-        "Âñåãî",
-        "Âñåãî\\s*ê\\s*îïëàòå",
-        "Âñåãî\\s*ïî\\s*ñ÷åòó",
-        "Âñåãî\\s*ñòîèìîñòü\\s*ðåàëèçàöèè"
-    ]
-
-    return list(dict.fromkeys(base_cfg + mojibake))
+    return patterns.sum_labels_from_config(CONFIG)
 
 def _sum_gap_from_config() -> int:
-    t = dict(CONFIG).get("totals", {})
-    gap = int(t.get("max_gap", 140))
-    return max(20, min(gap, 300))
+    return patterns.sum_gap_from_config(CONFIG)
 
 def _priority_sum_labels() -> List[str]:
-    return [
-        r"Всего\s*к\s*оплате",
-        r"Итого\s*с\s*НДС",
-        r"Всего\s*стоимость\s*реализации",
-        r"Âñåãî\s*ê\s*îïëàòå",
-        r"Èòîãî\s*ñ\s*ÍÄÑ",
-        r"Âñåãî\s*ñòîèìîñòü\\s*ðåàëèçàöèè",
-    ]
+    return list(patterns.PRIORITY_SUM_LABELS)
 
 def _sum_patterns() -> List[re.Pattern]:
-    labels_union = "(?:" + "|".join(_sum_labels_from_config()) + ")"
-    gap = _sum_gap_from_config()
-    core = rf"{labels_union}\s*[:\-]?\s*[^\d\n\r]{{0,{gap}}}([0-9\s\u00A0\u202F\u2019\u2018\'\,\.]+)"
-    table = rf"([0-9\s\u00A0\u202F\u2019\u2018\'\,\.]+)[^\d\n\r]{{0,{gap}}}{labels_union}"
-    return [re.compile(core, re.IGNORECASE), re.compile(table, re.IGNORECASE)]
+    return _patterns().sum_union
 
 def _looks_like_money(text_num: str) -> bool:
     t = (text_num or "").strip()
@@ -343,14 +318,13 @@ def _find_total_candidates_with_ctx(text: str) -> List[Tuple[str, Tuple[int, int
                 out.append((val, m.span(1)))
     return out
 
-def _find_total_value(text: str) -> Optional[str]:
+def _find_total_value_regex(text: str) -> Optional[str]:
+    """Исходный (v2.7) поиск итога на регулярках — эталон для самотеста _TotalScan."""
     if not text:
         return None
 
     # приоритетные метки — допускаем переносы
-    for lab in _priority_sum_labels():
-        pat = re.compile(rf"{lab}[^\d]{{0,220}}([0-9\s\u00A0\u202F\u2019\u2018\'\,\.]+)",
-                         re.IGNORECASE | re.DOTALL)
+    for pat in _patterns().sum_priority:
         m = pat.search(text)
         if m:
             raw = (m.group(1) or "").strip()
@@ -383,114 +357,402 @@ def _find_total_value(text: str) -> Optional[str]:
     scored.sort(key=lambda x: (x[0], x[1]))
     return scored[-1][2]
 
+# [2026-10-19] perf: линейный разбор итоговой суммы.
+#   Раньше: приоритетные метки с DOTALL-зазором [^\d]{0,220}, затем два
+#   объединённых шаблона, у которых ведущая группа [0-9\s…]+ на длинных
+#   «цифры-пробелы» откатывалась квадратично, и срез контекста под
+#   _near_bin_iin на каждого кандидата. Теперь текст один раз разбирается
+#   в индексы (числовые участки, стоп-символы, все позиции меток, следы
+#   БИН/ИИН), а кандидаты получаются бинарным поиском по ним. Выбор
+#   совпадает с _find_total_value_regex (те же правила «жадности»).
+
+_BIN_MARK_LEN = 3  # "бин", "ийн", "iin", "bin"
+
+class _TotalScan:
+    """Индексы одного текста для поиска итоговой суммы."""
+
+    __slots__ = ("text", "n", "reg", "run_s", "run_e", "stops", "lab_s", "lab_e", "bin_marks")
+
+    def __init__(self, text: str, reg: "patterns.PatternRegistry"):
+        self.text, self.n, self.reg = text, len(text), reg
+        self.run_s: List[int] = []
+        self.run_e: List[int] = []
+        for m in reg.amount_run.finditer(text):
+            self.run_s.append(m.start())
+            self.run_e.append(m.end())
+        self.stops = [m.start() for m in reg.sum_stop.finditer(text)]
+        self.lab_s: List[int] = []
+        self.lab_e: List[int] = []
+        for m in reg.sum_label_at.finditer(text):
+            self.lab_s.append(m.start())
+            self.lab_e.append(m.end(1))
+        low = text.lower()
+        # lower() почти всегда сохраняет длину; иначе — срезы, как в v2.7
+        self.bin_marks = [m.start() for m in reg.bin_marks.finditer(low)] if len(low) == self.n else None
+
+    def run_end_at(self, q: int) -> Optional[int]:
+        """Конец числового участка, содержащего позицию q (None — q вне участка)."""
+        i = bisect_right(self.run_s, q) - 1
+        if i >= 0 and self.run_e[i] > q:
+            return self.run_e[i]
+        return None
+
+    def last_amount_char(self, lo: int, hi: int) -> Optional[int]:
+        """Последняя позиция в [lo, hi), входящая в числовой участок."""
+        i = bisect_left(self.run_s, hi) - 1
+        if i < 0:
+            return None
+        x = min(self.run_e[i], hi) - 1
+        return x if x >= lo else None
+
+    def next_stop(self, pos: int) -> int:
+        i = bisect_left(self.stops, pos)
+        return self.stops[i] if i < len(self.stops) else self.n
+
+    def near_bin(self, s: int, e: int) -> bool:
+        l = max(0, s - 40); r = min(self.n, e + 40)
+        if self.bin_marks is None:
+            return _near_bin_iin(self.text[l:r])
+        i = bisect_left(self.bin_marks, l)
+        return i < len(self.bin_marks) and self.bin_marks[i] + _BIN_MARK_LEN <= r
+
+    def amount_after(self, e: int, q: int) -> Optional[Tuple[int, int]]:
+        """
+        Число после зазора [e, q): участок с q, если q в нём; иначе откат
+        зазора к последнему числовому символу (как у регулярки). None — нет совпадения.
+        """
+        end = self.run_end_at(q) if q < self.n else None
+        if end is not None:
+            return q, end
+        x = self.last_amount_char(e, q)
+        return (x, x + 1) if x is not None else None
+
+    # --------------------------- проходы ---------------------------
+
+    def priority(self) -> Optional[str]:
+        text = self.text
+        for lab_at in self.reg.priority_label_at:
+            for m in lab_at.finditer(text):
+                e = m.end(1)
+                span = self.amount_after(e, e + len(self.reg.priority_gap.match(text, e).group()))
+                if span is None:
+                    continue  # в этой позиции шаблон не совпал — ищем дальше
+                s, end = span
+                raw = text[s:end].strip()
+                if _looks_like_money(raw) and _to_number(raw) is not None and not self.near_bin(s, end):
+                    return raw
+                break  # search() вернул бы именно это совпадение
+        return None
+
+    def candidates(self) -> List[Tuple[str, Tuple[int, int]]]:
+        """Кандидаты в порядке _find_total_candidates_with_ctx: «метка → число», затем «число → метка»."""
+        text, out = self.text, []
+        head = self.reg.sum_head
+        resume = 0
+        for p, e in zip(self.lab_s, self.lab_e):
+            if p < resume:
+                continue
+            span = self.amount_after(e, e + len(head.match(text, e).group()))
+            if span is None:
+                continue
+            s, end = span
+            val = text[s:end].strip()
+            if val:
+                out.append((val, (s, end)))
+            resume = end
+        gap = self.reg.sum_gap
+        resume = 0
+        for a, r in zip(self.run_s, self.run_e):
+            s = max(a, resume)
+            if s >= r:
+                continue
+            # самая дальняя метка в пределах зазора без цифр/переводов строки
+            k = bisect_right(self.lab_s, min(r + gap, self.next_stop(r))) - 1
+            if k < 0 or self.lab_s[k] < r:
+                continue
+            val = text[s:r].strip()
+            if val:
+                out.append((val, (s, r)))
+            resume = self.lab_e[k]
+        return out
+
+def _find_total_value(text: str) -> Optional[str]:
+    if not text:
+        return None
+    scan = _TotalScan(text, _patterns())
+
+    # приоритетные метки — допускаем переносы
+    raw = scan.priority()
+    if raw is not None:
+        return raw
+
+    # общий поиск
+    scored: List[Tuple[int, float, str]] = []
+    for raw, (s, e) in scan.candidates():
+        if not _looks_like_money(raw):
+            continue
+        if scan.near_bin(s, e):
+            continue
+        num = _to_number(raw)
+        if num is None:
+            continue
+        score = 0
+        if any(ch in raw for ch in [",", ".", "’", "'"]):
+            score += 2
+        if len(_only_digits(raw)) >= 4:
+            score += 1
+        scored.append((score, num, raw))
+    if not scored:
+        return None
+    scored.sort(key=lambda x: (x[0], x[1]))
+    return scored[-1][2]
+
+# --------------------------- поля (канон) ---------------------------
+# [2026-10-19] refactor: каждое правило раньше само собирало вход через
+#   _first(...) и текстовые фолбэки, BIN007/BIN012 повторяли работу
+#   BIN001/BIN002. Теперь поле резолвится один раз на документ.
+
+_SUPPLIER_BIN_KEYS = ("supplier_BIN", "supplier_bin", "supplierBin",
+                      "seller_BIN", "seller_bin", "sellerBin",
+                      "Поставщик", "Продавец", "BIN продавца", "БИН поставщика")
+_BUYER_BIN_KEYS = ("recipient_BIN", "recipient_bin", "recipientBin",
+                   "buyer_BIN", "buyer_bin", "buyerBin",
+                   "customer_BIN", "customer_bin", "customerBin",
+                   "Покупатель", "Получатель", "БИН покупателя", "BIN buyer")
+_ISSUE_DATE_KEYS = ("issue_date", "date_issue", "document_date", "documentDate",
+                    "дата_выписки", "дата_составления", "дата", "Дата",
+                    "Document date", "Дата выписки", "Дата составления")
+_TOTAL_KEYS = ("total_amount", "total_sum", "total", "amount",
+               "Всего", "Итог", "Сумма документа", "Total",
+               "Итого с НДС", "TotalAmount", "AmountTotal", "Итого к оплате")
+
+def _is_suspicious_table_index(num: Optional[float]) -> bool:
+    # [2025-11-17] если число целое и в диапазоне 1..12 — похоже на номер колонки
+    if num is None:
+        return False
+    return abs(num - round(num)) < 1e-9 and 1 <= int(round(num)) <= 12
+
+class _DocContext:
+    """Документ + лениво вычисляемые тексты и канонические поля (каждое — один раз)."""
+
+    __slots__ = ("doc", "_fixed", "_texts", "_fields", "_text_reads")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.doc = doc
+        self._fixed: Optional[str] = None
+        self._texts: Optional[Tuple[str, str]] = None
+        self._fields: Dict[str, Any] = {}
+        self._text_reads = 0
+
+    def fixed_text(self) -> str:
+        """raw_text после починки кодировки — считается один раз на документ."""
+        if self._fixed is None:
+            self._fixed = _fix_mojibake(str(self.doc.get("raw_text", "") or ""))
+        return self._fixed
+
+    def texts(self) -> Tuple[str, str]:
+        self._text_reads += 1
+        if self._texts is None:
+            self._texts = _section_and_full(self.fixed_text())
+        return self._texts
+
+    def field(self, name: str) -> str:
+        if name not in self._fields:
+            t0 = time.perf_counter() if instrumentation.ENABLED else 0.0
+            reads = self._text_reads
+            try:
+                self._fields[name] = _FIELDS[name].resolve(self)
+            except Exception as e:
+                self._fields[name] = e
+            if instrumentation.ENABLED:
+                src = "text" if self._text_reads != reads else "structured"
+                instrumentation.record_field(name, src, time.perf_counter() - t0)
+        val = self._fields[name]
+        if isinstance(val, Exception):
+            raise val
+        return val
+
+    def has(self, name: str) -> bool:
+        return self.field(name) != ""
+
+def _resolve_supplier_bin(ctx: _DocContext) -> str:
+    v = _first(ctx.doc, *_SUPPLIER_BIN_KEYS)
+    if v:
+        return v
+    sec_text, full_text = ctx.texts()
+    return _extract_bin_from_text(sec_text, _SUPPLIER_BIN_LABELS) or \
+           _extract_bin_from_text(full_text, _SUPPLIER_BIN_LABELS)
+
+def _resolve_buyer_bin(ctx: _DocContext) -> str:
+    v = _first(ctx.doc, *_BUYER_BIN_KEYS)
+    if v:
+        return v
+    sec_text, full_text = ctx.texts()
+    return _extract_bin_from_text(sec_text, _BUYER_BIN_LABELS) or \
+           _extract_bin_from_text(full_text, _BUYER_BIN_LABELS)
+
+def _resolve_issue_date(ctx: _DocContext) -> str:
+    v = _first(ctx.doc, *_ISSUE_DATE_KEYS)
+    if v:
+        return v
+    sec_text, full_text = ctx.texts()
+    return _extract_header_date(sec_text) or _extract_date_from_text(sec_text) or \
+           _extract_header_date(full_text) or _extract_date_from_text(full_text)
+
+def _resolve_total(ctx: _DocContext) -> str:
+    val = _first(ctx.doc, *_TOTAL_KEYS)
+    if val != "" and _is_suspicious_table_index(_to_number(val)):
+        val = ""
+    if val == "":
+        sec_text, full_text = ctx.texts()
+        val = _find_total_value(sec_text) or _find_total_value(full_text) or ""
+    return val
+
+class _FieldSpec:
+    __slots__ = ("name", "resolve", "requires", "config")
+
+    def __init__(self, name: str, resolve: Callable[[_DocContext], str],
+                 requires: Tuple[str, ...] = (), config: Tuple[str, ...] = ()):
+        self.name, self.resolve = name, resolve
+        self.requires, self.config = tuple(requires), tuple(config)
+
+_FIELDS: Dict[str, _FieldSpec] = {}
+
+def register_field(name: str, resolve: Callable[[_DocContext], str],
+                   requires: Tuple[str, ...] = (), config: Tuple[str, ...] = ()) -> None:
+    """
+    Новое каноническое поле; requires — поля, которые резолвер читает через ctx.field(),
+    config — ключи конфига (через точку), от которых зависит значение.
+    """
+    _FIELDS[name] = _FieldSpec(name, resolve, requires, config)
+    _PLAN_CACHE.clear()
+
+# --------------------------- реестр правил ---------------------------
+
+class RuleSpec:
+    """
+    Декларация правила: какие канонические поля оно читает.
+      needs — без этих полей правило не запускается (раньше — ранний return None);
+      uses  — читаются, но отсутствие правило обрабатывает само (BIN001: «не найден»);
+      when  — дополнительный выключатель из конфига;
+      config — ключи конфига (через точку), которые правило читает само:
+               при их изменении правило перезапускается (см. rerun()).
+      check — быстрый предикат для триажа (см. triage_check()).
+    """
+
+    __slots__ = ("code", "fn", "needs", "uses", "when", "config", "fields", "check")
+
+    def __init__(self, code: str, fn: Callable, needs=(), uses=(), when=None, config=()):
+        self.code, self.fn = code, fn
+        self.needs, self.uses, self.when = tuple(needs), tuple(uses), when
+        self.config = tuple(config)
+        self.fields = tuple(dict.fromkeys(self.needs + self.uses))
+        self.check: Optional[Callable[["_DocContext"], Optional[str]]] = None
+
+_RULE_SPECS: List[RuleSpec] = []
+_PLAN_CACHE: Dict[Tuple[str, ...], List[str]] = {}
+
+def rule(code: str, needs=(), uses=(), when=None, config=()):
+    """Декоратор регистрации правила (порядок регистрации = порядок вывода)."""
+    def deco(fn):
+        _RULE_SPECS[:] = [s for s in _RULE_SPECS if s.code != code]
+        _RULE_SPECS.append(RuleSpec(code, fn, needs=needs, uses=uses, when=when, config=config))
+        _PLAN_CACHE.clear()
+        return fn
+    return deco
+
+def _field_order(names: Tuple[str, ...]) -> List[str]:
+    """Поля в порядке зависимостей (requires раньше зависимых)."""
+    plan = _PLAN_CACHE.get(names)
+    if plan is not None:
+        return plan
+    plan, seen = [], set()
+
+    def visit(n: str, stack: Tuple[str, ...]) -> None:
+        if n in seen:
+            return
+        if n in stack:
+            raise ValueError(f"циклическая зависимость полей: {' -> '.join(stack + (n,))}")
+        for dep in _FIELDS[n].requires:
+            visit(dep, stack + (n,))
+        seen.add(n)
+        plan.append(n)
+
+    for n in names:
+        visit(n, ())
+    _PLAN_CACHE[names] = plan
+    return plan
+
+def _bin_checksum_enabled() -> bool:
+    return bool(dict(CONFIG).get("bin_rules", {}).get("bin_checksum_enabled", False))
+
 # --------------------------- ПРАВИЛА ---------------------------
 
-def _rule_BIN001(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("BIN001", uses=("supplier_bin",))
+def _rule_BIN001(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("BIN001", {})
-    v_raw = _first(doc, "supplier_BIN", "supplier_bin", "supplierBin",
-                   "seller_BIN", "seller_bin", "sellerBin",
-                   "Поставщик", "Продавец", "BIN продавца", "БИН поставщика")
-    if not v_raw:
-        sec_text, full_text = _get_text_with_fallback(doc)
-        v_raw = _extract_bin_from_text(sec_text, _SUPPLIER_BIN_LABELS) or \
-                _extract_bin_from_text(full_text, _SUPPLIER_BIN_LABELS)
+    v_raw = ctx.field("supplier_bin")
     if not _is_bin(v_raw):
         return _make_item("BIN001", cfg.get("level", "ERROR"), cfg.get("user", {}), value=v_raw)
-    return _make_item("BIN001", "OK", {"title": "БИН поставщика распознан"}, value=v_raw)
+    return _make_item("BIN001", "OK", _ok_user("БИН поставщика распознан"), value=v_raw)
 
-def _rule_BIN002(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("BIN002", uses=("buyer_bin",))
+def _rule_BIN002(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("BIN002", {})
-    v_raw = _first(doc, "recipient_BIN", "recipient_bin", "recipientBin",
-                   "buyer_BIN", "buyer_bin", "buyerBin",
-                   "customer_BIN", "customer_bin", "customerBin",
-                   "Покупатель", "Получатель", "БИН покупателя", "BIN buyer")
-    if not v_raw:
-        sec_text, full_text = _get_text_with_fallback(doc)
-        v_raw = _extract_bin_from_text(sec_text, _BUYER_BIN_LABELS) or \
-                _extract_bin_from_text(full_text, _BUYER_BIN_LABELS)
+    v_raw = ctx.field("buyer_bin")
     if not _is_bin(v_raw):
         return _make_item("BIN002", cfg.get("level", "ERROR"), cfg.get("user", {}), value=v_raw)
-    return _make_item("BIN002", "OK", {"title": "БИН покупателя распознан"}, value=v_raw)
+    return _make_item("BIN002", "OK", _ok_user("БИН покупателя распознан"), value=v_raw)
 
-def _rule_BIN007(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("BIN007", needs=("supplier_bin", "buyer_bin"), config=("bin_rules.allow_equal_bins",))
+def _rule_BIN007(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("BIN007", {})
     allow_equal = bool(CONFIG.get("bin_rules", {}).get("allow_equal_bins", False))
-    sec_text, full_text = _get_text_with_fallback(doc)
-    sup = _first(doc, "supplier_BIN", "supplier_bin", "seller_BIN", "seller_bin") or \
-          _extract_bin_from_text(sec_text, _SUPPLIER_BIN_LABELS) or \
-          _extract_bin_from_text(full_text, _SUPPLIER_BIN_LABELS)
-    buy = _first(doc, "recipient_BIN", "recipient_bin", "buyer_BIN", "buyer_bin") or \
-          _extract_bin_from_text(sec_text, _BUYER_BIN_LABELS) or \
-          _extract_bin_from_text(full_text, _BUYER_BIN_LABELS)
-    if not sup or not buy:
-        return None
+    sup, buy = ctx.field("supplier_bin"), ctx.field("buyer_bin")
     if sup == buy:
         if allow_equal:
-            return _make_item("BIN007", "OK", cfg.get("ok_user", {"title": "БИНы совпадают (разрешено)"}), value=f"{sup}/{buy}")
+            return _make_item("BIN007", "OK", cfg.get("ok_user", _ok_user("БИНы совпадают (разрешено)")), value=f"{sup}/{buy}")
         return _make_item("BIN007", cfg.get("level", "WARN"), cfg.get("user", {}), value=f"{sup}/{buy}")
-    return _make_item("BIN007", "OK", cfg.get("ok_user", {"title": "БИНы различаются"}), value=f"{sup}/{buy}")
+    return _make_item("BIN007", "OK", cfg.get("ok_user", _ok_user("БИНы различаются")), value=f"{sup}/{buy}")
+
+def d000_level() -> str:
+    """Уровень D000: настройка require_date_severity (меню GUI) важнее уровня из чек-листа."""
+    level = CONFIG.get("require_date_severity") or RULES.get("D000", {}).get("level", "ERROR")
+    return str(level).upper()
 
-def _rule_D000(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("D000", uses=("issue_date",), config=("require_date_severity",))
+def _rule_D000(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("D000", {})
-    v_raw = _first(doc, "issue_date", "date_issue", "document_date", "documentDate",
-                   "дата_выписки", "дата_составления", "дата", "Дата",
-                   "Document date", "Дата выписки", "Дата составления")
-    if not v_raw:
-        sec_text, full_text = _get_text_with_fallback(doc)
-        v_raw = _extract_header_date(sec_text) or _extract_date_from_text(sec_text) or \
-                _extract_header_date(full_text) or _extract_date_from_text(full_text)
+    v_raw = ctx.field("issue_date")
     dt = _parse_date_any(v_raw)
     if dt is None:
-        return _make_item("D000", cfg.get("level", CONFIG.get("require_date_severity", "ERROR")), cfg.get("user", {}), value=v_raw)
-    return _make_item("D000", "OK", {"title": "Дата распознана"}, value=v_raw)
+        return _make_item("D000", d000_level(), cfg.get("user", {}), value=v_raw)
+    return _make_item("D000", "OK", _ok_user("Дата распознана"), value=v_raw)
 
-def _rule_D001(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("D001", uses=("issue_date",))
+def _rule_D001(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("D001", {})
-    v_raw = _first(doc, "issue_date", "date_issue", "document_date", "documentDate",
-                   "дата_выписки", "дата_составления", "дата", "Дата")
-    if not v_raw:
-        sec_text, full_text = _get_text_with_fallback(doc)
-        v_raw = _extract_header_date(sec_text) or _extract_date_from_text(sec_text) or \
-                _extract_header_date(full_text) or _extract_date_from_text(full_text)
+    v_raw = ctx.field("issue_date")
     dt = _parse_date_any(v_raw)
     if dt and dt.date() > date.today():
         return _make_item("D001", cfg.get("level", "ERROR"), cfg.get("user", {}), value=v_raw)
-    return _make_item("D001", "OK", {"title": "Дата не в будущем"}, value=v_raw)
-
-def _is_suspicious_table_index(num: Optional[float]) -> bool:
-    # [2025-11-17] если число целое и в диапазоне 1..12 — похоже на номер колонки
-    if num is None:
-        return False
-    return abs(num - round(num)) < 1e-9 and 1 <= int(round(num)) <= 12
+    return _make_item("D001", "OK", _ok_user("Дата не в будущем"), value=v_raw)
 
-def _rule_TOT001(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("TOT001", uses=("total",))
+def _rule_TOT001(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("TOT001", {})
-    val = _first(doc, "total_amount", "total_sum", "total", "amount",
-                 "Всего", "Итог", "Сумма документа", "Total",
-                 "Итого с НДС", "TotalAmount", "AmountTotal", "Итого к оплате")
-    primary_num = _to_number(val) if val != "" else None
-    if _is_suspicious_table_index(primary_num):
-        val = ""
-    if val == "":
-        sec_text, full_text = _get_text_with_fallback(doc)
-        val = _find_total_value(sec_text) or _find_total_value(full_text) or ""
+    val = ctx.field("total")
     if val == "":
         return _make_item("TOT001", cfg.get("level", "ERROR"), cfg.get("user", {}), value=None)
     num = _to_number(val)
     if num is None or num <= 0 or _is_suspicious_table_index(num):
         return _make_item("TOT001", cfg.get("level", "ERROR"), cfg.get("user", {}), value=val)
-    return _make_item("TOT001", "OK", {"title": "Итоговая сумма указана корректно"}, value=val)
+    return _make_item("TOT001", "OK", _ok_user("Итоговая сумма указана корректно"), value=val)
 
-def _rule_NEG001(doc: Dict[str, Any]) -> Dict[str, Any] | None:
+@rule("NEG001", needs=("total",))
+def _rule_NEG001(ctx: _DocContext) -> Dict[str, Any] | None:
     cfg = RULES.get("NEG001", {})
-    val = _first(doc, "total_amount", "total_sum", "total", "amount",
-                 "Всего", "Итог", "Сумма документа", "Total",
-                 "Итого с НДС", "TotalAmount", "AmountTotal", "Итого к оплате")
-    if not val:
-        sec_text, full_text = _get_text_with_fallback(doc)
-        val = _find_total_value(sec_text) or _find_total_value(full_text)
-    if not val:
-        return None
+    val = ctx.field("total")
     num = _to_number(val)
     if num is None:
         return None
@@ -500,75 +762,555 @@ def _rule_NEG001(doc: Dict[str, Any]) -> Dict[str, Any] | None:
 
 # --------------------------- BIN012 ---------------------------
 
-def _rule_BIN012(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
-    if not dict(CONFIG).get("bin_rules", {}).get("bin_checksum_enabled", False):
-        return []
+@rule("BIN012", uses=("supplier_bin", "buyer_bin"), when=_bin_checksum_enabled,
+      config=("bin_rules.bin_checksum_enabled",))
+def _rule_BIN012(ctx: _DocContext) -> List[Dict[str, Any]]:
     cfg = RULES.get("BIN012", {})
     out: List[Dict[str, Any]] = []
-    sec_text, full_text = _get_text_with_fallback(doc)
 
     def _check(val: str, role: str) -> None:
         if not _is_bin(val):
             return
         if not _kz_mod11_checksum_valid(val):
-            user = cfg.get("user", {}).copy()
-            user["title"] = f"{user.get('title', 'Ошибка контрольной суммы')} ({role})"
+            user = _role_user(cfg.get("user", {}), role, "Ошибка контрольной суммы")
             out.append(_make_item("BIN012", cfg.get("level", "ERROR"), user, value=val))
         else:
             out.append(_make_item("BIN012", "OK",
-                                  {"title": f"Контрольная сумма БИН {role}: ОК"}, value=val))
-
-    sup = _first(doc, "supplier_BIN", "supplier_bin", "supplierBin", "seller_BIN", "seller_bin", "sellerBin") or \
-          _extract_bin_from_text(sec_text, _SUPPLIER_BIN_LABELS) or \
-          _extract_bin_from_text(full_text, _SUPPLIER_BIN_LABELS)
-    buy = _first(doc, "recipient_BIN", "recipient_bin", "recipientBin",
-                 "buyer_BIN", "buyer_bin", "buyerBin",
-                 "customer_BIN", "customer_bin", "customerBin") or \
-          _extract_bin_from_text(sec_text, _BUYER_BIN_LABELS) or \
-          _extract_bin_from_text(full_text, _BUYER_BIN_LABELS)
-
-    _check(sup, "поставщика")
-    _check(buy, "покупателя")
+                                  _ok_user(f"Контрольная сумма БИН {role}: ОК"), value=val))
+
+    _check(ctx.field("supplier_bin"), "поставщика")
+    _check(ctx.field("buyer_bin"), "покупателя")
     return out
 
+# --------------------------- сверка сумм ---------------------------
+# [2026-10-19] feat: поле "amounts" — итоги и суммы столбцов строк в тиынах
+#   (reconcile.Amounts); "" если в документе нет ни итогов, ни строк.
+
+def _reconcile_tolerance() -> reconcile.Tolerance:
+    return reconcile.tolerance_from_config(CONFIG)
+
+def _diff_value(diffs) -> str:
+    names = {"gross": "с НДС", "net_lines": "без НДС / строки", "vat_lines": "НДС / строки"}
+    return "; ".join(f"{names.get(w, w)}: {reconcile.format_tiyn(got)} ≠ {reconcile.format_tiyn(exp)}"
+                     for w, _, got, exp in diffs)
+
+@rule("TOT002", needs=("amounts",), config=("totals.tolerance_abs", "totals.tolerance_rel"))
+def _rule_TOT002(ctx: _DocContext) -> Dict[str, Any] | None:
+    cfg = RULES.get("TOT002", {})
+    am = ctx.field("amounts")
+    if not am.pairs():
+        return None  # сверять нечего (нет пары «итог — расчёт»)
+    diffs = reconcile.check(am, _reconcile_tolerance())
+    bad = [d for d in diffs if d[1] == "mismatch"]
+    if bad:
+        return _make_item("TOT002", cfg.get("level", "ERROR"), cfg.get("user", {}), value=_diff_value(bad))
+    return _make_item("TOT002", "OK", _ok_user("Итоги сходятся"))
+
+@rule("TOT003", needs=("amounts",))
+def _rule_TOT003(ctx: _DocContext) -> Dict[str, Any] | None:
+    cfg = RULES.get("TOT003", {})
+    am = ctx.field("amounts")
+    present = [v for v in (am.net, am.vat, am.gross) if v is not None]
+    if present and not any(present):
+        return _make_item("TOT003", cfg.get("level", "WARN"), cfg.get("user", {}), value="0.00")
+    return None
+
+@rule("TOT004", needs=("amounts",), config=("totals.tolerance_abs", "totals.tolerance_rel"))
+def _rule_TOT004(ctx: _DocContext) -> Dict[str, Any] | None:
+    cfg = RULES.get("TOT004", {})
+    diffs = reconcile.check(ctx.field("amounts"), _reconcile_tolerance())
+    rounding = [d for d in diffs if d[1] == "rounding"]
+    if rounding:
+        return _make_item("TOT004", cfg.get("level", "WARN"), cfg.get("user", {}), value=_diff_value(rounding))
+    return None
+
+@rule("NEG002", needs=("amounts",))
+def _rule_NEG002(ctx: _DocContext) -> Dict[str, Any] | None:
+    cfg = RULES.get("NEG002", {})
+    am = ctx.field("amounts")
+    if am.vat is not None and am.vat < 0:
+        return _make_item("NEG002", cfg.get("level", "ERROR"), cfg.get("user", {}), value=am.raw["vat"])
+    if am.neg_vat:
+        rows = ", ".join(str(i + 1) for i in am.neg_vat)
+        return _make_item("NEG002", cfg.get("level", "ERROR"), cfg.get("user", {}), value=f"строки: {rows}")
+    return None
+
+def _resolve_amounts(ctx: _DocContext) -> Any:
+    am = reconcile.Amounts(ctx.doc)
+    return am if (am.has_totals() or am.lines) else ""
+
 # --------------------------- движок ---------------------------
 
-_RULE_FUNCS_SEQ = [
-    _rule_BIN001, _rule_BIN002, _rule_BIN007, _rule_D000, _rule_D001, _rule_TOT001, _rule_NEG001
-]
+# текстовые фолбэки зависят от выделения раздела ЭСФ, итог — ещё и от меток сумм
+_TEXT_CONFIG = ("sections",)
+
+_FIELDS.update({
+    "supplier_bin": _FieldSpec("supplier_bin", _resolve_supplier_bin, config=_TEXT_CONFIG),
+    "buyer_bin": _FieldSpec("buyer_bin", _resolve_buyer_bin, config=_TEXT_CONFIG),
+    "issue_date": _FieldSpec("issue_date", _resolve_issue_date, config=_TEXT_CONFIG),
+    "total": _FieldSpec("total", _resolve_total, config=_TEXT_CONFIG + ("totals",)),
+    "amounts": _FieldSpec("amounts", _resolve_amounts),
+})
+
+def config_keys() -> List[str]:
+    """Ключи конфига (через точку), от которых зависят поля и правила реестра."""
+    keys = set(_TEXT_CONFIG)
+    for f in _FIELDS.values():
+        keys.update(f.config)
+    for spec in _RULE_SPECS:
+        keys.update(spec.config)
+    return sorted(keys)
+
+_INTERNAL_ERROR_USER = {
+    "title": "Внутренняя ошибка правила",
+    "description": "Правило завершилось исключением.",
+    "recommendation": "Сообщите разработчику."
+}
+
+def _internal_error_item(code: str, e: Exception) -> Dict[str, Any]:
+    # текст исключения — значением (шаблон общий, validator показывает его всегда)
+    return {"code": code, "level": "ERROR", "user": _INTERNAL_ERROR_USER,
+            "value": f"{e.__class__.__name__}: {e}", "show_value": True}
+
+def _active_specs() -> List[RuleSpec]:
+    return [s for s in _RULE_SPECS if s.when is None or s.when()]
+
+def _run_spec(ctx: _DocContext, spec: RuleSpec) -> List[Dict[str, Any]]:
+    if instrumentation.ENABLED:
+        return _run_spec_timed(ctx, spec)
+    try:
+        if not all(ctx.has(n) for n in spec.needs):
+            return []
+        res = spec.fn(ctx)
+        if isinstance(res, list):
+            return res
+        return [res] if res is not None else []
+    except Exception as e:
+        return [_internal_error_item(spec.code, e)]
+
+def _run_spec_timed(ctx: _DocContext, spec: RuleSpec) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    error = False
+    try:
+        if not all(ctx.has(n) for n in spec.needs):
+            items = []
+        else:
+            res = spec.fn(ctx)
+            items = res if isinstance(res, list) else ([res] if res is not None else [])
+    except Exception as e:
+        error = True
+        items = [_internal_error_item(spec.code, e)]
+    instrumentation.record_rule(spec.code, time.perf_counter() - t0, items, error=error)
+    return items
+
+def _run_specs(ctx: _DocContext, specs: List[RuleSpec]) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for spec in specs:
+        results.extend(_run_spec(ctx, spec))
+    return results
+
+def _spec_fields(specs: List[RuleSpec]) -> List[str]:
+    return _field_order(tuple(dict.fromkeys(f for s in specs for f in s.fields)))
+
+def _resolve_fields(ctx: _DocContext, fields: List[str]) -> None:
+    for name in fields:
+        try:
+            ctx.field(name)
+        except Exception:
+            pass  # ошибку поля получит правило, которое его читает
+
+# --------------------------- дубликаты ---------------------------
+# [2026-10-19] feat: деловой ключ документа для core.dup_index — БИН
+#   поставщика | БИН покупателя | дата выписки (ISO) | итог в тиынах.
+#   PDF и XLSX одного счёта дают один ключ. "" — ключевых полей не хватает.
+#   key_fields() — те же поля по отдельности (и неполные) для core.result_store.
+
+def key_fields(doc_or_ctx: Any) -> Dict[str, Any]:
+    """supplier_bin / buyer_bin / issue_date (ISO) / total_tiyn; нет значения — "" или None."""
+    ctx = doc_or_ctx if isinstance(doc_or_ctx, _DocContext) else _DocContext(utils.normalize_keys(doc_or_ctx or {}))
+
+    def _get(name: str) -> str:
+        try:
+            return str(ctx.field(name) or "")
+        except Exception:
+            return ""
+
+    return {"supplier_bin": utils.only_digits(_get("supplier_bin")),
+            "buyer_bin": utils.only_digits(_get("buyer_bin")),
+            "issue_date": utils.to_iso(utils.parse_date_any(_get("issue_date"))),
+            "total_tiyn": reconcile.parse_tiyn(_get("total"))}
+
+def key_from_fields(fields: Dict[str, Any]) -> str:
+    if not fields.get("supplier_bin") or not fields.get("issue_date") or fields.get("total_tiyn") is None:
+        return ""
+    return f"{fields['supplier_bin']}|{fields['buyer_bin']}|{fields['issue_date']}|{fields['total_tiyn']}"
+
+def business_key(doc_or_ctx: Any) -> str:
+    return key_from_fields(key_fields(doc_or_ctx))
+
+_DUP_USER = {"title": "Документ уже проверялся",
+             "description": "Тот же файл или тот же БИН, дата и итог — под другим путём."}
+
+def duplicate_item(other: str) -> Dict[str, Any]:
+    """
+    DUP001; ранее проверенные пути — значением, не в тексте: шаблон один
+    на все совпадения (validator показывает значение DUP001 всегда).
+    """
+    cfg = RULES.get("DUP001", {})
+    return _make_item("DUP001", cfg.get("level", "WARN"), cfg.get("user") or _DUP_USER, value=other)
+
+# --------------------------- частичный перезапуск ---------------------------
+# [2026-10-19] feat: документ хранит резолвленные поля и результаты по
+#   каждому правилу; при смене ключей конфига перезапускаются только
+#   правила, которые от них зависят (напрямую или через поля).
+
+class RuleRun:
+    """Результаты правил одного документа + контекст для перезапуска."""
+
+    __slots__ = ("ctx", "by_rule")
+
+    def __init__(self, ctx: _DocContext):
+        self.ctx = ctx
+        self.by_rule: Dict[str, List[Dict[str, Any]]] = {}
+
+    def items(self) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for spec in _RULE_SPECS:
+            out.extend(self.by_rule.get(spec.code, ()))
+        return out
+
+def _key_match(changed: str, declared: str) -> bool:
+    """'bin_rules' задевает 'bin_rules.allow_equal_bins' и наоборот."""
+    return changed == declared or changed.startswith(declared + ".") or declared.startswith(changed + ".")
+
+def affected_by(changed_keys) -> Tuple[set, set]:
+    """(поля, коды правил), которые надо пересчитать после смены ключей конфига."""
+    changed = list(changed_keys)
+    hit = lambda declared: any(_key_match(k, d) for k in changed for d in declared)
+    fields = {name for name, f in _FIELDS.items() if hit(f.config)}
+    grew = True
+    while grew:  # зависимые поля тоже устаревают
+        grew = False
+        for name, f in _FIELDS.items():
+            if name not in fields and fields.intersection(f.requires):
+                fields.add(name)
+                grew = True
+    codes = {s.code for s in _RULE_SPECS if hit(s.config) or fields.intersection(s.fields)}
+    return fields, codes
+
+def evaluate(doc: Dict[str, Any]) -> RuleRun:
+    """Как run_all_rules, но с сохранением контекста и результатов по правилам."""
+    ctx = _DocContext(utils.normalize_keys(doc or {}))
+    run = RuleRun(ctx)
+    specs = _active_specs()
+    _resolve_fields(ctx, _spec_fields(specs))
+    for spec in specs:
+        run.by_rule[spec.code] = _run_spec(ctx, spec)
+    return run
+
+def rerun(run: RuleRun, changed_keys) -> List[str]:
+    """Перезапускает затронутые правила документа; возвращает их коды."""
+    fields, codes = affected_by(changed_keys)
+    ctx = run.ctx
+    if any(_key_match(k, d) for k in changed_keys for d in _TEXT_CONFIG):
+        ctx._texts = None
+    for name in fields:
+        ctx._fields.pop(name, None)
+    specs = _active_specs()
+    active = {s.code for s in specs}
+    for code in list(run.by_rule):
+        if code not in active:  # правило выключили (when)
+            del run.by_rule[code]
+    done: List[str] = []
+    for spec in specs:
+        if spec.code in codes or spec.code not in run.by_rule:
+            run.by_rule[spec.code] = _run_spec(ctx, spec)
+            done.append(spec.code)
+    return done
+
+def update_config(changes: Dict[str, Any]) -> List[str]:
+    """
+    Меняет значения конфига по ключам через точку ('bin_rules.allow_equal_bins')
+    и атомарно подменяет CONFIG. Возвращает ключи, значение которых реально изменилось.
+    """
+    new_cfg = json.loads(json.dumps(CONFIG, ensure_ascii=False))
+    changed: List[str] = []
+    for key, value in (changes or {}).items():
+        node = new_cfg
+        parts = key.split(".")
+        for p in parts[:-1]:
+            nxt = node.get(p)
+            if not isinstance(nxt, dict):
+                nxt = node[p] = {}
+            node = nxt
+        if node.get(parts[-1], object()) != value:
+            node[parts[-1]] = value
+            changed.append(key)
+    if changed:
+        reload_config(new_cfg)
+    return changed
 
 def run_all_rules(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
     # [2025-11-18] refactor(mini): нормализуем вход, чтобы e2e-данные были единообразны
     doc = utils.normalize_keys(doc or {})
+    ctx = _DocContext(doc)
+
+    # [2026-10-19] сначала включённые правила и их поля (в порядке зависимостей),
+    #              затем правила; без обязательных полей правило пропускается
+    specs = _active_specs()
+    _resolve_fields(ctx, _spec_fields(specs))
+    return _run_specs(ctx, specs)
+
+# --------------------------- триаж ---------------------------
+# [2026-10-19] feat: предварительный отсев входящих. Нужен только ответ
+#   «есть ли блокирующая ошибка» и её код: правила идут по убыванию
+#   (частота ERROR / средняя стоимость), первая ошибка останавливает
+#   проверку, пользовательские сообщения не собираются (предикаты
+#   check возвращают только уровень нарушения).
+
+# code → [прогонов, ERROR, секунд]; копится в процессе, можно засеять
+# из выгрузки core.instrumentation (seed_triage)
+_TRIAGE_STATS: Dict[str, List[float]] = {}
+_TRIAGE_STATE: Dict[str, Any] = {"order": None, "left": 0}
+_TRIAGE_REORDER_EVERY = 256
+_TRIAGE_PRIOR_COST_S = 2e-5
+
+def triage_check(code: str):
+    """
+    Декоратор быстрого предиката правила: ctx -> уровень нарушения или None.
+    Переопределение правила через @rule(...) сбрасывает его предикат
+    (тогда в триаже выполняется само правило).
+    """
+    def deco(fn):
+        for spec in _RULE_SPECS:
+            if spec.code == code:
+                spec.check = fn
+        _TRIAGE_STATE["order"] = None
+        return fn
+    return deco
+
+def _fail_level(code: str, default: str = "ERROR") -> str:
+    return RULES.get(code, {}).get("level", default)
+
+def _is_error(level: Any) -> bool:
+    return str(level).upper() == "ERROR"
+
+@triage_check("BIN001")
+def _check_BIN001(ctx: _DocContext) -> Optional[str]:
+    return None if _is_bin(ctx.field("supplier_bin")) else _fail_level("BIN001")
+
+@triage_check("BIN002")
+def _check_BIN002(ctx: _DocContext) -> Optional[str]:
+    return None if _is_bin(ctx.field("buyer_bin")) else _fail_level("BIN002")
+
+@triage_check("BIN007")
+def _check_BIN007(ctx: _DocContext) -> Optional[str]:
+    if ctx.field("supplier_bin") != ctx.field("buyer_bin"):
+        return None
+    if CONFIG.get("bin_rules", {}).get("allow_equal_bins", False):
+        return None
+    return _fail_level("BIN007", "WARN")
 
-    results: List[Dict[str, Any]] = []
-    for fn in _RULE_FUNCS_SEQ:
-        try:
-            res = fn(doc)
-            if isinstance(res, list):
-                results.extend(res)
-            elif res is not None:
-                results.append(res)
-        except Exception as e:
-            results.append({
-                "code": fn.__name__,
-                "level": "ERROR",
-                "user": {
-                    "title": "Внутренняя ошибка правила",
-                    "description": f"{fn.__name__}: {e}",
-                    "recommendation": "Сообщите разработчику."
-                }
-            })
+@triage_check("D000")
+def _check_D000(ctx: _DocContext) -> Optional[str]:
+    if _parse_date_any(ctx.field("issue_date")) is not None:
+        return None
+    return d000_level()
+
+@triage_check("D001")
+def _check_D001(ctx: _DocContext) -> Optional[str]:
+    dt = _parse_date_any(ctx.field("issue_date"))
+    return _fail_level("D001") if dt and dt.date() > date.today() else None
+
+@triage_check("TOT001")
+def _check_TOT001(ctx: _DocContext) -> Optional[str]:
+    val = ctx.field("total")
+    if val != "":
+        num = _to_number(val)
+        if num is not None and num > 0 and not _is_suspicious_table_index(num):
+            return None
+    return _fail_level("TOT001")
+
+@triage_check("NEG001")
+def _check_NEG001(ctx: _DocContext) -> Optional[str]:
+    num = _to_number(ctx.field("total"))
+    return _fail_level("NEG001", "WARN") if num is not None and num < 0 else None
+
+@triage_check("BIN012")
+def _check_BIN012(ctx: _DocContext) -> Optional[str]:
+    for name in ("supplier_bin", "buyer_bin"):
+        val = ctx.field(name)
+        if _is_bin(val) and not _kz_mod11_checksum_valid(val):
+            return _fail_level("BIN012")
+    return None
+
+def _triage_order() -> List[RuleSpec]:
+    st = _TRIAGE_STATE
+    if st["order"] is None or st["left"] <= 0:
+        def score(spec: RuleSpec) -> float:
+            runs, errors, secs = _TRIAGE_STATS.get(spec.code, (0, 0, 0.0))
+            rate = (errors + 1.0) / (runs + 2.0)  # Лаплас: без истории — 0.5
+            cost = secs / runs if runs else _TRIAGE_PRIOR_COST_S
+            return rate / max(cost, 1e-9)
+        st["order"] = sorted(_RULE_SPECS, key=score, reverse=True)  # sorted стабилен
+        st["left"] = _TRIAGE_REORDER_EVERY
+    st["left"] -= 1
+    return st["order"]
+
+def _triage_spec(ctx: _DocContext, spec: RuleSpec) -> bool:
+    """True — правило дало бы элемент уровня ERROR (включая внутреннюю ошибку)."""
     try:
-        results.extend(_rule_BIN012(doc))
-    except Exception as e:
-        results.append({
-            "code": "BIN012",
-            "level": "ERROR",
-            "user": {
-                "title": "Внутренняя ошибка правила",
-                "description": f"BIN012: {e}",
-                "recommendation": "Сообщите разработчику."
-            }
-        })
-    return results
+        if not all(ctx.has(n) for n in spec.needs):
+            return False
+        if spec.check is not None:
+            return _is_error(spec.check(ctx))
+        res = spec.fn(ctx)
+        items = res if isinstance(res, list) else ([res] if res is not None else [])
+        return any(_is_error(it.get("level")) for it in items)
+    except Exception:
+        return True  # run_all_rules превратил бы это в _internal_error_item (ERROR)
+
+def run_triage(doc: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """
+    ("FAIL", код первого найденного ERROR) или ("PASS", None).
+    Вердикт совпадает с any(level == ERROR) по run_all_rules(doc);
+    код — один из кодов с ERROR (какой именно — зависит от порядка).
+    """
+    ctx = _DocContext(utils.normalize_keys(doc or {}))
+    for spec in _triage_order():
+        if spec.when is not None and not spec.when():
+            continue
+        t0 = time.perf_counter()
+        failed = _triage_spec(ctx, spec)
+        st = _TRIAGE_STATS.get(spec.code)
+        if st is None:
+            st = _TRIAGE_STATS[spec.code] = [0, 0, 0.0]
+        st[0] += 1
+        st[1] += failed
+        st[2] += time.perf_counter() - t0
+        if failed:
+            return "FAIL", spec.code
+    return "PASS", None
+
+def seed_triage(snapshot: Dict[str, Any]) -> None:
+    """
+    Засеять историю триажа из выгрузки instrumentation (snapshot()/dump JSON):
+    calls, levels.ERROR и mean_us по правилам.
+    """
+    for code, r in dict(snapshot or {}).get("rules", {}).items():
+        calls = int(r.get("calls", 0) or 0)
+        if calls <= 0:
+            continue
+        errors = int(dict(r.get("levels", {})).get("ERROR", 0)) + int(r.get("exceptions", 0) or 0)
+        _TRIAGE_STATS[code] = [calls, min(errors, calls), float(r.get("mean_us", 0.0)) * 1e-6 * calls]
+    _TRIAGE_STATE["order"] = None
+
+def triage_stats() -> Dict[str, Dict[str, Any]]:
+    """Текущая история триажа и порядок правил."""
+    order = [s.code for s in (_TRIAGE_STATE["order"] or _RULE_SPECS)]
+    return {code: {"runs": int(r), "errors": int(e), "mean_us": round(t / r * 1e6, 1) if r else 0.0,
+                   "position": order.index(code) if code in order else None}
+            for code, (r, e, t) in sorted(_TRIAGE_STATS.items())}
+
+# ключи конфига, которые читают предикаты check (или правила, от которых
+# зависит уровень): паритет проверяется на всех сочетаниях
+_TRIAGE_VARIANTS = {
+    "bin_rules.bin_checksum_enabled": (False, True),
+    "bin_rules.allow_equal_bins": (False, True),
+    "require_date_severity": ("WARN", "ERROR"),
+    "totals.tolerance_abs": (0.5, 0),
+}
+
+def _triage_parity(docs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Самотест: на каждом сочетании _TRIAGE_VARIANTS вердикт run_triage совпадает
+    с any(ERROR) по run_all_rules, код FAIL — один из кодов с ERROR.
+    AssertionError на первом расхождении; конфиг восстанавливается.
+    """
+    import itertools
+    keys = list(_TRIAGE_VARIANTS)
+    saved = json.loads(json.dumps(CONFIG, ensure_ascii=False))
+    out = {"variants": 0, "docs": 0, "fail": 0}
+    try:
+        for values in itertools.product(*(_TRIAGE_VARIANTS[k] for k in keys)):
+            variant = dict(zip(keys, values))
+            update_config(variant)
+            _TRIAGE_STATE["order"] = None  # порядок — заново по накопленной истории: проверяются и разные порядки
+            for doc in docs:
+                errors = {it["code"] for it in run_all_rules(doc) if _is_error(it.get("level"))}
+                verdict, code = run_triage(doc)
+                assert (verdict == "FAIL") == bool(errors), (variant, doc, verdict, sorted(errors))
+                assert code is None or code in errors, (variant, doc, code, sorted(errors))
+                out["fail"] += verdict == "FAIL"
+            out["variants"] += 1
+            out["docs"] += len(docs)
+    finally:
+        reload_config(saved)
+    return out
+
+# --------------------------- самотест ---------------------------
+if __name__ == "__main__":
+    import random
+    rnd = random.Random(5)
+    parts = ["Итого", "Всего к оплате", "Grand Total", "БИН", " ", "\n", ":", ",", ".", "'", "руб",
+             "1", "1 234", "12 345,67", "168 000.00", "-10,5", "2025", " " * 20]
+    for _ in range(5000):
+        t = "".join(rnd.choice(parts) for _ in range(rnd.randint(1, 30)))
+        assert _find_total_value(t) == _find_total_value_regex(t), repr(t)
+    worst = "1 2 " * 1000 + "x"
+    t0 = time.perf_counter(); _find_total_value(worst); t1 = time.perf_counter()
+    print(f"_TotalScan: паритет OK; «1 2 »×1000 — {1000 * (t1 - t0):.2f} мс")
+
+    # require_date_severity переопределяет уровень D000 из чек-листа — и в полном прогоне, и в триаже
+    no_date = {"supplier_bin": "100000000001", "buyer_bin": "100000001003", "issue_date": "", "total": "100"}
+    saved = CONFIG.get("require_date_severity")
+    try:
+        for sev in ("WARN", "ERROR"):
+            update_config({"require_date_severity": sev})
+            d000 = [r["level"] for r in run_all_rules(no_date) if r["code"] == "D000"]
+            assert d000 == [sev], (sev, d000)
+            verdict = run_triage(no_date)
+            assert verdict == (("FAIL", "D000") if sev == "ERROR" else ("PASS", None)), (sev, verdict)
+    finally:
+        update_config({"require_date_severity": saved})
+    print("D000: require_date_severity WARN/ERROR — полный прогон и триаж согласны")
+
+    # триаж против полного прогона: образцы (и только их raw_text) + случайные документы
+    import glob
+    from . import reader
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                       "synthetic_esf_visual", "invoices")
+    docs: List[Dict[str, Any]] = []
+    for p in sorted(glob.glob(os.path.join(src, "*"))):
+        try:
+            d = reader.read_any(p)
+        except Exception:
+            continue
+        if "error" not in d:
+            docs.append(d)
+            if d.get("raw_text"):
+                docs.append({"raw_text": d["raw_text"]})
+    corpus = len(docs)
+
+    def rnd_bin() -> str:
+        return rnd.choice(["", "12345", "0000a0000000", "100000000001", "100000001003",
+                           "".join(rnd.choice("0123456789") for _ in range(12))])
+
+    def rnd_amount() -> Any:
+        return rnd.choice(["", "0", "5", "-10,5", "168 000.00", "abc", 100.0, 12.0, 112.0, 112.3])
+
+    for _ in range(1500):
+        s = rnd_bin()
+        doc = {"supplier_BIN": s, "recipient_BIN": s if rnd.random() < 0.15 else rnd_bin(),
+               "issue_date": rnd.choice(["", "2025-09-21", "2031-01-01", "32.13.2025", "21.09.2025"]),
+               "total_amount": rnd_amount()}
+        if rnd.random() < 0.4:
+            doc.update(total_net=rnd_amount(), total_vat=rnd_amount(), total_with_vat=rnd_amount())
+        if rnd.random() < 0.3:
+            doc["lines"] = [{"amount": rnd_amount(), "vat_amount": rnd_amount()} for _ in range(rnd.randint(1, 4))]
+        docs.append(doc)
+    t0 = time.perf_counter()
+    par = _triage_parity(docs)
+    print(f"триаж: паритет с полным прогоном OK — {corpus} из образцов + {len(docs) - corpus} случайных, "
+          f"{par['variants']} вариантов конфига, FAIL {par['fail']}/{par['docs']} "
+          f"({time.perf_counter() - t0:.1f} с)")
@@ -0,0 +1,222 @@
+# ============================================================
+# scan_index.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: индекс просмотренных файлов для режима наблюдения
+#   за папкой (watch.py). Для каждого файла хранится (mtime_ns, size,
+#   inode) на момент последней проверки и её статус; в очередь попадают
+#   только новые и изменённые файлы (inode ловит подмену файла с тем же
+#   размером и временем). Индекс — SQLite (WAL), переживает перезапуск.
+#   Дешёвый повторный обход: у каталогов запоминается mtime. Каталог,
+#   mtime которого не менялся, не мог получить новых файлов или потерять
+#   старые — его файлы не stat'ятся (только listdir ради подкаталогов).
+#   Правку файла «на месте» такой обход не видит, поэтому каждый
+#   full_every-й обход — полный. Файлы моложе settle секунд (ещё
+#   копируются) откладываются, каталог остаётся «грязным» до их приёма.
+#   Таблица meta — состояние наблюдателя между запусками (счётчик
+#   обходов: полный обход раз в full_every и для --once из cron).
+# ============================================================
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import utils
+
+SIDECAR_SUFFIX = ".ulyulyu.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    dir      TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    ino      INTEGER NOT NULL,
+    status   TEXT NOT NULL,
+    checked  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE TABLE IF NOT EXISTS dirs (
+    path     TEXT PRIMARY KEY,
+    parent   TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS meta (
+    key      TEXT PRIMARY KEY,
+    value    TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+Stat = Tuple[int, int, int]  # (mtime_ns, size, ino)
+
+@dataclass
+class ScanResult:
+    changed: List[Tuple[str, Stat]] = field(default_factory=list)  # новые и изменённые
+    removed: List[str] = field(default_factory=list)
+    pending: int = 0       # ещё копируются (моложе settle)
+    dirs: int = 0          # каталогов пройдено
+    dirs_skipped: int = 0  # из них без stat файлов (mtime каталога прежний)
+    stats: int = 0         # вызовов stat для файлов
+    elapsed_s: float = 0.0
+    dir_rows: List[Tuple[str, str, int]] = field(default_factory=list, repr=False)
+    gone_dirs: List[str] = field(default_factory=list, repr=False)
+    dirty_dirs: List[str] = field(default_factory=list, repr=False)  # не запоминать: файлы не записаны
+
+def _subtree(path: str) -> Tuple[str, str]:
+    """Границы диапазона строк «path/…» — поиск по индексу вместо LIKE."""
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+class ScanIndex:
+    """Состояние файлов под наблюдаемыми папками (SQLite)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # ---------- обход ----------
+    def scan(self, roots: Iterable[str], exts: Tuple[str, ...], full: bool = False,
+             settle: float = 2.0) -> ScanResult:
+        """
+        Сравнить дерево с индексом; сам индекс не меняется. Файлы записывает
+        record() после проверки, каталоги — commit() после record(). Упали
+        посередине — следующий обход увидит те же изменения.
+        """
+        t0 = time.perf_counter()
+        out = ScanResult()
+        db = self._conn()
+        now_ns = time.time_ns()
+        settle_ns = int(settle * 1e9)
+        stack = [os.path.abspath(r) for r in reversed(list(roots))]
+        while stack:
+            d = stack.pop()
+            try:
+                d_mtime = os.stat(d).st_mtime_ns
+                with os.scandir(d) as it:
+                    entries = list(it)
+            except OSError:
+                continue  # исчез между обходами — уберёт родитель
+            out.dirs += 1
+            subdirs, files = [], []
+            for e in entries:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    elif (e.name.lower().endswith(exts) and not e.name.endswith(SIDECAR_SUFFIX)
+                          and e.is_file(follow_symlinks=False)):
+                        files.append(e)
+                except OSError:
+                    continue
+            stack.extend(sorted(subdirs, reverse=True))
+
+            row = db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (d,)).fetchone()
+            if not full and row is not None and row[0] == d_mtime:
+                out.dirs_skipped += 1
+                continue
+
+            known: Dict[str, Stat] = {p: (m, s, i) for p, m, s, i in db.execute(
+                "SELECT path, mtime_ns, size, ino FROM files WHERE dir = ?", (d,))}
+            dirty = now_ns - d_mtime < settle_ns  # каталог меняли только что — не доверяем mtime
+            for e in files:
+                try:
+                    st = e.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                out.stats += 1
+                cur = (st.st_mtime_ns, st.st_size, e.inode())
+                prev = known.pop(e.path, None)
+                if prev == cur:
+                    continue
+                if now_ns - st.st_mtime_ns < settle_ns:
+                    out.pending += 1
+                    dirty = True
+                    continue
+                out.changed.append((e.path, cur))
+            out.removed.extend(known)
+            live = set(subdirs)
+            out.gone_dirs.extend(p for p, in db.execute("SELECT path FROM dirs WHERE parent = ?", (d,))
+                             if p not in live)
+            if not dirty:
+                out.dir_rows.append((d, os.path.dirname(d), d_mtime))
+
+        for g in out.gone_dirs:
+            lo, hi = _subtree(g)
+            out.removed.extend(p for p, in db.execute(
+                "SELECT path FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (g, lo, hi)))
+        out.elapsed_s = time.perf_counter() - t0
+        return out
+
+    # ---------- запись ----------
+    def record(self, rows: Iterable[Tuple[str, Stat, str]]) -> None:
+        """(путь, (mtime_ns, size, ino), статус) — после проверки, одной транзакцией."""
+        now = time.time()
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT OR REPLACE INTO files(path, dir, mtime_ns, size, ino, status, checked) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((p, os.path.dirname(p), m, s, i, status, now) for p, (m, s, i), status in rows))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def commit(self, result: ScanResult) -> None:
+        """
+        Завершить обход: убрать удалённые файлы и поддеревья, запомнить
+        mtime пройденных каталогов (их файлы к этому моменту уже записаны);
+        каталоги из dirty_dirs забываются — следующий обход их не пропустит.
+        """
+        db = self._conn()
+        dirty = set(result.dirty_dirs)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in result.removed))
+            for g in result.gone_dirs:
+                lo, hi = _subtree(g)
+                db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (g, lo, hi))
+            db.executemany("DELETE FROM dirs WHERE path = ?", ((d,) for d in sorted(dirty)))
+            db.executemany("INSERT OR REPLACE INTO dirs(path, parent, mtime_ns) VALUES (?, ?, ?)",
+                           (r for r in result.dir_rows if r[0] not in dirty))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: Any) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, str(value)))
+
+    def stats(self) -> Dict[str, int]:
+        db = self._conn()
+        out = {"files": db.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+               "dirs": db.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]}
+        for status, n in db.execute("SELECT status, COUNT(*) FROM files GROUP BY status"):
+            out[status or "unknown"] = n
+        return out
+
+def open_default(path: Optional[str] = None) -> ScanIndex:
+    """Индекс из config.json → "watch".index_path (относительно папки приложения)."""
+    path = path or (utils.load_config().get("watch", {}) or {}).get("index_path") \
+        or os.path.join("data", "watch_index.sqlite")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return ScanIndex(path)
@@ -0,0 +1,337 @@
+# ============================================================
+# scheduling.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: порядок проверки в смешанных пакетах.
+#   PDF на 300 страниц в начале очереди держал сотни одностраничных
+#   XLSX. Теперь у каждого задания есть оценка стоимости (мс):
+#     PDF  — по числу страниц из /Root → /Pages → /Count (через trailer
+#            и xref, читаются сотни байт, без разбора документа);
+#     XLSX — по размеру; члены ZIP — по размеру из оглавления.
+#   Политики: fifo — в порядке входа; sjf — сначала дешёвые, с
+#   «старением»: ключ = стоимость − aging × ожидание. Ожидание у всех
+#   растёт одинаково, поэтому ключ = стоимость + aging × время постановки
+#   — неизменен, очередь — обычная куча. Большое задание, прождав
+#   достаточно, обгоняет вновь пришедшие мелкие.
+#   run() отдаёт задания пулу по одному, когда освобождается воркер
+#   (иначе порядок решал бы уже пул), и меряет задержку каждого задания
+#   (от постановки в очередь до готовности): среднее и p95.
+#   При sjf первое задание выбирается, когда оценены все файлы или
+#   прошло estimate_window_ms: иначе первые slots заданий уходили бы в
+#   порядке поступления (дорогой файл в голове списка — первым).
+#   python -m core.scheduling [папка] [-w N] — fifo / sjf / sjf+aging.
+#   Настройки: config.json → "scheduling".
+# ============================================================
+
+from __future__ import annotations
+import heapq
+import io
+import itertools
+import math
+import os
+import pathlib
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import archive, utils
+
+POLICIES = ("fifo", "sjf")
+
+_DEFAULTS = {
+    "policy": "sjf",
+    "aging_ms_per_s": 100.0,   # на сколько «мс стоимости» дешевеет задание за секунду ожидания
+    "pdf_base_ms": 4.0,
+    "pdf_page_ms": 4.0,
+    "pdf_bytes_per_page": 50000,  # если страницы не прочитались
+    "xlsx_base_ms": 40.0,
+    "xlsx_kb_ms": 0.5,
+    "other_ms": 2.0,
+    "estimate_window_ms": 200.0,  # sjf: сколько ждать оценок перед первым заданием
+}
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("scheduling", {}) or {}
+    out = dict(_DEFAULTS)
+    for k, v in sect.items():
+        if k in out and v is not None:
+            out[k] = v if k == "policy" else float(v)
+    return out
+
+# --------------------------- страницы PDF ---------------------------
+
+_TAIL = 2048
+_RE_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_RE_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)")
+_RE_COUNT = re.compile(rb"/Count\s+(\d+)")
+_SCAN_LIMIT = 16 << 20
+
+def _read_at(f, off: int, n: int) -> bytes:
+    f.seek(off)
+    return f.read(n)
+
+def _ref(data: bytes, name: bytes) -> Optional[int]:
+    m = re.search(re.escape(name) + rb"\s+(\d+)\s+\d+\s+R", data)
+    return int(m.group(1)) if m else None
+
+def _xref_section(f, off: int) -> Optional[Tuple[List[Tuple[int, int, int]], bytes]]:
+    """
+    Классическая таблица xref: подразделы (первый номер, число, позиция
+    записей) и словарь trailer. Записи по 20 байт не читаются — позицию
+    нужного объекта можно вычислить. None — xref-поток (PDF 1.5+).
+    """
+    if _read_at(f, off, 4) != b"xref":
+        return None
+    pos, subs = off + 4, []
+    while True:
+        m = _RE_SUBSECTION.match(_read_at(f, pos, 64))
+        if not m:
+            break
+        first, count = int(m.group(1)), int(m.group(2))
+        subs.append((first, count, pos + m.end()))
+        pos += m.end() + 20 * count
+    return subs, _read_at(f, pos, _TAIL)
+
+def _offset(f, sections, num: int) -> Optional[int]:
+    for subs, _ in sections:  # от последнего обновления к первому
+        for first, count, pos in subs:
+            if first <= num < first + count:
+                entry = _read_at(f, pos + 20 * (num - first), 20)
+                return int(entry[:10]) if entry[17:18] == b"n" else None
+    return None
+
+def _object(f, sections, num: Optional[int]) -> bytes:
+    off = _offset(f, sections, num) if num is not None else None
+    if off is None:
+        return b""
+    data = _read_at(f, off, 4096)
+    end = data.find(b"endobj")
+    return data if end < 0 else data[:end]
+
+def _page_count(f) -> Optional[int]:
+    f.seek(0, io.SEEK_END)
+    size = f.tell()
+    tail = _read_at(f, max(0, size - _TAIL), _TAIL)
+    found = list(_RE_STARTXREF.finditer(tail))
+    if found:
+        sections, seen = [], set()
+        xref = int(found[-1].group(1))
+        while xref and xref < size and xref not in seen:  # цепочка /Prev (инкрементальные правки)
+            seen.add(xref)
+            sect = _xref_section(f, xref)
+            if sect is None:
+                break
+            sections.append(sect)
+            m = re.search(rb"/Prev\s+(\d+)", sect[1])
+            xref = int(m.group(1)) if m else 0
+        if sections:
+            root = _object(f, sections, _ref(sections[0][1], b"/Root"))
+            pages = _object(f, sections, _ref(root, b"/Pages"))
+            m = _RE_COUNT.search(pages)
+            if m:
+                return int(m.group(1))
+    if size > _SCAN_LIMIT:
+        return None
+    # xref-поток или битая таблица: наибольший /Count в файле
+    counts = [int(c) for c in _RE_COUNT.findall(_read_at(f, 0, size))]
+    return max(counts) if counts else None
+
+def pdf_page_count(path: str, raw: Optional[bytes] = None) -> Optional[int]:
+    """Число страниц по trailer/xref без разбора документа; None — не удалось."""
+    try:
+        if raw is not None:
+            return _page_count(io.BytesIO(raw))
+        with open(path, "rb") as f:
+            return _page_count(f)
+    except (OSError, ValueError):
+        return None
+
+# --------------------------- стоимость ---------------------------
+
+def estimate_cost(path: str, cfg: Optional[Dict[str, Any]] = None) -> float:
+    """Ожидаемое время проверки, мс (для порядка, не для прогноза)."""
+    cfg = cfg or settings()
+    ext = pathlib.Path(path).suffix.lower()
+    member = archive.split(path) is not None
+    try:
+        size = archive.member_size(path) if member else os.path.getsize(path)
+    except (OSError, KeyError):
+        return cfg["other_ms"]
+    if ext == ".pdf":
+        pages = None if member else pdf_page_count(path)
+        if pages is None:
+            pages = max(1.0, size / cfg["pdf_bytes_per_page"])
+        return cfg["pdf_base_ms"] + cfg["pdf_page_ms"] * pages
+    if ext in (".xlsx", ".xls"):
+        return cfg["xlsx_base_ms"] + cfg["xlsx_kb_ms"] * size / 1024.0
+    return cfg["other_ms"]
+
+# --------------------------- очередь ---------------------------
+
+class Job:
+    __slots__ = ("path", "cost", "t_enq", "t_start", "t_done")
+
+    def __init__(self, path: str, cost: float, t_enq: float):
+        self.path, self.cost, self.t_enq = path, cost, t_enq
+        self.t_start = self.t_done = 0.0
+
+    @property
+    def latency(self) -> float:
+        return self.t_done - self.t_enq
+
+class JobQueue:
+    """Потокобезопасная очередь заданий: fifo или sjf со старением."""
+
+    def __init__(self, policy: str = "sjf", aging_ms_per_s: float = 0.0):
+        if policy not in POLICIES:
+            raise ValueError(f"неизвестная политика: {policy}")
+        self.policy, self.aging = policy, max(0.0, aging_ms_per_s)
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._t0 = time.perf_counter()
+
+    def push(self, job: Job) -> None:
+        seq = next(self._seq)
+        if self.policy == "fifo":
+            key = float(seq)
+        else:
+            key = job.cost + self.aging * (job.t_enq - self._t0)
+        with self._cond:
+            heapq.heappush(self._heap, (key, seq, job))
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Больше заданий не будет."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wait_closed(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться close() (все задания поставлены); False — истёк timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed, timeout)
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[Job]:
+        """Следующее задание; None — очередь закрыта и пуста или истёк timeout."""
+        with self._cond:
+            if not self._heap and not self._closed:
+                self._cond.wait(timeout)
+            return heapq.heappop(self._heap)[2] if self._heap else None
+
+    @property
+    def drained(self) -> bool:
+        with self._cond:
+            return self._closed and not self._heap
+
+def _produce(q: JobQueue, paths: Iterable[str], cfg: Dict[str, Any]) -> None:
+    try:
+        for p in paths:
+            q.push(Job(p, estimate_cost(p, cfg), time.perf_counter()))
+    finally:
+        q.close()
+
+def run(paths: Iterable[str], fn: Callable[[str], Any], pool=None, policy: Optional[str] = None,
+        aging_ms_per_s: Optional[float] = None) -> Iterator[Tuple[Any, Job]]:
+    """
+    Проверить paths функцией fn в пуле (ProcessPoolExecutor; None — в этом
+    процессе) в порядке политики. Отдаёт (результат, Job) по готовности.
+    Оценка стоимости идёт в отдельном потоке параллельно с проверкой;
+    при sjf первое задание — после оценки всех (не дольше estimate_window_ms).
+    """
+    cfg = settings()
+    policy = policy or cfg["policy"]
+    aging = cfg["aging_ms_per_s"] if aging_ms_per_s is None else aging_ms_per_s
+    q = JobQueue(policy, aging)
+    threading.Thread(target=_produce, args=(q, paths, cfg), name="job-cost", daemon=True).start()
+    if policy == "sjf":
+        q.wait_closed(max(0.0, cfg["estimate_window_ms"]) / 1000.0)
+    if pool is None:
+        while True:
+            job = q.pop()
+            if job is None:
+                if q.drained:
+                    return
+                continue
+            job.t_start = time.perf_counter()
+            res = fn(job.path)
+            job.t_done = time.perf_counter()
+            yield res, job
+    slots = max(1, getattr(pool, "_max_workers", 1))
+    running: Dict[Any, Job] = {}
+    while True:
+        while len(running) < slots:
+            job = q.pop(None if not running else 0.0)
+            if job is None:
+                break
+            job.t_start = time.perf_counter()
+            running[pool.submit(fn, job.path)] = job
+        if not running:
+            if q.drained:
+                return
+            continue
+        # пока воркер свободен, а очередь пуста — просыпаемся и за новыми заданиями
+        done, _ = wait(running, timeout=None if len(running) >= slots else 0.02,
+                       return_when=FIRST_COMPLETED)
+        now = time.perf_counter()
+        for fut in done:
+            job = running.pop(fut)
+            job.t_done = now
+            yield fut.result(), job
+
+# --------------------------- задержки ---------------------------
+
+def latency_summary(latencies_s: List[float]) -> Dict[str, float]:
+    """n, среднее, p95, максимум (мс)."""
+    if not latencies_s:
+        return {"n": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    xs = sorted(latencies_s)
+    p95 = xs[max(0, math.ceil(0.95 * len(xs)) - 1)]
+    return {"n": len(xs), "mean_ms": round(1000.0 * sum(xs) / len(xs), 1),
+            "p95_ms": round(1000.0 * p95, 1), "max_ms": round(1000.0 * xs[-1], 1)}
+
+def _check_uncached(path: str) -> Dict[str, Any]:
+    """Разбор + правила без кэша и индекса дубликатов — для замера."""
+    from . import reader
+    from .validator import validate_document
+    try:
+        data = reader.read_any(path)
+    except Exception as e:
+        return {"path": path, "error": f"{e.__class__.__name__}: {e}"}
+    if "error" in data and len(data) == 1:
+        return {"path": path, "error": data["error"]}
+    return {"path": path, "results": len(validate_document(data))}
+
+# --------------------------- замер ---------------------------
+if __name__ == "__main__":
+    import argparse, glob
+    ap = argparse.ArgumentParser(prog="python -m core.scheduling")
+    ap.add_argument("src", nargs="?", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "synthetic_esf_visual", "invoices"))
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+    files = sorted(p for p in glob.glob(os.path.join(args.src, "**", "*"), recursive=True)
+                   if p.lower().endswith((".pdf", ".xlsx", ".xls")))
+    if not files:
+        raise SystemExit(f"нет файлов в {args.src}")
+    cfg = settings()
+    big = [p for p in files if p.lower().endswith(".pdf") and (pdf_page_count(p) or 0) > 1]
+    print(f"{len(files)} файлов, многостраничных PDF: {len(big)}, воркеров: {args.workers}")
+    print(f"{'политика':18s} {'среднее, мс':>12s} {'p95, мс':>10s} {'макс, мс':>10s} {'всего, с':>9s}")
+    from . import reader, workers as worker_pool
+    reader.warm_up()
+    pool = worker_pool.make_pool(args.workers) if args.workers > 1 else None
+    try:
+        for label, policy, aging in (("fifo", "fifo", 0.0), ("sjf", "sjf", 0.0),
+                                     (f"sjf+aging {cfg['aging_ms_per_s']:g}", "sjf", cfg["aging_ms_per_s"])):
+            t0 = time.perf_counter()
+            lat = [job.latency for _, job in run(files, _check_uncached, pool, policy, aging)]
+            s = latency_summary(lat)
+            print(f"{label:18s} {s['mean_ms']:12.1f} {s['p95_ms']:10.1f} {s['max_ms']:10.1f} "
+                  f"{time.perf_counter() - t0:9.2f}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
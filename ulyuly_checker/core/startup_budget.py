@@ -0,0 +1,138 @@
+# ============================================================
+# startup_budget.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: бюджет импорта при запуске GUI.
+#   Окно main.py должно появляться сразу, поэтому ридеры (PyPDF2,
+#   openpyxl) и NumPy импортируются после показа окна (фоновый поток)
+#   или при первом файле. Проверка, что так и осталось:
+#     python -m core.startup_budget [--budget-ms N] [--runs 5] [--script main.py]
+#   Из скрипта берутся импорты верхнего уровня (включая try/if, кроме
+#   блока __main__; импорты внутри функций — отложенные, не считаются)
+#   и выполняются в чистом интерпретаторе под -X importtime. Время —
+#   сумма cumulative по модулям верхнего уровня за вычетом импортов
+#   самого интерпретатора (site, encodings…); берётся лучший из runs
+#   прогонов. Код возврата 1 — бюджет превышен или загружен модуль из
+#   списка отложенных. Настройки: config.json → "startup".
+#   Замер — с актуальными .pyc, как у установленного приложения: без
+#   них (PYTHONDONTWRITEBYTECODE, правка исходника) каждый запуск заново
+#   компилирует изменённые модули, и одно ядро «весит» вдвое больше.
+#   Прогрев пишет .pyc (в __pycache__ рядом с модулями), переменная
+#   окружения на подпроцессы не передаётся.
+#   Бюджет — от замера с запасом ~2×: эталон — 1 vCPU Intel Xeon
+#   (виртуальная машина), Linux, Python 3.11.7: 72–85 мс (лучший из 5);
+#   ядро (core.validator: config, чек-лист, правила) — 26–31 мс, из них
+#   чтение config.json и чек-листа < 0.5 мс — откладывать там нечего.
+# ============================================================
+
+from __future__ import annotations
+import ast
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import utils
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("startup", {}) or {}
+    return {
+        "import_budget_ms": float(sect.get("import_budget_ms", 180)),
+        "deferred": list(sect.get("deferred", ["PyPDF2", "openpyxl", "numpy"])),
+    }
+
+def _is_main_guard(node: ast.If) -> bool:
+    t = node.test
+    return (isinstance(t, ast.Compare) and isinstance(t.left, ast.Name) and t.left.id == "__name__"
+            and any(isinstance(c, ast.Constant) and c.value == "__main__" for c in t.comparators))
+
+def startup_imports(script: str) -> List[str]:
+    """Операторы import, выполняемые при загрузке скрипта (исходный текст)."""
+    with open(script, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script)
+    out: List[str] = []
+
+    def walk(body) -> None:
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                out.append(ast.unparse(node))
+            elif isinstance(node, ast.Try):
+                walk(node.body)  # except — запасной путь, при нормальном старте не выполняется
+            elif isinstance(node, ast.If) and not _is_main_guard(node):
+                walk(node.body)
+                walk(node.orelse)
+    walk(tree.body)
+    return out
+
+def _snippet(imports: List[str]) -> str:
+    lines = ["import sys", f"sys.path.insert(0, {_APP_DIR!r})"]
+    for stmt in imports:
+        lines += ["try:", f"    {stmt}", "except ImportError:", "    pass"]
+    return "\n".join(lines)
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # иначе устаревшие .pyc не перепишутся
+    return env
+
+def _importtime(code: str) -> List[Tuple[int, int, str]]:
+    """(self мкс, cumulative мкс, имя с отступом) — разбор вывода -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=_APP_DIR, env=_env(),
+                          capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "сбой импорта")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок
+        rows.append((int(parts[0]), int(parts[1]), parts[2][1:].rstrip()))
+    return rows
+
+def measure(script: str, runs: int = 5) -> Dict[str, Any]:
+    """Лучший из runs прогонов: всего мс, модули верхнего уровня, все загруженные имена."""
+    base = {name.strip() for _, _, name in _importtime("pass")}
+    code = _snippet(startup_imports(script))
+    _importtime(code)  # прогрев: запись .pyc и файловый кэш
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(max(1, runs)):
+        rows = _importtime(code)
+        top = [(cum / 1000.0, name) for _, cum, name in rows
+               if not name.startswith(" ") and name not in base]
+        total = sum(ms for ms, _ in top)
+        if best is None or total < best["total_ms"]:
+            best = {"total_ms": total, "top": sorted(top, reverse=True),
+                    "modules": {name.strip() for _, _, name in rows}}
+    return best  # type: ignore[return-value]
+
+def check(script: str, budget_ms: float, deferred: List[str], runs: int = 5) -> Tuple[bool, Dict[str, Any]]:
+    res = measure(script, runs)
+    loaded = sorted(m for m in deferred if m in res["modules"])
+    res.update(budget_ms=budget_ms, deferred_loaded=loaded)
+    return res["total_ms"] <= budget_ms and not loaded, res
+
+if __name__ == "__main__":
+    import argparse
+    cfg = settings()
+    ap = argparse.ArgumentParser(prog="python -m core.startup_budget",
+                                 description="Время импорта при запуске скрипта (-X importtime) против бюджета.")
+    ap.add_argument("--script", default=os.path.join(_APP_DIR, "main.py"))
+    ap.add_argument("--budget-ms", type=float, default=cfg["import_budget_ms"])
+    ap.add_argument("--runs", type=int, default=5, help="прогонов (берётся лучший)")
+    ap.add_argument("--top", type=int, default=12, help="сколько самых тяжёлых импортов показать")
+    args = ap.parse_args()
+    ok, res = check(args.script, args.budget_ms, cfg["deferred"], args.runs)
+    print(f"{os.path.basename(args.script)}: импорт при запуске {res['total_ms']:.1f} мс "
+          f"(бюджет {args.budget_ms:g} мс, лучший из {args.runs})")
+    for ms, name in res["top"][:args.top]:
+        print(f"  {ms:8.1f} мс  {name}")
+    if res["deferred_loaded"]:
+        print(f"✖ при запуске загружены отложенные модули: {', '.join(res['deferred_loaded'])}")
+    elif res["total_ms"] > args.budget_ms:
+        print("✖ бюджет превышен")
+    else:
+        print("☑ в бюджете")
+    raise SystemExit(0 if ok else 1)
@@ -19,7 +19,12 @@ _LABELS: Dict[str, str] = {
     "D000": "не указана дата документа",
     "D001": "дата в будущем",
     "TOT001": "ошибка в итоговой сумме",
-    "NEG001": "отрицательные значения сумм"
+    "NEG001": "отрицательные значения сумм",
+    "TOT002": "итоги не сходятся",
+    "TOT003": "нулевые итоговые суммы",
+    "TOT004": "расхождение по округлению",
+    "NEG002": "отрицательный НДС",
+    "DUP001": "счёт уже проверялся (возможный дубликат)"
 }
 
 # Ключевые группы для коротких сводок (будет расширяться)
@@ -4,11 +4,22 @@
 # [2025-11-18] refactor(mini): подключён core.utils.normalize_keys()
 #                    (канон полей) и load_config() (единая точка).
 #                    Поведение валидации не менял.
+# [2026-10-19] feat: validate_document(..., doc_id=...) запоминает
+#                    документ (поля + результаты по правилам);
+#                    apply_config_change() после смены ключей конфига
+#                    перезапускает только зависящие от них правила
+#                    во всех открытых документах.
+# [2026-10-19] feat: triage_document() — быстрый вердикт для отсева входящих.
+# [2026-10-19] perf: ValidationResult — __slots__ и интернирование: (код,
+#                    уровень, шаблон текста) хранится один раз в таблице,
+#                    результат держит её номер и значение; message
+#                    собирается при обращении. python -m core.validator
+#                    --memory [N] — замер памяти на N результатов.
 # ============================================================
 
 import os
 import json
-from dataclasses import dataclass
+import threading
 from typing import List, Dict, Any, Tuple
 
 from . import rules_engine
@@ -40,11 +51,84 @@ UI_OVERLAY = bool(CONFIG.get("ui_overlay_enabled", False))
 DEBUG_SHOW_VALUES = bool(CONFIG.get("debug_show_values", False))
 
 # --------------------------- тип результата ---------------------------
-@dataclass
+# Вид результата — (код, уровень, шаблон текста) — хранится один раз;
+# результат ссылается на него номером. Значение (value) — своё у каждого.
+# Изменчивая часть текста (пути DUP001, текст исключения) — в значении,
+# не в шаблоне; на случай шаблонов с переменным текстом (тексты из чужих
+# чек-листов, ValidationResult(..., message)) таблица ограничена
+# _KINDS_MAX: сверх него вид не интернируется — результат держит кортеж сам.
+_KINDS: List[Tuple[str, str, str]] = []
+_KIND_IDS: Dict[Tuple[str, str, str], int] = {}
+_KINDS_LOCK = threading.Lock()
+_KINDS_MAX = 65536
+_NO_VALUE = object()
+# значение этих кодов — часть сообщения (показывается и без debug_show_values)
+_VALUE_LABELS = {"DUP001": "ранее"}
+
+def _kind_id(code: str, level: str, template: str) -> Any:
+    """Номер вида в _KINDS; сверх _KINDS_MAX — сам кортеж (без интернирования)."""
+    key = (code, level, template)
+    k = _KIND_IDS.get(key)
+    if k is None:
+        with _KINDS_LOCK:
+            k = _KIND_IDS.get(key)
+            if k is None:
+                if len(_KINDS) >= _KINDS_MAX:
+                    return key
+                k = len(_KINDS)
+                _KINDS.append(key)
+                _KIND_IDS[key] = k
+    return k
+
+def _kind(k: Any) -> Tuple[str, str, str]:
+    return _KINDS[k] if k.__class__ is int else k
+
 class ValidationResult:
-    code: str
-    level: str
-    message: str
+    """code / level / message; текст собирается из шаблона и значения при обращении."""
+
+    __slots__ = ("_k", "_v")
+    __hash__ = None  # как у прежнего dataclass (eq без frozen)
+
+    def __init__(self, code: str, level: str, message: str):
+        self._k = _kind_id(code, level, message)
+        self._v = _NO_VALUE
+
+    @classmethod
+    def _make(cls, kind: Any, value: Any = _NO_VALUE) -> "ValidationResult":
+        r = cls.__new__(cls)
+        r._k, r._v = kind, value
+        return r
+
+    @property
+    def code(self) -> str:
+        return _kind(self._k)[0]
+
+    @property
+    def level(self) -> str:
+        return _kind(self._k)[1]
+
+    @property
+    def message(self) -> str:
+        code, _, tmpl = _kind(self._k)
+        if self._v is _NO_VALUE:
+            return tmpl
+        return f"{tmpl} [{_VALUE_LABELS.get(code, 'значение')}: {self._v}]"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ValidationResult):
+            return NotImplemented
+        return (self.code, self.level, self.message) == (other.code, other.level, other.message)
+
+    def __repr__(self) -> str:
+        return f"ValidationResult(code={self.code!r}, level={self.level!r}, message={self.message!r})"
+
+    def __reduce__(self):
+        # номера видов у каждого процесса свои — в пул/pickle уходит содержимое
+        kind = _kind(self._k)
+        return _restore, kind if self._v is _NO_VALUE else kind + (self._v,)
+
+def _restore(code: str, level: str, tmpl: str, *value: Any) -> ValidationResult:
+    return ValidationResult._make(_kind_id(code, level, tmpl), *value)
 
 # --------------------------- утилиты ---------------------------
 def _priority_for(code: str) -> int:
@@ -55,41 +139,181 @@ def _priority_for(code: str) -> int:
     if code.startswith("D"):   return 1
     return 2
 
-def _compose_message(item: Dict[str, Any]) -> str:
-    """Собираем пользовательский текст и, при включённой отладке, подмешиваем value."""
+# словари user в основном общие (чек-лист, rules_engine._ok_user) — текст по ним
+# собирается один раз; (словарь, текст), сверка по is — id мог достаться новому
+_USER_TEXT: Dict[int, Tuple[Dict[str, Any], str]] = {}
+_USER_TEXT_MAX = 4096
+
+def _template(item: Dict[str, Any]) -> str:
+    """Пользовательский текст без значения: title — description — recommendation."""
     u = item.get("user", {})
-    title = str(u.get("title", "")).strip()
-    desc  = str(u.get("description", "")).strip()
-    rec   = str(u.get("recommendation", "")).strip()
-    parts = [p for p in (title, desc, rec) if p]
-    msg = " — ".join(parts) if parts else str(item.get("message","")).strip()
-    if DEBUG_SHOW_VALUES and "value" in item:
-        msg = f"{msg} [значение: {item['value']}]"
-    return msg
+    hit = _USER_TEXT.get(id(u))
+    if hit is not None and hit[0] is u:
+        text = hit[1]
+    else:
+        title = str(u.get("title", "")).strip()
+        desc  = str(u.get("description", "")).strip()
+        rec   = str(u.get("recommendation", "")).strip()
+        text = " — ".join(p for p in (title, desc, rec) if p)
+        if len(_USER_TEXT) >= _USER_TEXT_MAX:
+            _USER_TEXT.clear()
+        _USER_TEXT[id(u)] = (u, text)
+    return text or str(item.get("message","")).strip()
+
+def _shown_value(it: Dict[str, Any], code: str) -> Any:
+    """Значение в сообщении: при debug_show_values, для _VALUE_LABELS и пометки show_value."""
+    if "value" in it and (DEBUG_SHOW_VALUES or code in _VALUE_LABELS or it.get("show_value")):
+        return it["value"]
+    return _NO_VALUE
+
+def _to_results(raw_items: List[Dict[str, Any]]) -> List[ValidationResult]:
+    out: List[Tuple[int, str, ValidationResult]] = []
+    make = ValidationResult._make
+    for it in raw_items:
+        code  = str(it.get("code","")).strip()
+        level = str(it.get("level","INFO")).upper()
+        value = _shown_value(it, code)
+        out.append((_priority_for(code), code, make(_kind_id(code, level, _template(it)), value)))
+
+    out.sort(key=lambda t: (t[0], t[1]))
+    return [x[2] for x in out]
+
+# открытые документы: doc_id → RuleRun (поля и результаты по правилам)
+_OPEN_DOCS: Dict[str, rules_engine.RuleRun] = {}
 
 # --------------------------- API ---------------------------
-def validate_document(content: Dict[str, Any], template: Dict[str, Any] | None = None) -> List[ValidationResult]:
+def validate_document(content: Dict[str, Any], template: Dict[str, Any] | None = None,
+                      doc_id: str | None = None) -> List[ValidationResult]:
     """
     content — распарсенные поля (supplier_BIN/recipient_BIN/issue_date/… или их канон).
     template — не используется в v2.7, оставлено для совместимости.
+    doc_id — если задан, документ остаётся «открытым» для apply_config_change().
     """
     # [2025-11-18] refactor(mini): приводим ключи к канону, ISO-дата
     content = utils.normalize_keys(content or {})
 
-    raw_items = rules_engine.run_all_rules(content)
+    if doc_id is None:
+        return _to_results(rules_engine.run_all_rules(content))
+    run = rules_engine.evaluate(content)
+    _OPEN_DOCS[doc_id] = run
+    return _to_results(run.items())
 
-    out: List[Tuple[int, ValidationResult]] = []
-    for it in raw_items:
-        code  = str(it.get("code","")).strip()
-        level = str(it.get("level","INFO")).upper()
-        msg   = _compose_message(it)
-        out.append((_priority_for(code), ValidationResult(code=code, level=level, message=msg)))
+def apply_config_change(changes: Dict[str, Any]) -> Dict[str, List[ValidationResult]]:
+    """
+    changes — {'bin_rules.allow_equal_bins': True, ...}. Возвращает новые
+    результаты открытых документов (без повторного разбора файлов).
+    """
+    changed = rules_engine.update_config(changes)
+    out: Dict[str, List[ValidationResult]] = {}
+    for doc_id, run in list(_OPEN_DOCS.items()):  # воркеры очереди GUI могут добавлять
+        if changed:
+            rules_engine.rerun(run, changed)
+        out[doc_id] = _to_results(run.items())
+    return out
 
-    out.sort(key=lambda t: (t[0], t[1].code))
-    return [x[1] for x in out]
+def validate_with_key(content: Dict[str, Any], template: Dict[str, Any] | None = None,
+                      doc_id: str | None = None) -> Tuple[List[ValidationResult], Dict[str, Any]]:
+    """
+    validate_document + ключевые поля документа (rules_engine.key_fields:
+    для индекса дубликатов и хранилища результатов) — поля резолвятся один раз.
+    """
+    content = utils.normalize_keys(content or {})
+    run = rules_engine.evaluate(content)
+    if doc_id is not None:
+        _OPEN_DOCS[doc_id] = run
+    return _to_results(run.items()), rules_engine.key_fields(run.ctx)
+
+def with_duplicates(results: List[ValidationResult], matches) -> List[ValidationResult]:
+    """Результаты + DUP001 по совпадениям индекса [(путь, "file"|"key"), ...]."""
+    if not matches:
+        return results
+    dup = _to_results([rules_engine.duplicate_item(", ".join(p for p, _ in matches))])
+    out = list(results) + dup
+    out.sort(key=lambda r: (_priority_for(r.code), r.code))
+    return out
+
+def close_document(doc_id: str) -> None:
+    _OPEN_DOCS.pop(doc_id, None)
+
+def triage_document(content: Dict[str, Any]) -> Tuple[str, str | None]:
+    """("FAIL", код) при первой блокирующей ошибке, иначе ("PASS", None); без сообщений."""
+    return rules_engine.run_triage(utils.normalize_keys(content or {}))
 
 # --------------------------- самотест ---------------------------
+def _memory_report(n: int) -> None:
+    """Память на n результатов: прежний dataclass (текст в каждом) против ValidationResult."""
+    import gc, glob, pickle, sys, time, tracemalloc
+    from dataclasses import dataclass
+
+    @dataclass
+    class _DictResult:  # так было до [2026-10-19]
+        code: str
+        level: str
+        message: str
+
+    from . import reader
+    src = os.path.join(os.path.dirname(_project_root()), "synthetic_esf_visual", "invoices")
+    docs = []
+    for p in sorted(glob.glob(os.path.join(src, "*")))[:20]:
+        try:
+            d = reader.read_any(p)
+        except Exception:
+            continue
+        if "error" not in d:
+            docs.append(utils.normalize_keys(d))
+    items = [rules_engine.run_all_rules(d) for d in docs] or [rules_engine.run_all_rules({})]
+
+    def build(kind: str) -> list:
+        out, i = [], 0
+        while len(out) < n:
+            for it in items[i % len(items)]:
+                code, level = str(it.get("code", "")), str(it.get("level", "INFO")).upper()
+                if kind == "old":
+                    msg = _template(it)
+                    if DEBUG_SHOW_VALUES and "value" in it:
+                        msg = f"{msg} [значение: {it['value']}]"
+                    else:
+                        msg = msg + ""  # свой объект строки, как при сборке в каждом результате
+                    out.append(_DictResult(code, level, msg))
+                else:
+                    out.append(ValidationResult._make(_kind_id(code, level, _template(it)),
+                                                      it["value"] if DEBUG_SHOW_VALUES and "value" in it else _NO_VALUE))
+            i += 1
+        return out[:n]
+
+    print(f"{n:,} результатов ({len(items)} документов-образцов, значения в тексте: {DEBUG_SHOW_VALUES})")
+    sizes = {}
+    for kind, label in (("old", "dataclass + текст"), ("new", "__slots__ + виды")):
+        gc.collect()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        res = build(kind)
+        dt = time.perf_counter() - t0
+        cur, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        sizes[kind] = cur
+        print(f"  {label:20s} {cur / 2**20:8.1f} МБ  {cur / n:6.0f} Б/результат  сборка {dt:.2f} с")
+        if kind == "new":
+            print(f"  видов в таблице: {len(_KINDS)}; объект: {sys.getsizeof(res[0])} Б; "
+                  f"pickle: {len(pickle.dumps(res[:1000])) // 1000} Б/результат")
+        del res
+    print(f"  экономия: {(sizes['old'] - sizes['new']) / 2**20:.1f} МБ ({1 - sizes['new'] / sizes['old']:.0%})")
+
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["--memory"]:
+        _memory_report(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
+        raise SystemExit(0)
     sample = {"supplier_BIN": "220629802621", "recipient_BIN": "", "issue_date": "2030-01-01"}
     for line in validate_document(sample):
         print(f"[{line.level}] {line.code}: {line.message}")
+
+    # таблица видов ограничена: сверх _KINDS_MAX вид не интернируется
+    import pickle
+    _KINDS_MAX = len(_KINDS)
+    extra = [ValidationResult("X000", "INFO", f"текст {i}") for i in range(100)]
+    assert len(_KINDS) == _KINDS_MAX and extra[7].message == "текст 7" and extra[7].code == "X000"
+    assert pickle.loads(pickle.dumps(extra)) == extra
+    boom = rules_engine._internal_error_item("BIN001", ZeroDivisionError("division by zero"))
+    print(_to_results([boom])[0].message)
+    print(f"виды: {len(_KINDS)} в таблице, сверх предела — без интернирования: OK")
@@ -0,0 +1,177 @@
+# ============================================================
+# workers.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] perf: фабрика пулов процессов для проверки.
+#   Раньше каждый пул (batch, pipeline, service) стартовал воркеры
+#   методом по умолчанию, и каждый воркер заново импортировал ядро,
+#   читал config.json и чек-лист, компилировал регулярки.
+#   - forkserver (где есть): родитель сервера один раз импортирует
+#     core.preload (прогрев + gc.freeze()), воркеры — его fork'и с уже
+#     готовыми модулями; общие страницы не копируются;
+#   - без forkserver (Windows) — spawn + reader.warm_up в инициализаторе;
+#   - воркер перезапускается после max_tasks_per_child заданий — рост
+#     памяти openpyxl не копится бесконечно.
+#   Настройки: config.json → "worker_pool".
+#   python -m core.workers [папка] — замер: старт пула, время, память
+#   (RSS / PSS / USS на воркер) для fork, forkserver и forkserver+preload.
+# ============================================================
+
+from __future__ import annotations
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import reader, utils
+
+_PRELOAD = "core.preload"
+_CONFIGURED: Dict[str, Any] = {}
+
+def settings() -> Dict[str, Any]:
+    sect = utils.load_config().get("worker_pool", {}) or {}
+    return {
+        "start_method": str(sect.get("start_method", "auto") or "auto").lower(),
+        "max_tasks_per_child": int(sect.get("max_tasks_per_child", 0) or 0),
+        "preload": bool(sect.get("preload", True)),
+    }
+
+def _core_importable() -> bool:
+    """core.preload грузится в forkserver по имени — core должен быть пакетом верхнего уровня."""
+    return __package__ == "core"
+
+def context(method: Optional[str] = None, preload: Optional[bool] = None):
+    """multiprocessing-контекст: forkserver с прогревом, где возможно, иначе spawn."""
+    cfg = settings()
+    method = (method or cfg["start_method"]).lower()
+    preload = cfg["preload"] if preload is None else preload
+    methods = multiprocessing.get_all_start_methods()
+    if method == "auto":
+        method = "forkserver" if "forkserver" in methods else "spawn"
+    ctx = multiprocessing.get_context(method)
+    if method == "forkserver" and preload and _core_importable() and not _CONFIGURED.get("preload"):
+        # список предзагрузки действует только до старта сервера (один на процесс)
+        ctx.set_forkserver_preload([_PRELOAD])
+        _start_forkserver()
+        _CONFIGURED["preload"] = True
+    return ctx
+
+def _start_forkserver() -> None:
+    """
+    Сервер запускается через `python -c`, sys.path[0] у него — текущая папка.
+    Запуск из корня репозитория (python -m ulyuly_checker.batch) подхватил бы
+    посторонний core/ рядом, поэтому стартуем сервер из папки приложения.
+    Вызывается до запуска рабочих потоков (chdir — на весь процесс).
+    """
+    from multiprocessing import forkserver
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        forkserver.ensure_running()
+    finally:
+        os.chdir(cwd)
+
+def _collect_stats() -> None:
+    from . import instrumentation
+    instrumentation.collect_on_exit(utils.load_config())
+
+def _init_worker() -> None:
+    reader.warm_up()  # после preload — почти ничего не делает
+    from . import instrumentation
+    instrumentation.start_worker()  # замеры воркера — в свой файл, главный процесс их сольёт
+
+def make_pool(workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None,
+              method: Optional[str] = None, preload: Optional[bool] = None) -> ProcessPoolExecutor:
+    """ProcessPoolExecutor с прогретыми воркерами и перезапуском после N заданий."""
+    ctx = context(method, preload)
+    n = max(1, int(workers or os.cpu_count() or 1))
+    limit = settings()["max_tasks_per_child"] if max_tasks_per_child is None else max_tasks_per_child
+    _collect_stats()
+    kw: Dict[str, Any] = {}
+    if limit and ctx.get_start_method() != "fork" and sys.version_info >= (3, 11):
+        kw["max_tasks_per_child"] = int(limit)
+    return ProcessPoolExecutor(n, mp_context=ctx, initializer=_init_worker, **kw)
+
+def make_mp_pool(workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None,
+                 method: Optional[str] = None, preload: Optional[bool] = None):
+    """То же для multiprocessing.Pool (imap/imap_unordered в batch.py)."""
+    ctx = context(method, preload)
+    n = max(1, int(workers or os.cpu_count() or 1))
+    limit = settings()["max_tasks_per_child"] if max_tasks_per_child is None else max_tasks_per_child
+    _collect_stats()
+    return ctx.Pool(n, initializer=_init_worker, maxtasksperchild=int(limit) or None)
+
+# --------------------------- память ---------------------------
+
+def _ping(_: int) -> int:
+    import time
+    time.sleep(0.05)  # чтобы задания разошлись по всем воркерам
+    return os.getpid()
+
+def worker_pids(pool: ProcessPoolExecutor, n: int) -> List[int]:
+    return sorted(set(pool.map(_ping, range(n * 4))))
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """RSS / PSS / USS процесса в КБ (Linux, /proc/<pid>/smaps_rollup); {} — недоступно."""
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                k, _, rest = line.partition(":")
+                if k in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    out[k] = int(rest.split()[0])
+    except (OSError, ValueError):
+        return {}
+    return {"rss": out.get("Rss", 0), "pss": out.get("Pss", 0),
+            "uss": out.get("Private_Clean", 0) + out.get("Private_Dirty", 0)}
+
+def _check_uncached(path: str) -> int:
+    """Разбор + проверка без кэша результатов — для замера."""
+    from .validator import validate_document
+    try:
+        data = reader.read_any(path)
+    except Exception:
+        return -1
+    return len(validate_document(data)) if "error" not in data else 0
+
+# --------------------------- замер ---------------------------
+if __name__ == "__main__":
+    import glob, json, subprocess, time
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "synthetic_esf_visual", "invoices")
+    if len(sys.argv) > 2:
+        # один вариант в отдельном процессе: forkserver и его preload — одни на процесс
+        method, preload, n = sys.argv[2], sys.argv[3] == "1", int(sys.argv[4])
+        files = sorted(glob.glob(os.path.join(src, "*")))
+        t0 = time.perf_counter()
+        pool = make_pool(n, method=method, preload=preload, max_tasks_per_child=0)
+        pids = worker_pids(pool, n)
+        t1 = time.perf_counter()
+        for _ in pool.map(_check_uncached, files, chunksize=4):
+            pass
+        t2 = time.perf_counter()
+        mem = [memory_kb(p) for p in worker_pids(pool, n)]
+        pool.shutdown()
+        avg = {k: sum(m.get(k, 0) for m in mem) // max(1, len(mem)) for k in ("rss", "pss", "uss")}
+        print(json.dumps({"start_s": round(t1 - t0, 3), "check_s": round(t2 - t1, 3),
+                          "workers": len(pids), "mem_kb": avg}))
+        raise SystemExit(0)
+    n = max(2, os.cpu_count() or 1)
+    print(f"{n} воркера, файлы: {src}")
+    print(f"{'вариант':22s} {'старт, с':>9s} {'проверка, с':>12s} {'RSS, МБ':>8s} {'PSS, МБ':>8s} {'USS, МБ':>8s}")
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for method, preload in (("fork", False), ("spawn", False), ("forkserver", False), ("forkserver", True)):
+        if method not in multiprocessing.get_all_start_methods():
+            continue
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        out = subprocess.run([sys.executable, "-m", "core.workers", src, method, str(int(preload)), str(n)],
+                             cwd=app_dir, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"{method}: сбой\n{out.stderr}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        m = r["mem_kb"]
+        label = method + (" + preload" if preload else "")
+        print(f"{label:22s} {r['start_s']:9.3f} {r['check_s']:12.3f} "
+              f"{m['rss'] / 1024:8.1f} {m['pss'] / 1024:8.1f} {m['uss'] / 1024:8.1f}")
@@ -3,9 +3,11 @@
 # 2025-11-12: BIN context hardening, buyer markers, bugfixes.
 # [2025-11-18] refactor(mini): перевод парсеров/нормализации в core.utils;
 #                в конце — normalize_keys(); поведение не изменено.
+# [2026-10-19] feat: read_xlsx/extract_data принимают и двоичный поток (BytesIO)
+#                — для членов ZIP-архивов без распаковки.
 
 import json, os, re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 from openpyxl import load_workbook
 
@@ -320,7 +322,7 @@ def _detect_bins(cells, markers_cfg) -> Tuple[str,str,Dict[str,str]]:
 
 # ---------------- public API ----------------
 
-def read_xlsx(file_path: str) -> Dict[str, Any]:
+def read_xlsx(file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     wb = load_workbook(file_path, data_only=True)
     ws = wb.active
     cells = _collect_cells(ws)
@@ -345,7 +347,7 @@ def read_xlsx(file_path: str) -> Dict[str, Any]:
     # [2025-11-18] refactor(mini): канонизация ключей + ISO-дата
     return utils.normalize_keys(content)
 
-def extract_data(file_path: str) -> Dict[str, Any]:
+def extract_data(file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
     return read_xlsx(file_path)
 
 if __name__ == "__main__":
@@ -12,6 +12,32 @@
 #                             Инспектор/Пользователь и опцией «Показывать детали в user-режиме»
 #                             без перезапуска приложения (мгновенный перерасчёт вывода).
 # 2025-11-10: reason: интеграция summary_engine — добавлено человеческое резюме по результатам проверки.
+# 2026-10-19: reason: меню «Правила» — переключатели bin_checksum_enabled / allow_equal_bins /
+#                             require_date_severity; пересчитываются только зависящие правила
+#                             во всех открытых документах (без повторного разбора файлов).
+# 2026-10-19: reason: меню «Сервис» — замер времени правил и выгрузка статистики в JSON.
+# 2026-10-19: reason: чтение файла и поиск шаблона вынесены в core.reader (общие с batch.py).
+# 2026-10-19: reason: ZIP-архивы — открытие/перетаскивание архива проверяет все его документы
+#                             прямо из архива (без распаковки), сводка по членам.
+# 2026-10-19: reason: кэш результатов (core.result_cache) — повторно открытый файл с теми же
+#                             правилами не разбирается; при смене правил такой документ
+#                             перепроверяется целиком (он не «открыт» в validator).
+# 2026-10-19: reason: индекс дубликатов (core.dup_index) — счёт, уже проверенный под другим
+#                             путём (тот же файл или тот же БИН/дата/итог), получает DUP001;
+#                             группа «Повторы документов».
+# 2026-10-19: reason: при result_store.enabled результаты проверок пишутся в хранилище
+#                             для запросов инспектора (python -m core.result_store query ...).
+# 2026-10-19: reason: очередь проверок (core.check_queue) — перетащенные файлы проверяют
+#                             gui_queue.workers потоков, а не поток на файл; у каждого файла
+#                             строка в списке (состояние, итог), вывод — по выбранной строке;
+#                             «Отменить» / «Повторить», общий прогресс порции.
+# 2026-10-19: reason: вывод — ttk.Treeview вместо Text: строка на документ, группы и детали
+#                             создаются при раскрытии; смена режима перестраивает только
+#                             видимые группы (остальные — когда попадут в окно при прокрутке).
+# 2026-10-19: reason: быстрый старт — ридеры (PyPDF2/openpyxl, с ними NumPy) не импортируются
+#                             до показа окна: после первой отрисовки их подгружает фоновый
+#                             поток, а если файл брошен раньше — core.reader импортирует
+#                             их сам при первом чтении. Бюджет: python -m core.startup_budget.
 
 import os
 import json
@@ -51,16 +77,30 @@ def _level_label_ru(tag: str) -> str:
 
 # --- Импорт ядра ---
 try:
-    from core import pdf_reader, xlsx_reader
-    from core.validator import validate_document, ValidationResult
+    from core.validator import validate_document, ValidationResult, apply_config_change
+    from core.validator import validate_with_key, with_duplicates, close_document
     from core.summary_engine import summarize_results  # 2025-11-10: добавлено человеческое резюме
+    from core import instrumentation
+    from core import archive, check_queue, dup_index, reader, result_cache, result_store, rules_engine
+    _CORE_ERROR = None
 except ImportError as e:
+    _CORE_ERROR = f"Не удалось загрузить ядро ({e.__class__.__name__}: {e})"
+    # без ядра очереди нет: _start_checks показывает _CORE_ERROR вместо проверки
+    archive = check_queue = dup_index = reader = result_cache = result_store = rules_engine = None
     class ValidationResult:
         def __init__(self, code, level, message):
             self.code, self.level, self.message = code, level, message
-    def validate_document(content, template=None):
-        return [ValidationResult("FALLBACK", "ERROR",
-                 f"Не удалось загрузить ядро ({e.__class__.__name__}: {e})")]
+    def validate_document(content, template=None, doc_id=None):
+        return [ValidationResult("FALLBACK", "ERROR", _CORE_ERROR)]
+    def apply_config_change(changes):
+        return {}
+    def validate_with_key(content, template=None, doc_id=None):
+        return validate_document(content, template, doc_id), {}
+    def with_duplicates(results, matches):
+        return results
+    def close_document(doc_id):
+        pass
+    instrumentation = None
     def summarize_results(results):
         return {"status":"error","title":"Ошибка","message":f"Не удалось загрузить summary_engine ({e})","affected":[]}
 
@@ -87,8 +127,14 @@ GROUPS_CFG = CONFIG.get("groups", {})
 MODE = (CONFIG.get("mode") or "user").lower()
 SHOW_DETAILS_USER = bool(CONFIG.get("show_group_details_in_user_mode", False))
 
-_last_results = None
-_last_header = None
+_dup_matches = {}  # путь → совпадения в индексе дубликатов (DUP001 поверх пересчёта)
+_config_gen = 0    # поколение правил: растёт при каждом переключении в меню «Правила»
+_queue = None      # core.check_queue.CheckQueue — создаётся при первой проверке
+_auto_open = None  # запись, которую раскрыть по готовности (первый файл порции)
+_render_gen = 0    # поколение режима вывода; группы, построенные раньше, — устарели
+_row_gen = {}      # iid строки группы → поколение, с которым построены её детали
+_rendered = {}     # iid строки документа → entry.result, по которому построены её строки
+_GROUPS = {}       # iid строки документа → (результаты, группы) — кэш группировки
 
 # ============================= GUI =============================
 root.title("БИН-БИН! — Проверка счет-фактур")
@@ -109,19 +155,20 @@ menu_mode = tk.Menu(menubar, tearoff=0)
 inspector_var = tk.BooleanVar(value=(MODE == "inspector"))
 show_details_user_var = tk.BooleanVar(value=SHOW_DETAILS_USER)
 
-def _rerender_if_possible():
-    if _last_results is not None and _last_header is not None:
-        _insert_results_grouped(_last_results, _last_header)
+def _rerender_visible():
+    global _render_gen
+    _render_gen += 1
+    _refresh_visible()
 
 def _on_toggle_inspector():
     global MODE
     MODE = "inspector" if inspector_var.get() else "user"
-    _rerender_if_possible()
+    _rerender_visible()
 
 def _on_toggle_show_details_user():
     global SHOW_DETAILS_USER
     SHOW_DETAILS_USER = bool(show_details_user_var.get())
-    _rerender_if_possible()
+    _rerender_visible()
 
 menu_mode.add_checkbutton(
     label="Инспекторский режим",
@@ -136,102 +183,505 @@ menu_mode.add_checkbutton(
     command=_on_toggle_show_details_user
 )
 menubar.add_cascade(label="Режим", menu=menu_mode)
+
+# 2026-10-19: reason: переключатели правил — частичная перепроверка открытых документов
+menu_rules = tk.Menu(menubar, tearoff=0)
+_BIN_RULES_CFG = CONFIG.get("bin_rules", {})
+bin_checksum_var = tk.BooleanVar(value=bool(_BIN_RULES_CFG.get("bin_checksum_enabled", False)))
+allow_equal_bins_var = tk.BooleanVar(value=bool(_BIN_RULES_CFG.get("allow_equal_bins", False)))
+date_severity_var = tk.StringVar(value=str(CONFIG.get("require_date_severity", "ERROR")).upper())
+
+def _apply_rule_toggle(key, value):
+    global _config_gen
+    # поколение — до и после смены правил: проверка, начатая между ними (ключ кэша
+    # или правила ещё старые), тоже увидит другое поколение и повторится
+    _config_gen += 1
+    try:
+        updated = apply_config_change({key: value})
+    except Exception as e:
+        _ui_err(f"Не удалось применить настройку: {e}"); return
+    finally:
+        _config_gen += 1
+    if _queue is None:
+        return
+    stale = []
+    for entry in _queue.entries():
+        if entry.state != check_queue.DONE:
+            continue  # идущие проверки сверяют поколение сами (_check_job, _flush_jobs)
+        if "archive" in entry.result:
+            stale.append(entry.id)  # члены архива не «открыты» в валидаторе — проверяем заново
+            continue
+        res = updated.get(entry.path)
+        if res is None:
+            stale.append(entry.id)  # результат был из кэша — документ не разобран, проверяем заново
+            continue
+        res = with_duplicates(res, _dup_matches.get(entry.path))
+        entry.result = dict(entry.result, results=res, gen=_config_gen)
+        _update_job_row(entry)
+    if stale:
+        _queue.retry(stale)
+
+menu_rules.add_checkbutton(
+    label="Контрольная сумма БИН",
+    onvalue=True, offvalue=False,
+    variable=bin_checksum_var,
+    command=lambda: _apply_rule_toggle("bin_rules.bin_checksum_enabled", bool(bin_checksum_var.get()))
+)
+menu_rules.add_checkbutton(
+    label="Разрешить совпадение БИН поставщика и покупателя",
+    onvalue=True, offvalue=False,
+    variable=allow_equal_bins_var,
+    command=lambda: _apply_rule_toggle("bin_rules.allow_equal_bins", bool(allow_equal_bins_var.get()))
+)
+menu_date_sev = tk.Menu(menu_rules, tearoff=0)
+for _sev, _label in (("ERROR", "Ошибка"), ("WARN", "Предупреждение")):
+    menu_date_sev.add_radiobutton(
+        label=_label, value=_sev, variable=date_severity_var,
+        command=lambda: _apply_rule_toggle("require_date_severity", date_severity_var.get())
+    )
+menu_rules.add_cascade(label="Нет даты документа — уровень", menu=menu_date_sev)
+menubar.add_cascade(label="Правила", menu=menu_rules)
+
+# 2026-10-19: reason: статистика правил (время, уровни, исключения)
+menu_service = tk.Menu(menubar, tearoff=0)
+instr_var = tk.BooleanVar(value=bool(instrumentation and instrumentation.ENABLED))
+
+def _on_toggle_instrumentation():
+    if instrumentation:
+        instrumentation.set_enabled(bool(instr_var.get()))
+
+def _dump_rule_stats():
+    if not instrumentation:
+        return
+    path = filedialog.asksaveasfilename(defaultextension=".json",
+                                        initialfile="rules_stats.json",
+                                        filetypes=[("JSON", "*.json")])
+    if path:
+        try:
+            instrumentation.dump(path)
+            status_var.set(f"Статистика сохранена: {os.path.basename(path)}")
+        except Exception as e:
+            _ui_err(f"Не удалось сохранить статистику: {e}")
+
+menu_service.add_checkbutton(
+    label="Замер времени правил",
+    onvalue=True, offvalue=False,
+    variable=instr_var,
+    command=_on_toggle_instrumentation
+)
+menu_service.add_command(label="Сохранить статистику правил (JSON)…", command=_dump_rule_stats)
+menu_service.add_command(label="Сбросить статистику",
+                         command=lambda: instrumentation and instrumentation.reset())
+menubar.add_cascade(label="Сервис", menu=menu_service)
 root.config(menu=menubar)
 
-# Поле вывода
-output = tk.Text(main, wrap="word", height=26)
-output.pack(fill="both", expand=True)
-output.tag_configure("OK", foreground=OK_COLOR)
-output.tag_configure("INFO", foreground=OK_COLOR)
-output.tag_configure("WARN", foreground=WARN_COLOR)
-output.tag_configure("ERROR", foreground=ERR_COLOR)
-output.tag_configure("OPTIONAL", foreground=OPT_COLOR)
-output.tag_configure("SUMMARY", font=("Arial",10,"bold"))
-output.tag_configure("GROUP", font=("Arial",10,"bold"))
-output.tag_configure("MUTED", foreground="#666666")
-progress = ttk.Progressbar(main, mode="indeterminate")
+# 2026-10-19: reason: список результатов: документ → группы → детали (строятся при раскрытии)
+jobs_frame = ttk.Frame(main); jobs_frame.pack(fill="both", expand=True)
+jobs = ttk.Treeview(jobs_frame, columns=("state", "info"), show="tree headings", height=24)
+jobs.heading("#0", text="Файл / группа"); jobs.heading("state", text="Состояние"); jobs.heading("info", text="Итог")
+jobs.column("#0", width=240); jobs.column("state", width=150, stretch=False); jobs.column("info", width=420)
+jobs_scroll = ttk.Scrollbar(jobs_frame, orient="vertical", command=jobs.yview)
+jobs.pack(side="left", fill="both", expand=True); jobs_scroll.pack(side="right", fill="y")
+for _tag, _color in (("OK", OK_COLOR), ("INFO", OK_COLOR), ("WARN", WARN_COLOR), ("ERROR", ERR_COLOR),
+                     ("OPTIONAL", OPT_COLOR), ("MUTED", "#666666")):
+    jobs.tag_configure(_tag, foreground=_color)
+jobs.tag_configure("GROUP", font=("Arial",10,"bold"))
+progress = ttk.Progressbar(main, mode="determinate", maximum=100)
 
 # Кнопки
 def _open_file():
-    path = filedialog.askopenfilename(filetypes=[
-        ("Документы", "*.pdf;*.xls;*.xlsx;*.json"),
-        ("PDF", "*.pdf"), ("Excel", "*.xls;*.xlsx"), ("JSON", "*.json")
+    paths = filedialog.askopenfilenames(filetypes=[
+        ("Документы", "*.pdf;*.xls;*.xlsx;*.json;*.zip"),
+        ("PDF", "*.pdf"), ("Excel", "*.xls;*.xlsx"), ("JSON", "*.json"), ("ZIP-архив", "*.zip")
     ])
-    if path:
-        _start_check(path)
+    if paths:
+        _start_checks(root.tk.splitlist(paths))
+
+def _selected_ids():
+    """Записи очереди выбранных строк (строка группы или детали — её документ)."""
+    return sorted({int(iid.split("/", 1)[0]) for iid in jobs.selection()})
 
 ttk.Button(btns, text="Открыть файл…", command=_open_file).pack(side="left")
-ttk.Button(btns, text="Очистить", command=lambda: output.delete(1.0, tk.END)).pack(side="left", padx=6)
+ttk.Button(btns, text="Очистить", command=lambda: _clear_finished()).pack(side="left", padx=6)
+ttk.Button(btns, text="Отменить",
+           command=lambda: _queue and _queue.cancel(_selected_ids() or None)).pack(side="left")
+ttk.Button(btns, text="Повторить",
+           command=lambda: _queue and _queue.retry(_selected_ids() or None)).pack(side="left", padx=6)
 
 # ===============================================================
 # Drag & Drop
 # ===============================================================
 def _handle_drop(event):
     files = root.tk.splitlist(event.data)
+    accepted, rejected = [], []
     for file in files:
         ext = pathlib.Path(file).suffix.lower()
-        if ext in (".pdf", ".xls", ".xlsx", ".json"):
-            _start_check(file)
+        if ext in (".pdf", ".xls", ".xlsx", ".json", ".zip"):
+            accepted.append(file)
         else:
-            messagebox.showwarning("УЛЮЛЮ Checker", f"Формат не поддерживается: {ext}")
+            rejected.append(ext or os.path.basename(file))
+    if accepted:
+        _start_checks(accepted)
+    if rejected:
+        messagebox.showwarning("УЛЮЛЮ Checker", f"Формат не поддерживается: {', '.join(sorted(set(rejected)))}")
 
 def _drag_enter(event): status_var.set("Отпустите файл, чтобы начать проверку…")
 def _drag_leave(event): status_var.set("Готов")
 
 # ===============================================================
-# Проверка файла (фоновый поток)
+# Проверка файлов: очередь (core.check_queue) с фиксированным пулом потоков
 # ===============================================================
-def _start_check(file_path: str):
-    output.delete(1.0, tk.END)
-    status_var.set("Чтение файла…")
-    progress.pack(fill="x", pady=6); progress.start()
-    t = threading.Thread(target=_check_worker, args=(file_path,), daemon=True)
-    t.start()
-
-def _check_worker(file_path: str):
-    global _last_results, _last_header
-    try:
-        data = _read_any(file_path)
-        if isinstance(data, dict) and "error" in data:
-            _ui_err(data["error"]); return
-        tpl_data = {}
-        try:
-            base = pathlib.Path(file_path)
-            cand = [base.with_suffix(".json"), base.parent / "esf_template.json"]
-            tpl_path = next((str(p) for p in cand if p.exists()), None)
-            if tpl_path:
-                with open(tpl_path, "r", encoding="utf-8") as f:
-                    tpl_data = json.load(f)
-        except Exception:
-            tpl_data = {}
-        res = validate_document(data, tpl_data)
-        summary = summarize_results(res)  # 💬 человеческое резюме
-        header = (
-            f"Файл: {os.path.basename(file_path)} | Размер: {human_size(os.path.getsize(file_path))}\n\n"
-            f"💬 {summary['title']}: {summary['message']}"
-        )
-        _last_results, _last_header = res, header
-        root.after(0, lambda: _insert_results_grouped(res, header))
-    except Exception as e:
-        _ui_err(f"Ошибка при обработке: {e}")
-    finally:
-        root.after(0, lambda: (progress.stop(), progress.pack_forget(), status_var.set("Готов")))
+def _get_queue():
+    global _queue
+    if _queue is None:
+        _queue = check_queue.CheckQueue(_run_job, workers=check_queue.settings()["workers"],
+                                        on_change=_on_job_change)
+    return _queue
+
+def _start_checks(paths):
+    """Поставить файлы в очередь; первый из них раскрывается по готовности."""
+    global _auto_open
+    if _CORE_ERROR:
+        _ui_err(_CORE_ERROR); return
+    new = _get_queue().submit(paths)
+    for entry in new:
+        _update_job_row(entry)
+    if new:
+        iid = str(new[0].id)
+        jobs.selection_set(iid); jobs.focus(iid); jobs.see(iid)
+        _auto_open = new[0].id
+    _update_progress()
+
+def _run_job(entry):
+    """В потоке очереди: результат записи или исключение (→ «Сбой» с текстом)."""
+    return _archive_job(entry) if archive.is_archive(entry.path) else _check_job(entry)
+
+def _check_job(entry):
+    file_path = entry.path
+    raw = reader.read_bytes(file_path)
+    while True:
+        gen = _config_gen  # правила сменились посреди проверки — результат и ключ кэша устарели
+        res, key, fhash = reader.cached_results(file_path, raw)
+        if res is None:
+            data = _read_any(file_path, raw)
+            if isinstance(data, dict) and "error" in data:
+                raise ValueError(data["error"])
+            tpl_data = reader.find_template(file_path)
+            res, fields = validate_with_key(data, tpl_data, doc_id=file_path)
+            if gen != _config_gen:
+                continue  # проверяем заново, в кэш не пишем
+            result_cache.store(key, fhash, res)
+            bkey = rules_engine.key_from_fields(fields)
+        elif gen != _config_gen:
+            continue
+        else:
+            fields, bkey = {}, dup_index.key_for_hash(fhash)
+        break
+    fhash = fhash or result_cache.data_hash(raw)
+    _dup_matches[file_path] = dup_index.check(file_path, fhash, bkey)
+    res = with_duplicates(res, _dup_matches[file_path])
+    size = len(raw)
+    rec = reader.new_record(file_path)
+    rec.update(size=size, file_hash=fhash, business_key=bkey or "", fields=fields)
+    _store_records([reader.fill_record(rec, res)])
+    return {"results": res, "size": size, "gen": gen}
+
+def _archive_job(entry):
+    """Все документы архива по очереди (прямо из ZIP); отмена — между документами."""
+    gen = _config_gen  # сверяется в _flush_jobs, как у одиночного файла
+    members = list(archive.iter_members(entry.path, reader.SUPPORTED_EXT))
+    recs = []
+    for i, m in enumerate(members):
+        if entry.cancelled:
+            break
+        entry.report(i, len(members))
+        recs.append(reader.check_file(m))
+    _store_records(recs)
+    return {"archive": recs, "gen": gen}
 
 def _ui_err(msg: str): messagebox.showerror("УЛЮЛЮ Checker", msg)
 
-def _read_any(path: str):
-    content = {}
-    ext = pathlib.Path(path).suffix.lower()
-    if ext == ".pdf":
-        parsed = pdf_reader.parse_pdf_content(path)
-    elif ext in (".xls",".xlsx"):
-        parsed = xlsx_reader.extract_data(path)
-    elif ext==".json":
-        with open(path, "r", encoding="utf-8") as f: parsed = json.load(f)
+_store_error = None  # последний сбой записи в хранилище — в строке состояния
+
+def _store_records(recs):
+    """Хранилище результатов (если включено в config.json); сбой записи проверку не портит."""
+    global _store_error
+    try:
+        if result_store.settings()["enabled"]:
+            result_store.default().add_many(recs)
+        _store_error = None
+    except Exception as e:
+        _store_error = str(e) or e.__class__.__name__
+        root.after(0, _update_progress)
+
+def _read_any(path: str, raw=None):
+    return reader.read_any(path, raw)
+
+# --- отображение очереди (только в потоке Tk) ---
+_dirty_jobs = set()
+_dirty_lock = threading.Lock()
+_flush_scheduled = False
+
+def _on_job_change(entry):
+    """Из потока очереди: пометить строку и один раз запланировать перерисовку."""
+    global _flush_scheduled
+    with _dirty_lock:
+        _dirty_jobs.add(entry.id)
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    root.after(30, _flush_jobs)
+
+def _flush_jobs():
+    global _flush_scheduled, _auto_open
+    with _dirty_lock:
+        ids = sorted(_dirty_jobs); _dirty_jobs.clear()
+        _flush_scheduled = False
+    for eid in ids:
+        entry = _queue.get(eid)
+        if entry is None:
+            continue
+        if entry.state == check_queue.DONE and entry.result.get("gen") != _config_gen:
+            _queue.retry([eid])  # правила сменились между проверкой и её завершением
+            continue
+        if eid == _auto_open and entry.finished:
+            _auto_open = None
+            if entry.state == check_queue.DONE:
+                jobs.item(str(eid), open=True)
+        _update_job_row(entry)
+    _update_progress()
+
+_STATE_LABEL = {"queued": "В очереди", "running": "Проверяется", "cancelling": "Отмена…",
+                "failed": "✖ Сбой", "cancelled": "Отменено"}
+_STATUS_TAG = {"ok": ("OK", "☑"), "warn": ("WARN", "⚠"), "error": ("ERROR", "✖")}
+_STATUS_LABEL = {"OK": "ОК", "WARN": "Предупреждения", "ERROR": "Ошибки"}
+_ICON = {"OK": "☑", "INFO": "•", "WARN": "⚠", "ERROR": "✖"}
+
+def _level_tag(level, ok="OK") -> str:
+    lvl = str(level or "INFO").upper()
+    return "ERROR" if lvl in ("ERR", "ERROR") else ("WARN" if lvl in ("WARN", "WARNING") else ok)
+
+def _job_row(entry):
+    """(состояние, итог, тег цвета) строки документа."""
+    if entry.state == check_queue.DONE:
+        if "archive" in entry.result:
+            recs = entry.result["archive"]
+            bad = sum(1 for r in recs if "error" in r or r.get("status") == "error")
+            warn = sum(1 for r in recs if "error" not in r and r.get("status") == "warn")
+            tag = "ERROR" if bad else ("WARN" if warn else "OK")
+            info = f"Документов: {len(recs)}, с ошибками: {bad}, с предупреждениями: {warn}"
+        else:
+            res = entry.result["results"]
+            summary = summarize_results(res)  # 💬 человеческое резюме
+            tag = _STATUS_TAG.get(summary.get("status"), ("OK", ""))[0]
+            levels = [_level_tag(getattr(r, "level", "")) for r in res]
+            info = (f"💬 {summary.get('title', '')}: {summary.get('message', '')}  ·  "
+                    f"✅ {levels.count('OK')}  ⚠ {levels.count('WARN')}  ❌ {levels.count('ERROR')}  ·  "
+                    f"{human_size(entry.result.get('size', 0))}")
+        return f"{_STATUS_TAG[tag.lower()][1]} {_STATUS_LABEL[tag]}", info, tag
+    label = _STATE_LABEL.get(entry.state, entry.state)
+    if entry.state == check_queue.RUNNING and entry.total_units:
+        label += f" {entry.done_units}/{entry.total_units}"
+    if entry.state == check_queue.FAILED:
+        return label, entry.error or "", "ERROR"
+    return label, "", "MUTED"
+
+def _update_job_row(entry):
+    """Строка документа; её группы — заново, только если сменился результат."""
+    state, info, tag = _job_row(entry)
+    iid = str(entry.id)
+    if jobs.exists(iid):
+        jobs.item(iid, values=(state, info), tags=(tag,))
+    else:
+        jobs.insert("", "end", iid=iid, text=os.path.basename(entry.path), values=(state, info), tags=(tag,))
+    result = entry.result if entry.state == check_queue.DONE else None
+    if _rendered.get(iid) is result:
+        return
+    _rendered[iid] = result
+    if result is not None and jobs.item(iid, "open"):
+        _build_doc(iid)
     else:
-        return {"error":f"Неподдерживаемый формат {ext}"}
-    if isinstance(parsed, dict): content.update(parsed)
-    return content
+        _set_lazy(iid, result is not None and bool(result.get("results") or result.get("archive")))
+
+def _update_progress():
+    p = _queue.progress() if _queue is not None else {"busy": False, "total": 0}
+    extra = "".join(f", {label} {p[k]}" for k, label in (("failed", "сбоев"), ("cancelled", "отменено")) if p[k]) \
+        if p["total"] else ""
+    if p["busy"]:
+        if not progress.winfo_ismapped():
+            progress.pack(fill="x", pady=6)
+        progress.configure(value=p["fraction"] * 100)
+        finished = p["done"] + p["failed"] + p["cancelled"]
+        text = f"Проверка: {finished}/{p['total']}{extra}…"
+    else:
+        progress.pack_forget()
+        text = f"Готово: {p['done']} из {p['total']}{extra}" if p["total"] > 1 else "Готов"
+    if _store_error:
+        text += f" · хранилище результатов: {_store_error}"
+    status_var.set(text)
+
+# --- строки групп и деталей: создаются при раскрытии ---
+# iid: документ "12", группа "12/BIN", деталь "12/BIN/0", член архива "12/#0", заглушка "…/…"
+def _set_lazy(iid: str, expandable: bool):
+    """Вместо детей — одна заглушка: стрелка раскрытия есть, строк ещё нет."""
+    kids = jobs.get_children(iid)
+    if kids:
+        jobs.delete(*kids)
+    if expandable:
+        jobs.insert(iid, "end", iid=f"{iid}/…", text="…", tags=("MUTED",))
+
+def _is_lazy(iid: str) -> bool:
+    kids = jobs.get_children(iid)
+    return len(kids) == 1 and kids[0].endswith("/…")
+
+def _doc_groups(iid: str):
+    """[(ключ, заголовок, главный результат, остальные)] документа — в порядке групп."""
+    results = _rendered[iid]["results"]
+    cached = _GROUPS.get(iid)
+    if cached is not None and cached[0] is results:
+        return cached[1]
+    groups = {}
+    for r in results:
+        groups.setdefault(_map_group(getattr(r, "code", "")), []).append(r)
+    out = []
+    for gk in sorted(groups, key=_group_order_key):
+        items = groups[gk]
+        main_item = _best_item(items) or items[0]
+        out.append((gk, _group_title(gk), main_item, [it for it in items if it is not main_item]))
+    _GROUPS[iid] = (results, out)
+    return out
+
+def _build_doc(iid: str):
+    """Строки групп документа (или членов архива); раскрытые группы остаются раскрытыми."""
+    kids = jobs.get_children(iid)
+    was_open = {k for k in kids if jobs.item(k, "open")}
+    if kids:
+        jobs.delete(*kids)
+    result = _rendered.get(iid)
+    if result is None:
+        return
+    if "archive" in result:
+        for n, rec in enumerate(result["archive"]):
+            name = rec.get("member") or rec.get("path")
+            if "error" in rec:
+                tag, text = "ERROR", f"не удалось прочитать — {rec['error']}"
+            else:
+                tag = _STATUS_TAG.get(rec.get("status"), ("INFO", "•"))[0]
+                text = rec["summary"].get("title", "")
+            jobs.insert(iid, "end", iid=f"{iid}/#{n}", text=name,
+                        values=(f"{_ICON[tag]} {_level_label_ru(tag)}", text), tags=(tag,))
+        return
+    for gk, title, main_item, _ in _doc_groups(iid):
+        tag = _level_tag(getattr(main_item, "level", "INFO"))
+        giid = f"{iid}/{gk}"
+        jobs.insert(iid, "end", iid=giid, text=title, open=giid in was_open, tags=(tag, "GROUP"),
+                    values=(f"{_ICON[tag]} {_level_label_ru(tag)}", getattr(main_item, "message", "").strip()))
+        _sync_group(giid)
+
+def _details_shown() -> bool:
+    return not (MODE == "user" and not SHOW_DETAILS_USER)
+
+def _sync_group(giid: str, opening: bool = False):
+    """Дети группы по текущему режиму: детали (если раскрыта), заглушка или ничего."""
+    iid, gk = giid.split("/", 1)
+    rest = next((r for k, _, _, r in _doc_groups(iid) if k == gk), [])
+    kids = jobs.get_children(giid)
+    if kids:
+        jobs.delete(*kids)
+    if rest and _details_shown():
+        if opening or jobs.item(giid, "open"):
+            for n, it in enumerate(rest):
+                tag = _level_tag(getattr(it, "level", "INFO"), "INFO")
+                jobs.insert(giid, "end", iid=f"{giid}/{n}", text="",
+                            values=("", f"• {getattr(it, 'message', '').strip()}"), tags=(tag,))
+        else:
+            jobs.insert(giid, "end", iid=f"{giid}/…", text="…", tags=("MUTED",))
+    _row_gen[giid] = _render_gen
+
+def _group_of(iid: str):
+    """iid строки группы для строки группы или детали; None — другая строка."""
+    parts = iid.split("/")
+    if len(parts) < 2 or parts[1] == "…" or parts[1].startswith("#"):
+        return None
+    return "/".join(parts[:2])
+
+def _on_tree_open(event=None):
+    iid = jobs.focus()
+    if not iid:
+        return
+    if "/" not in iid:
+        if _is_lazy(iid):
+            _build_doc(iid)
+    elif _group_of(iid) == iid and (_is_lazy(iid) or _row_gen.get(iid) != _render_gen):
+        _sync_group(iid, opening=True)
+    _schedule_refresh()
+
+def _next_row(iid: str) -> str:
+    """Следующая отображаемая строка (с учётом раскрытых)."""
+    if jobs.item(iid, "open"):
+        kids = jobs.get_children(iid)
+        if kids:
+            return kids[0]
+    while iid:
+        nxt = jobs.next(iid)
+        if nxt:
+            return nxt
+        iid = jobs.parent(iid)
+    return ""
+
+def _visible_rows():
+    rows, iid = [], jobs.identify_row(1)
+    while iid and jobs.bbox(iid):
+        rows.append(iid)
+        iid = _next_row(iid)
+    return rows
+
+def _refresh_visible():
+    """Привести к текущему режиму группы, попавшие в окно; остальные — когда попадут."""
+    global _refresh_scheduled
+    _refresh_scheduled = False
+    for _ in range(4):  # раскрытие/скрытие деталей сдвигает окно — ещё проход
+        stale = []
+        for iid in _visible_rows():
+            g = _group_of(iid)
+            if g is not None and _row_gen.get(g) != _render_gen and g not in stale:
+                stale.append(g)
+        if not stale:
+            return
+        for g in stale:
+            _sync_group(g)
+
+_refresh_scheduled = False
+
+def _schedule_refresh():
+    global _refresh_scheduled
+    if not _refresh_scheduled:
+        _refresh_scheduled = True
+        root.after_idle(_refresh_visible)
+
+def _on_tree_scroll(first, last):
+    jobs_scroll.set(first, last)
+    _schedule_refresh()
+
+jobs.configure(yscrollcommand=_on_tree_scroll)
+jobs.bind("<<TreeviewOpen>>", _on_tree_open)
+
+def _clear_finished():
+    """Убрать завершённые файлы из списка (и их открытые документы из памяти)."""
+    if _queue is None:
+        return
+    gone = _queue.remove_finished()
+    live = {e.path for e in _queue.entries()}
+    for entry in gone:
+        iid = str(entry.id)
+        jobs.delete(iid)
+        _rendered.pop(iid, None); _GROUPS.pop(iid, None)
+        for g in [g for g in _row_gen if g.split("/", 1)[0] == iid]:
+            del _row_gen[g]
+        if entry.path not in live:
+            close_document(entry.path)
+            _dup_matches.pop(entry.path, None)
+    _update_progress()
 
 # ===============================================================
 # ГРУППИРОВАННЫЙ ВЫВОД
@@ -258,7 +708,8 @@ def _map_group(code: str) -> str:
 def _group_title(gk: str) -> str:
     g = GROUPS_CFG.get(gk, {})
     return g.get("title") or {
-        "BIN":"Идентификаторы контрагентов","DATE":"Даты документа","SUM":"Суммы и итоги"
+        "BIN":"Идентификаторы контрагентов","DATE":"Даты документа","SUM":"Суммы и итоги",
+        "DUP":"Повторы документов"
     }.get(gk, gk)
 
 def _group_order_key(gk: str) -> tuple:
@@ -283,46 +734,6 @@ def _best_item(items):
             best=items_sorted[0]
     return best
 
-def _insert_results_grouped(results, header: str):
-    output.delete(1.0, tk.END)
-    output.insert(tk.END, header+"\n"+"—"*90+"\n")
-    groups={}
-    for r in results:
-        gk=_map_group(getattr(r,"code",""))
-        groups.setdefault(gk,[]).append(r)
-    any_err=any(str(getattr(r,"level","")).upper() in ("ERR","ERROR") for r in results)
-    any_warn=any(str(getattr(r,"level","")).upper() in ("WARN","WARNING") for r in results)
-    if any_err:
-        bad_groups=[gk for gk,items in groups.items() if any(str(getattr(x,"level","")).upper() in ("ERR","ERROR") for x in items)]
-        output.insert(tk.END,f"❌ Нужны исправления: {len(bad_groups)} категорий с ошибками ({', '.join(bad_groups)})\n","SUMMARY")
-    elif any_warn:
-        output.insert(tk.END,"⚠ Есть предупреждения (не блокирует отправку).\n","SUMMARY")
-    else:
-        output.insert(tk.END,"✅ Чики-пыки: критичных ошибок нет.\n","SUMMARY")
-    output.insert(tk.END,"—"*90+"\n",())
-    for gk in sorted(groups.keys(),key=_group_order_key):
-        items=groups[gk]; title=_group_title(gk)
-        main_item=_best_item(items) or items[0]
-        lvl_raw=str(getattr(main_item,"level","INFO")).upper()
-        tag="ERROR" if lvl_raw in ("ERR","ERROR") else ("WARN" if lvl_raw in ("WARN","WARNING") else "OK")
-        icon="✖" if tag=="ERROR" else ("⚠" if tag=="WARN" else "☑")
-        ru=_level_label_ru(tag)
-        output.insert(tk.END,f"{title}\n","GROUP")
-        output.insert(tk.END,f"{icon} {ru}: {getattr(main_item,'message','').strip()}\n",tag)
-        show_details=True
-        if MODE=="user" and not SHOW_DETAILS_USER: show_details=False
-        if show_details:
-            for it in items:
-                if it is main_item: continue
-                lvl=str(getattr(it,"level","INFO")).upper()
-                tag2="ERROR" if lvl in ("ERR","ERROR") else ("WARN" if lvl in ("WARN","WARNING") else "INFO")
-                output.insert(tk.END,f"   • {getattr(it,'message','').strip()}\n",tag2)
-        output.insert(tk.END,"—"*60+"\n","MUTED")
-    ok=sum(1 for r in results if str(getattr(r,"level","")).upper() not in ("ERR","ERROR","WARN","WARNING"))
-    warn=sum(1 for r in results if str(getattr(r,"level","")).upper() in ("WARN","WARNING"))
-    err=sum(1 for r in results if str(getattr(r,"level","")).upper() in ("ERR","ERROR"))
-    output.insert(tk.END,f"✅ ОК: {ok}   ⚠ Предупреждения: {warn}   ❌ Ошибки: {err}\n","SUMMARY")
-
 def human_size(n:int)->str:
     for unit in ("Б","КБ","МБ","ГБ"):
         if n<1024: return f"{n} {unit}"
@@ -340,5 +751,19 @@ if DND_FILES:
     root.dnd_bind('<<DragEnter>>',_drag_enter)
     root.dnd_bind('<<DragLeave>>',_drag_leave)
 
+# 2026-10-19: reason: тяжёлые импорты — после показа окна, в фоне
+def _preload():
+    if _CORE_ERROR:
+        return
+    try:
+        reader.warm_up()  # PyPDF2, openpyxl, шаблоны правил
+    except Exception as e:
+        # не критично: ридер догрузится при первом файле
+        root.after(0, status_var.set, f"Предзагрузка не удалась: {e}")
+
+def _preload_in_background():
+    threading.Thread(target=_preload, name="preload", daemon=True).start()
+
 if __name__=="__main__":
+    root.after_idle(_preload_in_background)
     root.mainloop()
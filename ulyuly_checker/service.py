@@ -0,0 +1,264 @@
+# ============================================================
+# service.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: локальный HTTP-сервис проверки (asyncio, только stdlib).
+#   python -m ulyuly_checker.service [--port 8765] [--workers N]
+#   Процессы пула прогреваются при старте (reader.warm_up: config,
+#   чек-лист, регулярки, openpyxl/PyPDF2), так что запрос не платит
+#   за импорт. Эндпоинты:
+#     POST /check?path=<файл>            — проверить файл на диске сервера
+#     POST /check?name=<имя.pdf> + тело  — проверить загруженное содержимое
+#     POST /check  {"path": "..."}       — то же, JSON-телом
+#     GET  /health, GET /stats           — состояние, очередь, счётчики
+#   Ответ — запись как у batch (results + summary). Ограничения:
+#   max_concurrency (в работе), max_queue (ждут; сверх — 503), размер тела.
+#   SIGINT/SIGTERM — новые запросы получают 503, начатые дорабатывают
+#   (до drain_timeout), затем пул закрывается.
+#   Настройки: config.json → "service".
+# ============================================================
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if sys.path[:1] != [_APP_DIR]:
+    sys.path.insert(0, _APP_DIR)
+
+from core import reader, utils, workers as worker_pool  # noqa: E402
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+_MAX_HEADER = 64 * 1024
+
+def _ping(_: int) -> int:
+    return os.getpid()
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+# --------------------------- сервис ---------------------------
+
+class CheckService:
+    """Пул прогретых процессов + учёт очереди; HTTP — в handle()."""
+
+    def __init__(self, workers: int, max_concurrency: int, max_queue: int, max_upload: int):
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency or self.workers)
+        self.max_queue, self.max_upload = max(0, max_queue), max_upload
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.draining = False
+        self.queued = self.active = 0
+        self.done = self.failed = self.rejected = 0
+        self.busy_s = 0.0
+        self.started = time.time()
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.pool = worker_pool.make_pool(self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping, i) for i in range(self.workers)))
+
+    async def drain(self, timeout: float) -> None:
+        """Ждёт завершения начатых и поставленных в очередь проверок, затем закрывает пул."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠ drain: не дождались {self.active + self.queued} проверок", file=sys.stderr)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "status": "draining" if self.draining else "ok",
+            "workers": self.workers, "max_concurrency": self.max_concurrency, "max_queue": self.max_queue,
+            "active": self.active, "queued": self.queued,
+            "done": self.done, "failed": self.failed, "rejected": self.rejected,
+            "busy_s": round(self.busy_s, 3), "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    async def submit(self, fn, *args) -> Dict[str, Any]:
+        if self.draining:
+            self.rejected += 1
+            raise _HttpError(503, "сервис останавливается")
+        if self.active >= self.max_concurrency and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise _HttpError(503, f"очередь заполнена ({self.queued})")
+        self.queued += 1
+        self._idle.clear()
+        waiting = True
+        try:
+            async with self._sem:
+                self.queued -= 1
+                waiting = False
+                self.active += 1
+                t0 = time.perf_counter()
+                try:
+                    rec = await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+                finally:
+                    self.active -= 1
+                    self.busy_s += time.perf_counter() - t0
+        finally:
+            if waiting:  # запрос отменён, пока ждал очереди
+                self.queued -= 1
+            if self.active == 0 and self.queued == 0:
+                self._idle.set()
+        if "error" in rec:
+            self.failed += 1
+        else:
+            self.done += 1
+        return rec
+
+    # ---------- HTTP ----------
+    async def route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return (503 if self.draining else 200), {"status": "draining" if self.draining else "ok"}
+        if url.path == "/stats":
+            return 200, self.stats()
+        if url.path != "/check":
+            raise _HttpError(404, f"нет такого пути: {url.path}")
+        if method != "POST":
+            raise _HttpError(405, "нужен POST")
+
+        ctype = headers.get("content-type", "").split(";")[0].strip().lower()
+        path = query.get("path")
+        if path is None and ctype == "application/json" and body:
+            try:
+                path = json.loads(body.decode("utf-8")).get("path")
+            except (ValueError, AttributeError):
+                raise _HttpError(400, "ожидался JSON вида {\"path\": \"...\"}")
+        if path is not None:
+            if not os.path.isfile(path):
+                raise _HttpError(404, f"файл не найден: {path}")
+            rec = await self.submit(reader.check_file, path)
+        else:
+            name = query.get("name") or headers.get("x-filename", "")
+            if not body or not name:
+                raise _HttpError(400, "укажите ?path=... или загрузите файл с ?name=<имя.pdf>")
+            if not name.lower().endswith(reader.SUPPORTED_EXT):
+                raise _HttpError(400, f"неподдерживаемый формат: {name}")
+            rec = await self.submit(reader.check_bytes, os.path.basename(name), body)
+        return (422 if "error" in rec else 200), rec
+
+    async def handle(self, rd: asyncio.StreamReader, wr: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await rd.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(wr, 400, {"error": "слишком длинные заголовки"}, False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(wr, 400, {"error": "некорректный запрос"}, False)
+                    return
+                headers = {}
+                for ln in lines[1:]:
+                    if ":" in ln:
+                        k, v = ln.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                try:
+                    if "chunked" in headers.get("transfer-encoding", "").lower():
+                        raise _HttpError(411, "chunked не поддерживается, укажите Content-Length")
+                    length = int(headers.get("content-length") or 0)
+                    if length > self.max_upload:
+                        raise _HttpError(413, f"тело больше {self.max_upload} байт")
+                    body = await rd.readexactly(length) if length else b""
+                    status, payload = await self.route(method.upper(), target, headers, body)
+                except _HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                    keep = keep and e.status not in (411, 413)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except Exception as e:
+                    status, payload = 500, {"error": f"{e.__class__.__name__}: {e}"}
+                await self._respond(wr, status, payload, keep and not self.draining)
+                if not keep or self.draining:
+                    return
+        finally:
+            try:
+                wr.close()
+                await wr.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    @staticmethod
+    async def _respond(wr: asyncio.StreamWriter, status: int, payload: Any, keep: bool) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n")
+        wr.write(head.encode("latin-1") + data)
+        await wr.drain()
+
+# --------------------------- запуск ---------------------------
+
+async def serve(host: str, port: int, service: CheckService, drain_timeout: float) -> None:
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port, limit=_MAX_HEADER)
+    addr = ", ".join(str(s.getsockname()[:2]) for s in server.sockets)
+    print(f"УЛЮЛЮ service: {addr}, процессов {service.workers}, "
+          f"одновременно {service.max_concurrency}, очередь {service.max_queue}", file=sys.stderr)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остаётся KeyboardInterrupt
+    try:
+        await stop.wait()
+    finally:
+        print("Остановка: дорабатываем начатые проверки…", file=sys.stderr)
+        server.close()
+        await service.drain(drain_timeout)
+        await server.wait_closed()
+
+def main(argv=None) -> int:
+    cfg = utils.load_config().get("service", {}) or {}
+    ap = argparse.ArgumentParser(prog="python -m ulyuly_checker.service",
+                                 description="Локальный HTTP-сервис проверки ЭСФ.")
+    ap.add_argument("--host", default=cfg.get("host", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(cfg.get("port", 8765)))
+    ap.add_argument("-w", "--workers", type=int, default=int(cfg.get("workers") or os.cpu_count() or 1))
+    ap.add_argument("--max-concurrency", type=int, default=int(cfg.get("max_concurrency") or 0),
+                    help="проверок в работе одновременно (0 — по числу процессов)")
+    ap.add_argument("--max-queue", type=int, default=int(cfg.get("max_queue", 64)),
+                    help="сколько запросов может ждать; сверх — 503")
+    ap.add_argument("--max-upload-mb", type=float, default=float(cfg.get("max_upload_mb", 32)))
+    ap.add_argument("--drain-timeout", type=float, default=float(cfg.get("drain_timeout", 30)))
+    args = ap.parse_args(argv)
+    service = CheckService(args.workers, args.max_concurrency, args.max_queue,
+                           int(args.max_upload_mb * (1 << 20)))
+    try:
+        asyncio.run(serve(args.host, args.port, service, args.drain_timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+# ============================================================
+# watch.py — ULYULYU CHECKER v2.8-pre
+#
+# [2026-10-19] feat: наблюдение за папкой (общая папка бухгалтерии).
+#   python -m ulyuly_checker.watch <папка> [...] [--sidecar] [-o res.jsonl]
+#   Раз в interval секунд дерево сравнивается с сохранённым индексом
+#   (core.scan_index: mtime/size/inode файлов, mtime каталогов), и
+#   в проверку уходят только новые и изменённые файлы; ZIP — всеми
+#   членами. Результаты — JSONL (дописывается) и/или рядом с файлом:
+#   <файл>.ulyulyu.json. Индекс пишется после проверки каждой порции,
+#   так что после перезапуска проверенное не повторяется. Счётчик
+#   обходов — тоже в индексе: полный обход раз в full_every обходов
+#   считается и через перезапуски (--once из cron — не всегда полный).
+#   Файл, который не прочитался (занят, нет прав — OSError), в индекс
+#   не пишется, его каталог остаётся «грязным» — следующий обход
+#   проверит файл снова. Ошибка разбора (битый файл) пишется как "error"
+#   и повторяется только после изменения файла.
+#   Изменённый ZIP перед повторной проверкой убирается из индекса
+#   дубликатов целиком («a.zip!…»): удалённые из архива члены не
+#   должны находиться как дубликаты.
+#   --store — ещё и в хранилище результатов (core.result_store).
+#   --once — один проход (для cron); --stats — что в индексе.
+#   SIGINT/SIGTERM — дорабатывается текущая порция, затем выход.
+#   Настройки: config.json → "watch".
+# ============================================================
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if sys.path[:1] != [_APP_DIR]:
+    sys.path.insert(0, _APP_DIR)
+
+from core import archive, dup_index, reader, result_store, scan_index, utils, workers as worker_pool  # noqa: E402
+
+DEFAULT_EXT = (".pdf", ".xlsx", ".xls")
+_STATUS_RANK = {"ok": 0, "warn": 1, "error": 2}
+# сбои чтения (reader.check_file: "<класс>: текст") — временные, файл проверяется снова
+_RETRY_ERRORS = {"OSError", "PermissionError", "FileNotFoundError", "BlockingIOError",
+                 "InterruptedError", "TimeoutError"}
+
+def _read_failed(rec: Dict[str, Any]) -> bool:
+    return str(rec.get("error", "")).split(":", 1)[0] in _RETRY_ERRORS
+
+def _write_json(path: str, payload: Any) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+class Watcher:
+    """Один проход — poll(); цикл с паузами — run()."""
+
+    def __init__(self, roots: List[str], exts: tuple, index: scan_index.ScanIndex, workers: int = 1,
+                 out=None, sidecar: bool = False, settle: float = 2.0, full_every: int = 12,
+                 batch_size: int = 256, archives: bool = True, store: Optional[result_store.Writer] = None):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.exts = exts + archive.ARCHIVE_EXT if archives else exts
+        self.index, self.workers = index, max(1, workers)
+        self.out, self.sidecar, self.store = out, sidecar, store
+        self.settle, self.full_every = settle, max(1, full_every)
+        self.batch_size = max(1, batch_size)
+        self.polls = int(index.get_meta("polls", "0") or 0)
+        self.stop = threading.Event()
+        self._pool = None
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.store is not None:
+            self.store.close()
+
+    # ---------- проверка ----------
+    def _check(self, paths: List[str]) -> List[Dict[str, Any]]:
+        if self.workers <= 1 or len(paths) == 1:
+            reader.warm_up()
+            return [reader.check_file(p) for p in paths]
+        if self._pool is None:
+            self._pool = worker_pool.make_pool(self.workers)
+        return list(self._pool.map(reader.check_file, paths, chunksize=4))
+
+    def _expand(self, path: str) -> Optional[List[str]]:
+        """Документы файла (члены архива); None — архив не прочитался."""
+        if not archive.is_archive(path):
+            return [path]
+        try:
+            return list(archive.iter_members(path, reader.SUPPORTED_EXT))
+        except archive.zipfile.BadZipFile:
+            return []
+        except OSError:
+            return None
+
+    def _emit(self, path: str, recs: List[Dict[str, Any]]) -> str:
+        """Записать результаты файла (или всех членов архива); статус для индекса."""
+        if self.out is not None:
+            for rec in recs:
+                self.out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.out.flush()
+        if self.store is not None:
+            for rec in recs:
+                self.store.add(rec)
+        if not recs:
+            return "error"
+        status = max(("error" if "error" in r else r.get("status") or "error" for r in recs),
+                     key=lambda s: _STATUS_RANK.get(s, 2))
+        if self.sidecar:
+            payload = recs[0] if not archive.is_archive(path) else {"archive": path, "status": status,
+                                                                    "members": recs}
+            try:
+                _write_json(path + scan_index.SIDECAR_SUFFIX, payload)
+            except OSError as e:
+                print(f"⚠ {path}: результат не записан ({e})", file=sys.stderr)
+        return status
+
+    def _process(self, changed: List[Tuple[str, scan_index.Stat]]) -> Tuple[int, int, List[str]]:
+        """
+        Проверка порциями; после каждой — запись в индекс.
+        → (документов, сбоев, не прочитавшиеся файлы — в индекс не записаны).
+        """
+        docs = errors = 0
+        retry: List[str] = []
+        for i in range(0, len(changed), self.batch_size):
+            part = changed[i:i + self.batch_size]
+            owners: List[Tuple[str, scan_index.Stat, Optional[int]]] = []
+            jobs: List[str] = []
+            rechecked: List[str] = []
+            for path, st in part:
+                members = self._expand(path)
+                owners.append((path, st, None if members is None else len(members)))
+                jobs.extend(members or ())
+                if members is not None and archive.is_archive(path):
+                    rechecked.append(path)
+            # изменённый архив: члены, которых в нём больше нет, не должны давать DUP001;
+            # оставшиеся члены запишутся в индекс заново при проверке
+            dup_index.forget(rechecked)
+            recs = self._check(jobs) if jobs else []
+            rows, pos = [], 0
+            for path, st, n in owners:
+                own = recs[pos:pos + (n or 0)]
+                pos += n or 0
+                if n is None or any(_read_failed(r) for r in own):
+                    retry.append(path)
+                    continue
+                rows.append((path, st, self._emit(path, own)))
+            if self.store is not None:
+                self.store.flush()
+            self.index.record(rows)
+            docs += len(recs)
+            errors += sum(1 for r in recs if "error" in r)
+            if self.stop.is_set():
+                break
+        return docs, errors, retry
+
+    # ---------- цикл ----------
+    def poll(self) -> Dict[str, Any]:
+        full = self.polls % self.full_every == 0
+        res = self.index.scan(self.roots, self.exts, full=full, settle=self.settle)
+        if res.removed:
+            dup_index.forget(res.removed)
+        t0 = time.perf_counter()
+        docs, errors, retry = self._process(res.changed)
+        if not self.stop.is_set():
+            # каталоги с не прочитавшимися файлами не запоминаем — их файлы stat'ятся снова
+            res.dirty_dirs.extend({os.path.dirname(p) for p in retry})
+            self.index.commit(res)  # прервались посередине — каталоги пройдём заново
+            self.polls += 1
+            self.index.set_meta("polls", self.polls)
+        return {"full": full, "dirs": res.dirs, "dirs_skipped": res.dirs_skipped, "stats": res.stats,
+                "changed": len(res.changed), "removed": len(res.removed), "pending": res.pending,
+                "retry": len(retry),
+                "scan_s": round(res.elapsed_s, 3), "documents": docs, "errors": errors,
+                "check_s": round(time.perf_counter() - t0, 3)}
+
+    def run(self, interval: float, once: bool = False, quiet: bool = False) -> None:
+        try:
+            while not self.stop.is_set():
+                info = self.poll()
+                if not quiet and (info["changed"] or info["removed"] or info["pending"] or once):
+                    retry = f", не прочитано {info['retry']} (повтор)" if info["retry"] else ""
+                    print(f"{time.strftime('%H:%M:%S')} {'полный' if info['full'] else 'быстрый'} обход: "
+                          f"каталогов {info['dirs']} (без stat {info['dirs_skipped']}), stat {info['stats']}, "
+                          f"{info['scan_s']:.2f} с; новых/изменённых {info['changed']}, удалено "
+                          f"{info['removed']}, ждут {info['pending']}; проверено {info['documents']} "
+                          f"(сбоев {info['errors']}{retry}) за {info['check_s']:.2f} с", file=sys.stderr)
+                if once:
+                    break
+                self.stop.wait(interval)
+        finally:
+            self.close()
+
+# --------------------------- запуск ---------------------------
+
+def main(argv=None) -> int:
+    cfg = utils.load_config().get("watch", {}) or {}
+    ap = argparse.ArgumentParser(prog="python -m ulyuly_checker.watch",
+                                 description="Наблюдение за папкой: проверка новых и изменённых ЭСФ.")
+    ap.add_argument("roots", nargs="*", help="папки для наблюдения")
+    ap.add_argument("-o", "--out", default=cfg.get("out") or None,
+                    help="JSONL с результатами (дописывается; «-» — stdout)")
+    ap.add_argument("--sidecar", action="store_true", default=bool(cfg.get("sidecar", False)),
+                    help=f"результат рядом с файлом: <файл>{scan_index.SIDECAR_SUFFIX}")
+    ap.add_argument("--store", action="store_true", default=result_store.settings()["enabled"],
+                    help="результаты — в хранилище для запросов (python -m core.result_store)")
+    ap.add_argument("--index", default=None, help="файл индекса (по умолчанию из config.json)")
+    ap.add_argument("-w", "--workers", type=int, default=int(cfg.get("workers") or os.cpu_count() or 1))
+    ap.add_argument("--ext", default=",".join(DEFAULT_EXT), help="расширения через запятую")
+    ap.add_argument("--no-archives", action="store_true", help="не проверять ZIP-архивы")
+    ap.add_argument("--interval", type=float, default=float(cfg.get("interval", 5)), help="пауза между обходами, с")
+    ap.add_argument("--settle", type=float, default=float(cfg.get("settle", 2)),
+                    help="файл моложе стольких секунд ещё копируется — ждём")
+    ap.add_argument("--full-every", type=int, default=int(cfg.get("full_every", 12)),
+                    help="каждый N-й обход — полный (stat всех файлов)")
+    ap.add_argument("--once", action="store_true", help="один проход и выход")
+    ap.add_argument("--stats", action="store_true", help="показать содержимое индекса и выйти")
+    ap.add_argument("-q", "--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    index = scan_index.open_default(args.index)
+    if args.stats:
+        print(json.dumps(index.stats(), ensure_ascii=False, indent=2))
+        return 0
+    if not args.roots:
+        ap.error("укажите папку для наблюдения")
+    missing = [r for r in args.roots if not os.path.isdir(r)]
+    if missing:
+        print(f"Нет такой папки: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if not args.out and not args.sidecar and not args.store:
+        args.out = "-"
+    exts = tuple(e if e.startswith(".") else "." + e for e in
+                 (x.strip().lower() for x in args.ext.split(",")) if e)
+    out = None
+    if args.out:
+        out = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    watcher = Watcher(args.roots, exts, index, workers=args.workers, out=out, sidecar=args.sidecar,
+                      settle=args.settle, full_every=args.full_every,
+                      batch_size=int(cfg.get("batch_size", 256)), archives=not args.no_archives,
+                      store=result_store.Writer() if args.store else None)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, lambda *_: watcher.stop.set())
+        except (ValueError, OSError):
+            pass
+    if not args.quiet:
+        print(f"УЛЮЛЮ watch: {', '.join(watcher.roots)}; обход раз в {args.interval:g} с, "
+              f"индекс {index.path}", file=sys.stderr)
+    try:
+        watcher.run(args.interval, once=args.once, quiet=args.quiet)
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())